@@ -6,12 +6,10 @@ import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
 from bs4 import BeautifulSoup
 from copy import deepcopy
-from flask import Flask, request, session
+from flask import Flask, request, session, Response, stream_with_context
 from flask_cors import CORS
 from flask_restx import Api, Resource
 from urllib.parse import urlparse
@@ -21,6 +19,7 @@ from util import *
 from constants import *
 from recipe_state import *
 from logic import *
+from recipe_pipeline import *
 
 CORS(app, 
      origins=["https://recipescraper.mintchococookies.com", "http://localhost:8080", "http://localhost:8000"],
@@ -37,18 +36,11 @@ app.config.update(
 )
 
 # Get models from util
-recipe_url_model, unit_type_model, serving_size_model = create_models(api)
-
-# Create a session with connection pooling and retry strategy
-http_session = requests.Session()
-retry_strategy = Retry(
-    total=3,
-    backoff_factor=0.5,
-    status_forcelist=[500, 502, 503, 504]
-)
-adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=100, pool_maxsize=100)
-http_session.mount("http://", adapter)
-http_session.mount("https://", adapter)
+recipe_url_model, unit_type_model, serving_size_model, recipe_urls_model = create_models(api)
+
+# Batch scraping shares one bounded pool across all batch requests, the fetch engine enforces the per-host limit
+batch_max_urls = int(os.getenv('RECIPE_SCRAPER_BATCH_MAX_URLS', 500))
+batch_executor = ThreadPoolExecutor(max_workers=int(os.getenv('RECIPE_SCRAPER_BATCH_MAX_WORKERS', 32)), thread_name_prefix="batch_scraper")
 
 # ============= APIs =============
 @api.route('/convert-recipe-units')
@@ -60,28 +52,8 @@ class ConvertUnits(Resource):
     @token_required
     @track_latency('convert-recipe-units')
     def post(self, current_user):
-        recipe_state = get_recipe_state(session)
         data = request.get_json()
-        recipe_state.unit_type = data.get('unit_type')
-
-        result = convert_units(
-            recipe_state.ingredients, 
-            recipe_state.unit_type, 
-            recipe_state.requested_serving_size, 
-            recipe_state.servings, 
-            recipe_state.original_unit_type, 
-            recipe_state.ingredients_pre_conversion
-        )
-        
-        if result:
-            recipe_state.ingredients = result
-            save_recipe_state(session, recipe_state)
-        
-            datadog_logger.log("ConvertUnits succeeded for " + recipe_state.recipe_url + "\nResponse: " + str(result), {"endpoint": "convertUnits", "result": "success"})
-            return result
-        else:
-            datadog_logger.log("ConvertUnits failed for " + recipe_state.recipe_url + "\nResponse: None", {"endpoint": "convertUnits", "result": "fail"})
-            return None
+        return convert_session_units(session, data.get('unit_type'))
 
 @api.route('/calculate-serving-ingredients')
 class MultiplyServingSize(Resource):
@@ -92,61 +64,96 @@ class MultiplyServingSize(Resource):
     @token_required
     @track_latency('calculate-serving-ingredients')
     def post(self, current_user):
-        recipe_state = get_recipe_state(session)
         data = request.get_json()
-        recipe_state.requested_serving_size = float(data.get('serving_size'))
+        return scale_session_servings(session, data.get('serving_size'))
 
-        if not recipe_state.servings:
-            return None
-        
-        # clean up the servings numbers
-        recipe_state.servings = float(re.search("\\d+", str(recipe_state.servings))[0])
-
-        if recipe_state.original_unit_type == recipe_state.unit_type:
-            recipe_state.ingredients = calculate_servings(
-                deepcopy(recipe_state.ingredients_pre_conversion), 
-                recipe_state.servings, 
-                recipe_state.requested_serving_size
-            )
-        else:
-            temp = convert_units(
-                deepcopy(recipe_state.ingredients_pre_conversion), 
-                recipe_state.unit_type, 
-                recipe_state.requested_serving_size, 
-                recipe_state.servings, 
-                recipe_state.original_unit_type, 
-                recipe_state.ingredients_pre_conversion
-            )
-            recipe_state.ingredients = calculate_servings(
-                temp, 
-                recipe_state.servings, 
-                recipe_state.requested_serving_size
-            )
-    
-        save_recipe_state(session, recipe_state)
-        response = recipe_state.ingredients
-        if response:
-            datadog_logger.log("MultiplyServingSize succeeded for " + recipe_state.recipe_url + "\nResponse: " + str(response), {"endpoint": "multiplyServingSize", "result": "success"})
-        else:
-            datadog_logger.log("MultiplyServingSize failed for " + recipe_state.recipe_url + "\nResponse: None", {"endpoint": "multiplyServingSize", "result": "fail"})
-        return response
-
-def extract_recipe_data_parallel(soup, recipe_url):
-    """Extract recipe data in parallel using ThreadPoolExecutor"""
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        # Submit all tasks
-        future_name = executor.submit(extract_recipe_name, soup, recipe_url)
-        future_steps = executor.submit(extract_recipe_steps, soup)
-        future_ingredients = executor.submit(extract_ingredients, soup)
-        future_servings = executor.submit(get_serving_size, soup)
-        
-        # Get results as they complete
-        recipe_name = postprocess_text(future_name.result())
-        recipe_steps = postprocess_list(future_steps.result())
-        ingredients = postprocess_list(future_ingredients.result())
-        servings = future_servings.result()
-        
-        return recipe_name, recipe_steps, ingredients, servings
+@api.route('/recipes/<string:recipe_id>/ingredients')
+class RecipeIngredients(Resource):
+    @api.doc(description="Ingredients of a scraped recipe (recipe_id from /scrape-recipe-steps) in a unit type and serving size, cacheable and with ETags")
+    @api.doc(security='basicAuth')
+    @api.doc(params={
+        'Authorization': {'in': 'header', 'description': 'Bearer <JWT token>', 'type': 'string'},
+        'unit_type': {'in': 'query', 'description': 'Either "si" or "metric", the scraped units when left out', 'type': 'string'},
+        'servings': {'in': 'query', 'description': 'Numeric value, the scraped serving size when left out', 'type': 'string'}
+    })
+    @token_required
+    @track_latency('recipe-ingredients')
+    def get(self, current_user, recipe_id):
+        response, status, headers = recipe_ingredients(recipe_id, request.args.get('unit_type'), request.args.get('servings'), request.headers.get('If-None-Match'))
+        if status == 304:
+            return Response(status=304, headers=headers)
+        return response, status, headers
+
+def scrape_batch_item(recipe_url):
+    """Scrape one URL of a batch into a self-contained record, nothing is kept in the session"""
+    try:
+        canonical_url = canonicalize_url(recipe_url)
+        recipe = scrape_flight.do(canonical_url, lambda: scrape_recipe(canonical_url), timeout=scrape_flight_timeout)
+    except (requests.RequestException, TimeoutError, ValueError) as e:
+        return {'recipe_url': recipe_url, 'error': 'Failed to fetch recipe data: {}'.format(str(e))}
+    except Exception as e:
+        # A page that breaks the extraction only fails its own record, the rest of the stream carries on
+        datadog_logger.log("ScrapeRecipesBatch failed to extract " + recipe_url + ": " + repr(e), {"endpoint": "scrapeRecipesBatch", "result": "error"})
+        return {'recipe_url': recipe_url, 'error': 'Failed to extract the recipe from this website'}
+
+    if not (recipe['recipe_name'] and recipe['recipe_steps'] and recipe['ingredients'] and recipe['servings']):
+        return {'recipe_url': recipe_url, 'error': 'Failed to extract the recipe from this website'}
+    return {
+        'recipe_url': recipe_url,
+        'recipe_name': recipe['recipe_name'],
+        'recipe_steps': recipe['recipe_steps'],
+        'ingredients': format_ingredients(recipe['ingredients']),
+        'servings': recipe['servings'],
+        'original_unit_type': recipe['original_unit_type']
+    }
+
+def interleave_by_host(recipe_urls):
+    # Round-robin over the hosts so a batch dominated by one site doesn't block the pool on the per-host fetch limit
+    urls_by_host = {}
+    for recipe_url in recipe_urls:
+        try:
+            host = urlparse(canonicalize_url(recipe_url)).netloc
+        except ValueError:
+            # scrape_batch_item reports the malformed URL in its own record
+            host = None
+        urls_by_host.setdefault(host, []).append(recipe_url)
+    queues = list(urls_by_host.values())
+    ordered = []
+    for i in range(max((len(q) for q in queues), default=0)):
+        ordered += [q[i] for q in queues if i < len(q)]
+    return ordered
+
+@api.route('/scrape-recipes-batch')
+class ScrapeRecipesBatch(Resource):
+    @api.doc(description="Scrape many recipes concurrently, streaming one JSON record per line as each one completes")
+    @api.expect(recipe_urls_model)
+    @api.doc(security='basicAuth')
+    @api.doc(params={'Authorization': {'in': 'header', 'description': 'Bearer <JWT token>', 'type': 'string'}})
+    @token_required
+    @track_latency('scrape-recipes-batch')
+    def post(self, current_user):
+        data = request.get_json()
+        recipe_urls = data.get('recipe_urls') if data else None
+        if not isinstance(recipe_urls, list) or not recipe_urls or not all(isinstance(url, str) for url in recipe_urls):
+            return {'error': 'recipe_urls must be a non-empty list of URLs'}, 400
+        if len(recipe_urls) > batch_max_urls:
+            return {'error': 'A batch can have at most {} URLs'.format(batch_max_urls)}, 400
+
+        def generate():
+            futures = [batch_executor.submit(scrape_batch_item, recipe_url) for recipe_url in interleave_by_host(recipe_urls)]
+            failed = 0
+            try:
+                for future in as_completed(futures):
+                    record = future.result()
+                    failed += 1 if 'error' in record else 0
+                    yield json.dumps(record) + '\n'
+            finally:
+                # Stop the remaining work if the client went away
+                for future in futures:
+                    future.cancel()
+            datadog_logger.log("ScrapeRecipesBatch finished {} URLs with {} failures".format(len(recipe_urls), failed), {"endpoint": "scrapeRecipesBatch", "result": "success" if not failed else "partial"})
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 @api.route('/scrape-recipe-steps')
 class ScrapeRecipeSteps(Resource):
@@ -157,44 +164,22 @@ class ScrapeRecipeSteps(Resource):
     @token_required
     @track_latency('scrape-recipe-steps')
     def post(self, current_user):
-        recipe_state = RecipeState()
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         recipe_url = data.get('recipe_url')
-        recipe_state.recipe_url = recipe_url
+        if not isinstance(recipe_url, str) or not recipe_url.strip():
+            return {'error': 'Failed to fetch recipe data: recipe_url must be a URL'}, 400
         
         try:
-            response = http_session.get(recipe_url, headers=headers)
-            response.raise_for_status()
-        except requests.RequestException as e:
+            # Variants of the same recipe URL (tracking params, anchors, amp/print views) share one cache entry
+            canonical_url = canonicalize_url(recipe_url)
+            # The result is shared with every coalesced request, so take our own copy before it goes into the session
+            recipe = deepcopy(scrape_flight.do(canonical_url, lambda: scrape_recipe(canonical_url), timeout=scrape_flight_timeout))
+        except (requests.RequestException, ValueError) as e:
             return {'error': 'Failed to fetch recipe data: {}'.format(str(e))}, 400
-        
-        soup = BeautifulSoup(response.content, 'lxml')  # Using lxml parser for better performance
+        except TimeoutError as e:
+            return {'error': 'Failed to fetch recipe data: {}'.format(str(e))}, 504
 
-        # Extract all recipe data in parallel
-        recipe_name, recipe_steps, recipe_state.ingredients, recipe_state.servings = extract_recipe_data_parallel(soup, recipe_url)
-        
-        if recipe_state.ingredients:
-            recipe_state.ingredients, recipe_state.original_unit_type, recipe_state.ingredients_pre_conversion = extract_units(recipe_state.ingredients)
-        
-        save_recipe_state(session, recipe_state)
-        
-        # With error handling
-        if recipe_name and recipe_steps and recipe_state.ingredients and recipe_state.servings:
-            response = {
-                'recipe_url': recipe_url, 
-                'recipe_name': recipe_name, 
-                'recipe_steps': recipe_steps, 
-                'ingredients': recipe_state.ingredients, 
-                'servings': recipe_state.servings, 
-                'original_unit_type': recipe_state.original_unit_type
-            }
-            datadog_logger.log("ScrapeRecipeSteps succeeded for " + recipe_url + "\nResponse: " + str(response), {"endpoint": "scrapeRecipeSteps", "result": "success"})
-            return response, 200
-        else:
-            response = {"error": "Oops! We encountered a hiccup while trying to extract the recipe from this website. It seems its structure is quite unique and our system is having trouble with it. We're continuously working on improvements though! Thank you for your patience and support. ^^"}
-            details = f"{recipe_url} | {recipe_name} | {recipe_steps} | {recipe_state.ingredients} | {recipe_state.servings} | {recipe_state.original_unit_type}"
-            datadog_logger.log("ScrapeRecipeSteps failed for " + recipe_url + "\nDetails: " + details, {"endpoint": "scrapeRecipeSteps", "result": "fail"})
-            return response
+        return save_scraped_recipe(session, recipe_url, recipe, bool(data.get('client_conversion')))
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
\ No newline at end of file
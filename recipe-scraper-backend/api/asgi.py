@@ -0,0 +1,176 @@
+import os
+import time
+import asyncio
+import jwt
+import requests
+from copy import deepcopy
+from typing import Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Depends
+from fastapi.responses import JSONResponse, Response
+from fastapi.security import APIKeyHeader
+from fastapi.exceptions import RequestValidationError
+from fastapi.exception_handlers import request_validation_exception_handler
+from pydantic import BaseModel, Field
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+
+# Local imports
+from util import *
+from recipe_pipeline import *
+
+# ASGI version of the API for high-concurrency serving: same endpoints, request/response contract and JWT auth as
+# app.py, but upstream fetches are awaited instead of holding a worker thread and parsing runs on the extraction executor.
+# Run with: uvicorn asgi:asgi_app --host 0.0.0.0 --port 5000
+
+secret_key = os.getenv('RECIPE_SCRAPER_SESSION_KEY')
+
+@asynccontextmanager
+async def lifespan(asgi_app):
+    asgi_app.state.fetcher = AsyncFetcher(**fetch_engine_settings)
+    yield
+    await asgi_app.state.fetcher.close()
+    extraction_executor.shutdown(wait=False)
+
+asgi_app = FastAPI(title="Recipe Scraper API", lifespan=lifespan)
+
+asgi_app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=6)
+asgi_app.add_middleware(
+    SessionMiddleware,
+    secret_key=secret_key or '',
+    max_age=30 * 60,
+    same_site='none',
+    https_only=True
+)
+asgi_app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["https://recipescraper.mintchococookies.com", "http://localhost:8080", "http://localhost:8000"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["Content-Type", "Authorization"],
+    expose_headers=["Content-Type", "Authorization"]
+)
+
+# Coalesces concurrent scrapes of the same recipe on this event loop
+async_scrape_flight = AsyncSingleFlight()
+
+async def run_blocking(fn, *args):
+    # The state and recipe stores can be a key-value server on the network, their calls run in a thread off the event loop
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+# Models for the input payloads, matching the ones in util/model_helper.py
+class Login(BaseModel):
+    username: Optional[str] = Field(None, description='The username')
+    password: Optional[str] = Field(None, description='The password')
+
+class RecipeURL(BaseModel):
+    recipe_url: Optional[str] = Field(None, description='URL of the recipe')
+    client_conversion: bool = Field(False, description='Also send the conversion_model to scale and convert the ingredients client-side')
+
+class UnitType(BaseModel):
+    unit_type: Optional[str] = Field(None, description='Either "si" or "metric" ')
+
+class ServingSize(BaseModel):
+    serving_size: str = Field(..., description='Numeric value')
+
+class AuthError(Exception):
+    def __init__(self, message):
+        self.message = message
+
+@asgi_app.exception_handler(AuthError)
+async def auth_error_handler(request, exc):
+    return JSONResponse({'message': exc.message}, status_code=401)
+
+invalid_recipe_url_message = 'Failed to fetch recipe data: recipe_url must be a URL'
+
+@asgi_app.exception_handler(RequestValidationError)
+async def validation_error_handler(request, exc):
+    # A recipe_url that isn't a string gets the same 400 as the Flask app instead of FastAPI's 422
+    if any('recipe_url' in error.get('loc', ()) for error in exc.errors()):
+        return JSONResponse({'error': invalid_recipe_url_message}, status_code=400)
+    return await request_validation_exception_handler(request, exc)
+
+authorization_header = APIKeyHeader(name='Authorization', description='Bearer <JWT token>', auto_error=False)
+
+def token_user(token: Optional[str] = Depends(authorization_header)):
+    if not token:
+        raise AuthError('Missing authorization token')
+    try:
+        data = jwt.decode(token, secret_key, algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        raise AuthError('Invalid token')
+    return data['username']
+
+@asgi_app.middleware('http')
+async def log_request_latency(request, call_next):
+    start_time = time.time()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        latency = (time.time() - start_time) * 1000  # Convert to milliseconds
+        datadog_logger.log(
+            f"Endpoint latency for {request.url.path.strip('/')}",
+            {
+                "endpoint": request.url.path.strip('/'),
+                "latency_ms": latency,
+                "status": status,
+                "method": request.method,
+                "url": str(request.url)
+            }
+        )
+
+# ============= APIs =============
+@asgi_app.post('/login')
+async def user_login(data: Login):
+    if not data.username or not data.password:
+        return JSONResponse({'message': 'Missing username or password'}, status_code=401)
+
+    if not verify_credentials(data.username, data.password):
+        return JSONResponse({'message': 'Invalid credentials'}, status_code=401)
+
+    return {'token': generate_token(data.username)}
+
+@asgi_app.post('/scrape-recipe-steps', description="Recipe steps scraping")
+async def scrape_recipe_steps(data: RecipeURL, request: Request, current_user: str = Depends(token_user)):
+    if not data.recipe_url or not data.recipe_url.strip():
+        return JSONResponse({'error': invalid_recipe_url_message}, status_code=400)
+
+    try:
+        # Variants of the same recipe URL (tracking params, anchors, amp/print views) share one cache entry
+        canonical_url = canonicalize_url(data.recipe_url)
+        # The result is shared with every coalesced request, so take our own copy before it goes into the session
+        recipe = deepcopy(await async_scrape_flight.do(
+            canonical_url,
+            lambda: scrape_recipe_async(canonical_url, request.app.state.fetcher),
+            timeout=scrape_flight_timeout
+        ))
+    except (requests.RequestException, ValueError) as e:
+        return JSONResponse({'error': 'Failed to fetch recipe data: {}'.format(str(e))}, status_code=400)
+    except TimeoutError as e:
+        return JSONResponse({'error': 'Failed to fetch recipe data: {}'.format(str(e))}, status_code=504)
+
+    response, status = await run_blocking(save_scraped_recipe, request.session, data.recipe_url, recipe, data.client_conversion)
+    return JSONResponse(response, status_code=status)
+
+@asgi_app.post('/convert-recipe-units', description="Convert between SI and metric units")
+async def convert_recipe_units(data: UnitType, request: Request, current_user: str = Depends(token_user)):
+    return await run_blocking(convert_session_units, request.session, data.unit_type)
+
+@asgi_app.post('/calculate-serving-ingredients', description="Calculate the amount of ingredients based on the serving size wanted")
+async def calculate_serving_ingredients(data: ServingSize, request: Request, current_user: str = Depends(token_user)):
+    return await run_blocking(scale_session_servings, request.session, data.serving_size)
+
+@asgi_app.get('/recipes/{recipe_id}/ingredients', description="Ingredients of a scraped recipe (recipe_id from /scrape-recipe-steps) in a unit type and serving size, cacheable and with ETags")
+async def get_recipe_ingredients(recipe_id: str, request: Request, unit_type: Optional[str] = None, servings: Optional[str] = None, current_user: str = Depends(token_user)):
+    response, status, headers = await run_blocking(recipe_ingredients, recipe_id, unit_type, servings, request.headers.get('if-none-match'))
+    if status == 304:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(response, status_code=status, headers=headers)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(asgi_app, host='0.0.0.0', port=5000)
@@ -3,10 +3,6 @@ headers = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/97.0.4692.71 Safari/537.36'
 }
 
-teaspoons_per_cup = 48
-teaspoons_per_tablespoon = 3
-ounces_per_pound = 16
-
 # Define some cooking action words to help locate the recipe in some websites where the recipe isn't labelled
 cooking_action_words = [
     'heat', 'preheat', 'saute', 'stir', 'simmer', 'remove', 'serve', 'garnish', 
@@ -44,20 +40,47 @@ unit_standardization_mapping = {
     'tbsp': 'tbsp', 'tablespoon': 'tbsp', 'tablespoons': 'tbsp'
 }
 
-# Unit conversion constants
+# Unit conversion graph: each edge is (unit, other unit, how many of the other unit make one unit). The factors between
+# every pair of units in a dimension are worked out from these once at startup (see logic/unit_graph.py), so each unit
+# only needs one path to its dimension's base unit
+unit_graph_edges = [
+    # mass
+    ('kg', 'g', 1000),
+    ('grams', 'g', 1),
+    ('mg', 'g', 0.001),
+    ('oz', 'g', 28.3495),
+    ('lb', 'oz', 16),
+    # volume
+    ('l', 'ml', 1000),
+    ('cup', 'ml', 236.588),
+    ('cups', 'cup', 1),
+    ('cup', 'tbsp', 16),
+    ('tbsp', 'tsp', 3),
+    # count
+    ('dozen', 'count', 12)
+]
+
+# Dimension -> base unit, ingredients are stored in these (see logic/ingredient_base.py)
+unit_dimensions = {'mass': 'g', 'volume': 'ml', 'count': 'count'}
+
+# Grams in a cup of anything that isn't a liquid, a proof of concept density (flour) for going between cups and grams
+solid_grams_per_cup = 125.39
+
+# The unit each unit is converted to for the other unit type, the conversion factors come from the unit graph.
+# Liquids in cups go to ml and solids to g, solids in grams go to cups (see conversion_target in logic/recipe_units.py)
 to_si_conversion = {
-    'cups': {'ml': 236.588, 'g': 125.39},
-    'cup': {'ml': 236.588, 'g': 125.39},
-    # 'tbsp': {'ml': 14.7868, 'g': 14.175},
-    # 'tsp': {'ml': 4.92892, 'g': 5.69},
-    'lb': {'g': 453.592},
-    'oz': {'g': 28.3495}
-} 
+    'cups': 'ml',
+    'cup': 'ml',
+    # 'tbsp': 'ml',
+    # 'tsp': 'ml',
+    'lb': 'g',
+    'oz': 'g'
+}
 
 to_metric_conversion = {
-    'ml': {'cups': 0.00422675, 'cup': 0.00422675},
-    'l': {'cups': 4.22675, 'cup': 4.22675},
-    'g': {'oz': 0.03527396, 'cup': 0.007975, 'cups': 0.007975, 'lb': 1}
+    'ml': 'cups',
+    'l': 'cups',
+    'g': 'oz'
 }
 
 # Fraction conversions
@@ -87,7 +110,7 @@ Thanks for your understanding, and happy cooking! ‍‍
 
 
 Current Limitations:
--   All unit conversions involving cups are based on the density of water (for liquids) and flour (for solids) as a proof of concept. More accurate conversions based on specific ingredients have yet to be implemented. But its coming soon!
+-   Unit conversions involving cups use the density of the ingredient for a few hundred common ingredients. Anything else is converted based on the density of water (for liquids) and flour (for solids).
     It's important to consider the density of ingredients when converting units, as the conversion factor may vary depending on the type of ingredient being measured. For instance, while the metric system suggests 250 grams in 1 cup, this value can differ based on the density of the ingredient.
-    In the meantime, you can find a comprehensive list of conversions for different ingredients from the web: https://www.allrecipes.com/article/cup-to-gram-conversions/
+    If an ingredient isn't covered yet, you can find a comprehensive list of conversions for different ingredients from the web: https://www.allrecipes.com/article/cup-to-gram-conversions/
 """
\ No newline at end of file
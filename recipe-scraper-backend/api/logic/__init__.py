@@ -2,4 +2,19 @@ from .recipe_ingredients import *
 from .recipe_name import *
 from .recipe_steps import *
 from .recipe_units import *
-from .recipe_servings import *
\ No newline at end of file
+from .recipe_servings import *
+from .recipe_structured_data import *
+from .extractor_version import *
+from .recipe_fingerprint import *
+from .recipe_extraction import *
+from .dom_index import *
+from .html_pruning import *
+from .section_walker import *
+from .ingredient_tokenizer import *
+from .quantity import *
+from .ingredient_base import *
+from .unit_graph import *
+from .ingredient_density import *
+from .batch_engine import *
+from .state_codec import *
+from .conversion_model import *
\ No newline at end of file
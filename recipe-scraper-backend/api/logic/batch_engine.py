@@ -0,0 +1,176 @@
+import numpy as np
+from fractions import Fraction
+from logic.ingredient_base import serving_count
+from logic.quantity import Quantity
+from logic.unit_graph import exact, unit_factor
+
+# The float results are only trusted when they are clearly away from a rounding tie (x.5 in the last kept
+# decimal place) or a convert_large_vals threshold, anything closer than this (relative) is redone exactly
+EXACT_FALLBACK_TOLERANCE = 1e-9
+
+# The units convert_large_vals moves between take the first unit ids (logic/recipe_units.py)
+PROMOTION_UNITS = ['cups', 'tsp', 'tbsp', 'oz', 'lb']
+CUPS, TSP, TBSP, OZ, LB = range(len(PROMOTION_UNITS))
+CUPS_TO_TSP_BELOW = 0.1
+TSP_TO_TBSP_FROM = 3
+OZ_TO_LB_FROM = 32
+
+def near(values, threshold):
+    return np.abs(values - threshold) <= EXACT_FALLBACK_TOLERANCE * max(abs(threshold), 1)
+
+def near_rounding_tie(scaled):
+    # scaled is the amount times 10 ** decimal places, a tie is when it sits on a .5
+    with np.errstate(invalid='ignore'):
+        return np.abs(scaled - np.floor(scaled) - 0.5) <= EXACT_FALLBACK_TOLERANCE * np.maximum(np.abs(scaled), 1)
+
+class IngredientBatch:
+    """
+    The base ingredients of many recipes as flat NumPy arrays, scaled and converted for all of them at once.
+
+    Every recipe's BaseIngredients are laid out one per row: the per-serving amount and range upper end
+    in the base unit, the factor back to the scraped unit, the recipe the row belongs to, and for each
+    unit type the display unit (as an id into units) and the factor to it. views() then does the scaling,
+    the conversion and the convert_large_vals promotions (cups -> tsp -> tbsp, oz -> lb) as array
+    operations over every row.
+
+    The results are the same Quantities BaseIngredient.view gives. The arithmetic is done in float64 and
+    rounded to whole hundredths/thousandths, which is exact except when an amount lands within float error
+    of a rounding tie or a promotion threshold. Those few rows are redone with BaseIngredient.view.
+    """
+
+    def __init__(self, recipes):
+        """
+        Args:
+            recipes: (base_ingredients, servings) for each recipe, as stored by ScrapeRecipeSteps
+        """
+        self.ingredients = []
+        recipe_ids = []
+        self.servings = []
+        for recipe_id, (base_ingredients, servings) in enumerate(recipes):
+            self.servings.append(serving_count(servings))
+            for ingredient in base_ingredients or ():
+                self.ingredients.append(ingredient)
+                recipe_ids.append(recipe_id)
+
+        self.recipe_ids = np.array(recipe_ids, dtype=np.intp)
+        self.recipe_servings = np.array([np.nan if servings is None else servings for servings in self.servings], dtype=float)
+        self.has_value = np.array([ingredient.per_serving is not None for ingredient in self.ingredients], dtype=bool)
+        self.value = np.array([np.nan if ingredient.per_serving is None else float(ingredient.per_serving) for ingredient in self.ingredients], dtype=float)
+        self.upper = np.array([np.nan if ingredient.per_serving_upper is None else float(ingredient.per_serving_upper) for ingredient in self.ingredients], dtype=float)
+        self.unit_factor = np.array([float(ingredient.unit_factor) for ingredient in self.ingredients], dtype=float)
+
+        self.units = list(PROMOTION_UNITS)
+        unit_ids = {unit: unit_id for unit_id, unit in enumerate(self.units)}
+        self.display_unit_ids = {}
+        self.display_factors = {}
+        for unit_type in {unit_type for ingredient in self.ingredients for unit_type in ingredient.display_units}:
+            ids = []
+            factors = []
+            for ingredient in self.ingredients:
+                unit, factor = ingredient.display_units.get(unit_type, (None, np.nan))
+                if unit is not None and unit not in unit_ids:
+                    unit_ids[unit] = len(self.units)
+                    self.units.append(unit)
+                ids.append(-1 if unit is None else unit_ids[unit])
+                factors.append(float(factor))
+            self.display_unit_ids[unit_type] = np.array(ids, dtype=np.intp)
+            self.display_factors[unit_type] = np.array(factors, dtype=float)
+
+        self.tsp_per_cup = unit_factor('cups', 'tsp')
+        self.tbsp_per_cup = unit_factor('cups', 'tbsp')
+        self.lb_per_oz = unit_factor('oz', 'lb')
+
+    def views(self, unit_type, requested_serving_sizes=None):
+        """
+        The [quantity, unit, name] rows of every recipe, same as ingredient_views for each recipe on its own
+
+        Args:
+            unit_type: 'si' or 'metric', anything else shows the scraped units
+            requested_serving_sizes: One serving size for every recipe, or a list with one per recipe (None entries
+                show that recipe for its scraped serving size)
+        """
+        if requested_serving_sizes is None or not isinstance(requested_serving_sizes, (list, tuple)):
+            requested_serving_sizes = [requested_serving_sizes] * len(self.servings)
+        requested = [None if size is None else exact(size) for size in requested_serving_sizes]
+        recipe_requested = np.array([np.nan if size is None else float(size) for size in requested], dtype=float)
+
+        # Per recipe, then spread to the rows: scaled recipes multiply by the requested size, the rest by their own
+        recipe_scaled = ~np.isnan(recipe_requested) & ~np.isnan(self.recipe_servings)
+        recipe_multiplier = np.where(recipe_scaled, recipe_requested, np.nan_to_num(self.recipe_servings, nan=1.0))
+        scaled = recipe_scaled[self.recipe_ids]
+        multiplier = recipe_multiplier[self.recipe_ids]
+
+        unit_ids = self.display_unit_ids.get(unit_type)
+        if unit_ids is None:
+            unit_ids = np.full(len(self.ingredients), -1, dtype=np.intp)
+            display_factors = np.full(len(self.ingredients), np.nan)
+        else:
+            display_factors = self.display_factors[unit_type]
+        converted = self.has_value & (unit_ids >= 0)
+        rescaled = self.has_value & ~converted & scaled
+
+        # convert_large_vals, on the amount of the lower end in the display unit
+        with np.errstate(invalid='ignore'):
+            amount = self.value * multiplier * display_factors
+            to_tsp = converted & (unit_ids == CUPS) & (amount < CUPS_TO_TSP_BELOW)
+            to_tbsp = to_tsp & (amount * self.tsp_per_cup >= TSP_TO_TBSP_FROM)
+            to_lb = converted & (unit_ids == OZ) & (amount >= OZ_TO_LB_FROM)
+        large_value_multiplier = np.ones(len(self.ingredients))
+        large_value_multiplier[to_tsp] = self.tsp_per_cup
+        large_value_multiplier[to_tbsp] = self.tbsp_per_cup
+        large_value_multiplier[to_lb] = self.lb_per_oz
+        shown_unit_ids = unit_ids.copy()
+        shown_unit_ids[to_tsp] = TSP
+        shown_unit_ids[to_tbsp] = TBSP
+        shown_unit_ids[to_lb] = LB
+
+        # Converted amounts keep 2 decimal places, amounts only scaled keep 3
+        places = np.where(converted, 100.0, 1000.0)
+        factor = np.where(converted, multiplier * display_factors * large_value_multiplier, multiplier * self.unit_factor) * places
+        lower = self.value * factor
+        upper = self.upper * factor
+        has_upper = ~np.isnan(self.upper)
+        with np.errstate(invalid='ignore'):
+            inexact = (converted | rescaled) & (
+                near_rounding_tie(lower) | (has_upper & near_rounding_tie(upper))
+                | (converted & (unit_ids == CUPS) & (near(amount, CUPS_TO_TSP_BELOW) | near(amount * self.tsp_per_cup, TSP_TO_TBSP_FROM)))
+                | (converted & (unit_ids == OZ) & near(amount, OZ_TO_LB_FROM))
+            )
+        lower = np.rint(np.nan_to_num(lower)).astype(np.int64).tolist()
+        upper = np.where(has_upper, np.rint(np.nan_to_num(upper)), -1).astype(np.int64).tolist()
+        denominators = places.astype(np.int64).tolist()
+        # Sent as numbers when only converted, as strings once scaled (see Quantity.format)
+        decimals = np.where(converted & ~scaled, 2, 3).tolist()
+        shown_units = [self.units[unit_id] for unit_id in shown_unit_ids.tolist()]
+        recipe_ids = self.recipe_ids.tolist()
+        computed = (converted | rescaled).tolist()
+        converted = converted.tolist()
+        inexact = inexact.tolist()
+
+        # The same amounts turn up over and over ("2", "0.5"...), each distinct one is made into a Fraction once
+        fractions = {}
+
+        def fraction(numerator, denominator):
+            key = (numerator, denominator)
+            value = fractions.get(key)
+            if value is None:
+                value = fractions[key] = Fraction(numerator, denominator)
+            return value
+
+        rows = [[] for _ in self.servings]
+        for row, ingredient in enumerate(self.ingredients):
+            recipe_id = recipe_ids[row]
+            if inexact[row]:
+                view = ingredient.view(unit_type, requested[recipe_id], self.servings[recipe_id])
+            elif computed[row]:
+                denominator = denominators[row]
+                quantity = Quantity(fraction(lower[row], denominator), fraction(upper[row], denominator) if upper[row] >= 0 else None, decimals=decimals[row])
+                view = [quantity, shown_units[row] if converted[row] else ingredient.unit, ingredient.name]
+            else:
+                view = [ingredient.quantity, ingredient.unit, ingredient.name]
+            rows[recipe_id].append(view)
+        return rows
+
+def batch_ingredient_views(recipes, unit_type, requested_serving_sizes=None):
+    """ingredient_views for many recipes at once, recipes is a list of (base_ingredients, servings)"""
+    return IngredientBatch(recipes).views(unit_type, requested_serving_sizes)
@@ -0,0 +1,48 @@
+from fractions import Fraction
+from logic.unit_graph import UNITS
+from logic.ingredient_base import serving_count
+from logic.ingredient_density import ingredient_density, grams_per_ml
+
+# Bumped whenever the layout below changes, the frontend falls back to the conversion endpoints for versions it doesn't know
+CONVERSION_MODEL_VERSION = 1
+
+def ratio_to_text(number):
+    # Exact numbers go to the client as "numerator/denominator" text, JSON numbers would lose precision past 2 ** 53
+    if number is None:
+        return None
+    number = Fraction(number)
+    return str(number.numerator) if number.denominator == 1 else '{}/{}'.format(number.numerator, number.denominator)
+
+def conversion_model(base_ingredients, servings, original_unit_type):
+    """
+    Everything the frontend needs to scale and convert the ingredients itself, with the same results as
+    ingredient_views (see recipe-scraper-frontend/src/ingredientConversion.mjs)
+
+    units is the conversion factor table: unit -> [dimension, how many of the dimension's base unit make one
+    unit]. Each ingredient is a positional row:
+        [quantity as scraped, unit, name, per serving amount in the base unit, per serving range upper end,
+         factor from the base unit back to the scraped unit, dimension, grams per ml (the ingredient's density, None
+         when it isn't in the table), {unit type: [display unit, factor from the base unit]}]
+    The amounts are None for ingredients that are never scaled or converted.
+    """
+    ingredients = []
+    for ingredient in base_ingredients or ():
+        density = ingredient_density(ingredient.name) if ingredient.display_units else None
+        ingredients.append([
+            ingredient.quantity.format() if ingredient.quantity else None,
+            ingredient.unit,
+            ingredient.name,
+            ratio_to_text(ingredient.per_serving),
+            ratio_to_text(ingredient.per_serving_upper),
+            ratio_to_text(ingredient.unit_factor) if ingredient.per_serving is not None else None,
+            UNITS[ingredient.base_unit][0] if ingredient.base_unit else None,
+            grams_per_ml(density) if density else None,
+            {unit_type: [unit, ratio_to_text(factor)] for unit_type, (unit, factor) in ingredient.display_units.items()}
+        ])
+    return {
+        'version': CONVERSION_MODEL_VERSION,
+        'servings': serving_count(servings),
+        'original_unit_type': original_unit_type,
+        'units': {unit: [dimension, ratio_to_text(factor)] for unit, (dimension, factor) in UNITS.items()},
+        'ingredients': ingredients
+    }
@@ -0,0 +1,90 @@
+import re
+import heapq
+from operator import itemgetter
+from collections import defaultdict
+from bs4 import Tag, NavigableString
+
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+# The class/id labels the extractors look for, matched the same way as soup.find_all(..., {'class': re.compile(...)})
+VOCABULARIES = {
+    'ingredient': re.compile(r'ingredient', re.I),
+    'instruction': re.compile(r'instruction|direction|step', re.I),
+    'title': re.compile(r'title|heading|recipe-name', re.I)
+}
+
+class DomIndex:
+    """
+    Everything the extractors look up across the whole page, built in one traversal of the soup.
+
+    Elements are bucketed by tag and by which vocabulary their id/class matches, all in document
+    order, so the extractors don't each re-walk the tree with their own find_all and regex filters.
+    The visible text nodes are kept in document order too.
+    """
+
+    def __init__(self, soup):
+        self.by_tag = defaultdict(list)
+        self.id_matches = {vocabulary: [] for vocabulary in VOCABULARIES}
+        self.class_matches = {vocabulary: [] for vocabulary in VOCABULARIES}
+        self.elements = []
+        self.positions = {}
+        self.text_nodes = []
+        self._heading_texts = {}
+
+        position = 0
+        for element in soup.descendants:
+            if not isinstance(element, Tag):
+                # Plain strings only, script/style contents and comments are NavigableString subclasses
+                if type(element) is NavigableString and element.strip():
+                    self.text_nodes.append(element)
+                continue
+            entry = (position, element)
+            self.elements.append(element)
+            self.positions[id(element)] = position
+            self.by_tag[element.name].append(entry)
+
+            element_id = element.get('id')
+            if element_id:
+                for vocabulary, pattern in VOCABULARIES.items():
+                    if pattern.search(element_id):
+                        self.id_matches[vocabulary].append(entry)
+
+            classes = element.get('class')
+            if classes:
+                class_string = ' '.join(classes) if isinstance(classes, list) else classes
+                for vocabulary, pattern in VOCABULARIES.items():
+                    if pattern.search(class_string):
+                        self.class_matches[vocabulary].append(entry)
+            position += 1
+
+    def find_all(self, names):
+        """Same as soup.find_all(names) for tag names, in document order"""
+        if isinstance(names, str):
+            return [element for _, element in self.by_tag.get(names, [])]
+        buckets = [self.by_tag.get(name, []) for name in names]
+        return [element for _, element in heapq.merge(*buckets, key=itemgetter(0))]
+
+    def with_id(self, vocabulary, names):
+        """Same as soup.find_all(names, id=<vocabulary pattern>)"""
+        names = (names,) if isinstance(names, str) else names
+        return [element for _, element in self.id_matches[vocabulary] if element.name in names]
+
+    def with_class(self, vocabulary, names):
+        """Same as soup.find_all(names, {'class': <vocabulary pattern>})"""
+        names = (names,) if isinstance(names, str) else names
+        return [element for _, element in self.class_matches[vocabulary] if element.name in names]
+
+    def heading_text(self, heading):
+        # Lowercased text of a heading, shared by the ingredients and steps heading searches
+        text = self._heading_texts.get(id(heading))
+        if text is None:
+            text = self._heading_texts[id(heading)] = heading.text.lower()
+        return text
+
+    def headings_containing(self, keywords):
+        """The h1-h6 headings whose text contains any of the keywords, in document order"""
+        return [heading for heading in self.find_all(HEADING_TAGS) if any(keyword.lower() in self.heading_text(heading) for keyword in keywords)]
+
+    def position(self, element):
+        """Document order of an element, None if it wasn't in the page when the index was built"""
+        return self.positions.get(id(element))
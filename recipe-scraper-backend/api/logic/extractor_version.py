@@ -0,0 +1,19 @@
+import os
+import hashlib
+
+# Hash of the extraction logic and the constants and data it depends on, so anything cached from an older version of the extractors is never reused
+def compute_extractor_version():
+    api_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    logic_dir = os.path.join(api_dir, 'logic')
+    paths = sorted(os.path.join(logic_dir, name) for name in os.listdir(logic_dir) if name.endswith('.py'))
+    paths.append(os.path.join(api_dir, 'constants.py'))
+    paths.append(os.path.join(api_dir, 'data', 'ingredient_densities.csv'))
+
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(os.path.basename(path).encode('utf-8'))
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+EXTRACTOR_VERSION = compute_extractor_version()
@@ -0,0 +1,111 @@
+from html import escape
+from lxml import etree
+from bs4.dammit import UnicodeDammit
+
+# Subtrees that never contribute to recipe extraction
+PRUNED_TAGS = {'script', 'style', 'svg', 'noscript', 'iframe', 'template', 'canvas', 'object', 'nav'}
+
+# Containers for ads, comment sections and share buttons, matched against whole class/id tokens so
+# wrappers like "adthrive-content" (which hold the post itself) are kept
+PRUNED_CLASS_TOKENS = {
+    'ad', 'ads', 'advert', 'advertisement', 'adsbygoogle', 'ad-slot', 'ad-container', 'ad-wrapper', 'ad-unit',
+    'adthrive-ad', 'mv-ad-box', 'sponsored', 'comments', 'comments-area', 'comment-list', 'commentlist',
+    'comment-respond', 'share', 'share-buttons', 'social-share', 'sharedaddy'
+}
+PRUNED_IDS = {'comments', 'respond', 'disqus_thread'}
+
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+RAW_TEXT_TAGS = {'script', 'style'}
+
+def is_json_ld(tag, attrib):
+    return tag == 'script' and attrib.get('type', '').strip().lower() == 'application/ld+json'
+
+def is_pruned(tag, attrib):
+    if tag in PRUNED_TAGS:
+        return not is_json_ld(tag, attrib)
+    if attrib.get('id', '').strip().lower() in PRUNED_IDS:
+        return True
+    return any(token in PRUNED_CLASS_TOKENS for token in attrib.get('class', '').lower().split())
+
+class PruningTarget:
+    """
+    lxml parser target that re-serializes the page as it is parsed, leaving out the pruned subtrees.
+
+    Only the parser events go through here, the full lxml tree is never built. JSON-LD scripts are
+    always kept, even when they sit inside a pruned container.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.nodes_before = 0
+        self.nodes_after = 0
+        self._skip_depth = 0  # > 0 while inside a pruned subtree
+        self._raw_text_depth = 0
+        self._json_ld_depth = 0  # > 0 while keeping a JSON-LD script found inside a pruned subtree
+
+    def _emit_start(self, tag, attrib):
+        self.nodes_after += 1
+        attributes = ''.join(' {}="{}"'.format(name, escape(value, quote=True)) for name, value in attrib.items())
+        self.parts.append('<{}{}>'.format(tag, attributes))
+        if tag in RAW_TEXT_TAGS:
+            self._raw_text_depth += 1
+
+    def start(self, tag, attrib):
+        self.nodes_before += 1
+        if self._skip_depth:
+            self._skip_depth += 1
+            if is_json_ld(tag, attrib):
+                self._json_ld_depth = self._skip_depth
+                self._emit_start(tag, attrib)
+            return
+        if is_pruned(tag, attrib):
+            self._skip_depth = 1
+            return
+        self._emit_start(tag, attrib)
+
+    def end(self, tag):
+        if self._skip_depth:
+            if self._json_ld_depth == self._skip_depth:
+                self._json_ld_depth = 0
+                self._raw_text_depth -= 1
+                self.parts.append('</script>')
+            self._skip_depth -= 1
+            return
+        if tag in RAW_TEXT_TAGS:
+            self._raw_text_depth -= 1
+        if tag not in VOID_TAGS:
+            self.parts.append('</{}>'.format(tag))
+
+    def data(self, data):
+        if self._skip_depth and not self._json_ld_depth:
+            return
+        # Script text is kept as is, escaping it would break the JSON-LD
+        self.parts.append(data if self._raw_text_depth else escape(data, quote=False))
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return ''.join(self.parts)
+
+# FUNCTION TO DROP THE PARTS OF A PAGE THAT NEVER CONTAIN THE RECIPE BEFORE BEAUTIFULSOUP BUILDS THE TREE
+# Returns the pruned HTML and the bytes/node counts before and after
+def prune_html(content):
+    markup = content if isinstance(content, str) else UnicodeDammit(content, is_html=True).unicode_markup
+    bytes_before = len(content) if isinstance(content, bytes) else len(content.encode('utf-8'))
+    # An empty or undecodable body has nothing to prune, and lxml refuses to parse an empty string
+    if not markup or not markup.strip():
+        return '', {'bytes_before': bytes_before, 'bytes_after': 0, 'nodes_before': 0, 'nodes_after': 0}
+
+    target = PruningTarget()
+    parser = etree.HTMLParser(target=target, recover=True)
+    parser.feed(markup)
+    pruned = parser.close()
+
+    stats = {
+        'bytes_before': bytes_before,
+        'bytes_after': len(pruned.encode('utf-8')),
+        'nodes_before': target.nodes_before,
+        'nodes_after': target.nodes_after
+    }
+    return pruned, stats
@@ -0,0 +1,130 @@
+import re
+from constants import to_si_conversion, to_metric_conversion
+from logic.quantity import Quantity, number_to_data, number_from_data
+from logic.recipe_units import conversion_target, convert_large_vals
+from logic.unit_graph import exact, to_base_unit
+
+UNIT_TYPE_CONVERSIONS = (('si', to_si_conversion), ('metric', to_metric_conversion))
+
+# FUNCTION TO GET THE NUMBER OF SERVINGS THE SCRAPED AMOUNTS ARE FOR, eg. "4-6 servings" -> 4, None if it doesn't say
+def serving_count(servings):
+    match = re.search(r'\d+', str(servings)) if servings else None
+    return int(match[0]) or None if match else None
+
+class BaseIngredient:
+    """
+    An ingredient prepared once at scrape time, so showing it for any serving size or unit type is a
+    multiply and a lookup.
+
+    per_serving (and per_serving_upper for ranges) is the amount for one serving in base_unit: 'g', 'ml',
+    or None when the ingredient is counted in its own unit (cloves, tbsp, no unit...). unit_factor turns
+    it back into the scraped unit. display_units holds the unit and the factor from the base unit for the
+    unit types the ingredient gets converted in. quantity is the Quantity as scraped, shown as long as
+    nothing is scaled or converted.
+    """
+
+    __slots__ = ('quantity', 'unit', 'name', 'base_unit', 'per_serving', 'per_serving_upper', 'unit_factor', 'display_units')
+
+    def __init__(self, quantity, unit, name, base_unit=None, per_serving=None, per_serving_upper=None, unit_factor=1, display_units=None):
+        self.quantity = quantity
+        self.unit = unit
+        self.name = name
+        self.base_unit = base_unit
+        self.per_serving = per_serving
+        self.per_serving_upper = per_serving_upper
+        self.unit_factor = unit_factor
+        self.display_units = display_units or {}
+
+    @classmethod
+    def prepare(cls, quantity, unit, name, servings, original_unit_type):
+        """
+        Args:
+            quantity: The scraped Quantity, or None
+            servings: serving_count() of the recipe, None if unknown (the amounts are then kept for the whole recipe)
+            original_unit_type: From extract_units, the unit type that is shown without converting
+        """
+        if quantity is None or quantity.value is None:
+            return cls(quantity, unit, name)
+
+        if unit in ("cup", "cups"):
+            base_unit, to_base = conversion_target(unit, name, to_si_conversion)
+        else:
+            base_unit, to_base = to_base_unit(unit) or (None, 1)
+        to_base = exact(to_base)
+        per_serving_factor = to_base / (servings or 1)
+
+        # Same conversions as convert_units, with the factors taken from the base unit
+        display_units = {}
+        for unit_type, conversion_dict in UNIT_TYPE_CONVERSIONS:
+            target = conversion_target(unit, name, conversion_dict) if unit_type != original_unit_type else None
+            if target:
+                display_units[unit_type] = (target[0], exact(target[1]) / to_base)
+
+        return cls(quantity, unit, name, base_unit, exact(quantity.value) * per_serving_factor,
+                   None if quantity.upper is None else exact(quantity.upper) * per_serving_factor, 1 / to_base, display_units)
+
+    def view(self, unit_type, requested_serving_size, servings):
+        """
+        The [quantity, unit, name] row for a unit type and serving size
+
+        Args:
+            unit_type: 'si' or 'metric', anything else (or the original unit type) shows the scraped units
+            requested_serving_size: Fraction, None to show the amounts for the scraped serving size
+            servings: serving_count() of the recipe
+        """
+        if self.per_serving is None:
+            return [self.quantity, self.unit, self.name]
+        scaled = requested_serving_size is not None and servings is not None
+        multiplier = requested_serving_size if scaled else (servings or 1)
+
+        display = self.display_units.get(unit_type)
+        if display is None:
+            if not scaled:
+                return [self.quantity, self.unit, self.name]
+            factor = multiplier * self.unit_factor
+            return [self.amount(factor, 3, 3), self.unit, self.name]
+
+        unit, factor = display
+        factor = multiplier * factor
+        # a range is shown in the unit picked for its lower end
+        unit, large_value_multiplier = convert_large_vals(unit, self.per_serving * factor)
+        # Converted amounts are rounded to 2 decimal places, sent as numbers unless they were scaled too
+        return [self.amount(factor * exact(large_value_multiplier), 2, 3 if scaled else 2), unit, self.name]
+
+    def amount(self, factor, digits, decimals):
+        upper = None if self.per_serving_upper is None else round(self.per_serving_upper * factor, digits)
+        return Quantity(round(self.per_serving * factor, digits), upper, decimals=decimals)
+
+    def to_data(self):
+        """JSON-friendly form for the session and the result cache"""
+        return [
+            self.quantity.to_data() if self.quantity else None, self.unit, self.name, self.base_unit,
+            number_to_data(self.per_serving), number_to_data(self.per_serving_upper), number_to_data(self.unit_factor),
+            {unit_type: [unit, number_to_data(factor)] for unit_type, (unit, factor) in self.display_units.items()}
+        ]
+
+    @classmethod
+    def from_data(cls, data):
+        quantity, unit, name, base_unit, per_serving, per_serving_upper, unit_factor, display_units = data
+        return cls(Quantity.from_data(quantity) if quantity else None, unit, name, base_unit, number_from_data(per_serving),
+                   number_from_data(per_serving_upper), number_from_data(unit_factor),
+                   {unit_type: (unit, number_from_data(factor)) for unit_type, (unit, factor) in display_units.items()})
+
+def prepare_ingredients(ingredients, servings, original_unit_type):
+    """BaseIngredients for the rows from extract_units"""
+    if ingredients is None:
+        return None
+    count = serving_count(servings)
+    return [BaseIngredient.prepare(quantity, unit, name, count, original_unit_type) for quantity, unit, name in ingredients]
+
+def ingredient_views(base_ingredients, unit_type, requested_serving_size, servings):
+    """The ingredient rows to show for a unit type and serving size, see BaseIngredient.view"""
+    count = serving_count(servings)
+    requested = None if requested_serving_size is None else exact(requested_serving_size)
+    return [ingredient.view(unit_type, requested, count) for ingredient in base_ingredients]
+
+def base_ingredients_to_data(base_ingredients):
+    return None if base_ingredients is None else [ingredient.to_data() for ingredient in base_ingredients]
+
+def base_ingredients_from_data(data):
+    return None if data is None else [BaseIngredient.from_data(ingredient) for ingredient in data]
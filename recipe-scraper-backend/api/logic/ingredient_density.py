@@ -0,0 +1,116 @@
+import os
+import csv
+from collections import deque, namedtuple
+from logic.unit_graph import UNITS
+
+# grams_per_cup and whether the ingredient is poured (liquid, cups go to ml) or not (solid, cups go to g)
+IngredientDensity = namedtuple('IngredientDensity', ['name', 'grams_per_cup', 'liquid'])
+
+DENSITY_TABLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'ingredient_densities.csv')
+
+ML_PER_CUP = float(UNITS['cup'][1])
+
+def grams_per_ml(density):
+    return density.grams_per_cup / ML_PER_CUP
+
+def load_densities(path=DENSITY_TABLE_PATH):
+    # name,grams_per_cup,kind rows, kind is liquid or solid
+    with open(path, encoding='utf-8', newline='') as f:
+        return [IngredientDensity(row['name'].lower(), float(row['grams_per_cup']), row['kind'] == 'liquid') for row in csv.DictReader(f)]
+
+def name_variants(name):
+    # The name as written plus the other number of its last word, eg. "carrots" -> "carrot", "cranberry" -> "cranberries"
+    variants = {name}
+    if name.endswith('ies'):
+        variants.add(name[:-3] + 'y')
+    elif name.endswith('oes'):
+        variants.add(name[:-2])
+    elif name.endswith('s') and not name.endswith('ss'):
+        variants.add(name[:-1])
+    elif name.endswith('y') and name[-2:-1] not in 'aeiou':
+        variants.add(name[:-1] + 'ies')
+    elif name.endswith('o'):
+        variants.add(name + 'es')
+    else:
+        variants.add(name + 's')
+    return variants
+
+class DensityIndex:
+    """
+    Finds the density of an ingredient from its name in one pass over the name, however big the table is.
+
+    An Aho-Corasick automaton over every ingredient name in the table (and their singular/plural forms),
+    built once. Scanning a name follows one transition per character and reports every table name ending
+    there, so the cost depends on the length of the name and not on the number of entries. Only whole
+    words match ("water" isn't found in "watermelon"), and the longest match wins so "coconut milk" beats
+    "milk". Between matches of the same length the last one wins, the ingredient usually comes last
+    ("sugar-coated almonds").
+    """
+
+    def __init__(self, densities):
+        self.transitions = [{}]
+        self.fail = [0]
+        self.match = [None]  # node -> (length, density) of the table name ending at the node
+        self.next_match = [0]  # node -> nearest node down the fail links with a match, 0 if none
+        self.size = 0
+
+        for density in densities:
+            for variant in name_variants(density.name):
+                self.add(variant, density)
+        self.link()
+
+    def add(self, keyword, density):
+        node = 0
+        for char in keyword:
+            following = self.transitions[node].get(char)
+            if following is None:
+                following = len(self.transitions)
+                self.transitions[node][char] = following
+                self.transitions.append({})
+                self.fail.append(0)
+                self.match.append(None)
+                self.next_match.append(0)
+            node = following
+        # A name listed twice keeps its first density, variants never override a name written out in the table
+        if self.match[node] is None:
+            self.match[node] = (len(keyword), density)
+            self.size += 1
+
+    def link(self):
+        # Breadth first so every node's fail link points at an already linked, shallower node
+        queue = deque(self.transitions[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.transitions[node].items():
+                fail = self.fail[node]
+                while fail and char not in self.transitions[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.transitions[fail].get(char, 0)
+                self.next_match[child] = self.fail[child] if self.match[self.fail[child]] else self.next_match[self.fail[child]]
+                queue.append(child)
+
+    def find(self, name):
+        """The IngredientDensity for an ingredient name, None if nothing in the table appears in it"""
+        text = name.lower()
+        transitions, fail, match, next_match = self.transitions, self.fail, self.match, self.next_match
+        last = len(text) - 1
+        best = None
+        node = 0
+        for end, char in enumerate(text):
+            while node and char not in transitions[node]:
+                node = fail[node]
+            node = transitions[node].get(char, 0)
+            found = node if match[node] else next_match[node]
+            while found:
+                length, density = match[found]
+                start = end - length + 1
+                if (best is None or length >= best[0]) and (start == 0 or not text[start - 1].isalnum()) and (end == last or not text[end + 1].isalnum()):
+                    best = (length, density)
+                found = next_match[found]
+        return best[1] if best else None
+
+DENSITY_INDEX = DensityIndex(load_densities())
+
+# FUNCTION TO LOOK UP HOW MUCH A CUP OF AN INGREDIENT WEIGHS
+def ingredient_density(name):
+    return DENSITY_INDEX.find(name) if name else None
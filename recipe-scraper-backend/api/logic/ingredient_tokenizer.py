@@ -0,0 +1,132 @@
+import re
+from constants import common_units, fraction_conversions
+
+# Everything below is built once at import time, tokenizing a line only runs the compiled patterns and table lookups
+
+# The quantity and unit word tables fill up as lines are tokenized, both come from small vocabularies
+# ("1 1/2", "2-3", "cups", "tablespoonsbutter"...) but stop growing at this many entries
+TOKEN_TABLE_LIMIT = 4096
+
+# Quantity (numbers, unicode fractions, ranges), then the first word (the unit, if it is one), then the rest of the line
+INGREDIENT_LINE_PATTERN = re.compile(r'^((?:\d+\s*)?(?:\d*½|\d*¼|\d*[¾¾]|\d*⅛|\d*⅔|\d+\s*[/–-]|to\s*\d+)?[\s\d/–-]*)?[\s]*(?:([a-zA-Z]+)\b)?[\s]*(.*)$')
+
+# A unit at the start of the word after the quantity, eg. "cupwhole" -> "cup" + "whole". The alternatives are tried
+# in common_units order
+UNIT_PREFIX_PATTERN = re.compile(r'^({})'.format('|'.join(common_units)))
+
+# Units standing on their own somewhere in the name, for lines where the word after the quantity isn't one.
+# The longest unit wins, not the first one in the line
+NAME_UNITS = sorted(common_units, key=len, reverse=True)
+NAME_UNIT_PATTERNS = [(unit, re.compile(r'\b' + re.escape(unit) + r'\b', re.IGNORECASE)) for unit in NAME_UNITS]
+
+def trie_pattern(words):
+    # Alternation with the shared prefixes factored out ("cup|cups|can" -> "c(?:an|ups?)" roughly), so the regex
+    # engine doesn't retry every unit at every position
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word.lower():
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        end = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if end:
+            return '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+# Whether any unit stands on its own in the name at all, most names don't have one
+ANY_NAME_UNIT_PATTERN = re.compile(r'\b' + trie_pattern(NAME_UNITS) + r'\b', re.IGNORECASE)
+
+COMMON_UNITS = frozenset(common_units)
+
+# "½" -> "1/2" as one str.translate, then "1/2" -> "0.5" with one regex pass
+UNICODE_FRACTIONS = str.maketrans({fraction: text for fraction, text in fraction_conversions.items() if len(fraction) == 1})
+ASCII_FRACTIONS = {fraction: decimal for fraction, decimal in fraction_conversions.items() if len(fraction) > 1}
+ASCII_FRACTION_PATTERN = re.compile('|'.join(re.escape(fraction) for fraction in ASCII_FRACTIONS))
+
+RANGE_SEPARATORS = ('-', '–')
+
+# eg. the "(50ml)" in "1 cup (50ml) of water", it won't get converted
+BRACKETED_QUANTITY_PATTERN = re.compile(r'[\(\[]\s*\d+\s*[a-zA-Z]*\s*[\)\]]')
+
+def replace_fractions(quantity):
+    quantity = quantity.translate(UNICODE_FRACTIONS)
+    slashes = quantity.count('/')
+    if not slashes:
+        return quantity
+    if slashes > 1:
+        # Overlapping fractions like "1/3/4" come out differently depending on which one is replaced
+        # first, keep the fraction_conversions order
+        for fraction, decimal in ASCII_FRACTIONS.items():
+            quantity = quantity.replace(fraction, decimal)
+        return quantity
+    return ASCII_FRACTION_PATTERN.sub(lambda match: ASCII_FRACTIONS[match.group(0)], quantity)
+
+def normalize_quantity(quantity):
+    if any(separator in quantity for separator in RANGE_SEPARATORS):
+        return quantity.replace(" ", "")
+    if 'to' in quantity:
+        return quantity.replace(" ", "").replace('to', '-')
+    quantity = quantity.strip()
+    return replace_fractions(quantity) if quantity else None
+
+def split_unit_word(word):
+    # Returns the unit at the start of the word after the quantity (None if it doesn't start with one)
+    # and the text that goes in front of the name
+    prefix = UNIT_PREFIX_PATTERN.match(word)
+    if prefix:
+        rest = word[prefix.end():]
+        # If unit is 'g' and next letter is vowel, treat whole as name, for example "garlic" vs "gchicken"
+        if prefix.group(1) == 'g' and rest and rest[:1].lower() in 'aeiour':
+            return None, word
+        return prefix.group(1), rest
+    if word.lower() not in COMMON_UNITS:
+        return None, word
+    return word, ''
+
+quantity_table = {}
+unit_word_table = {}
+
+def lookup(table, key, build):
+    try:
+        return table[key]
+    except KeyError:
+        value = build(key)
+        if len(table) < TOKEN_TABLE_LIMIT:
+            table[key] = value
+        return value
+
+# FUNCTION TO SPLIT ONE INGREDIENT LINE INTO [QUANTITY, UNIT, NAME]
+def tokenize_ingredient(line):
+    quantity, word, name = INGREDIENT_LINE_PATTERN.match(line).groups()
+    quantity = lookup(quantity_table, quantity, normalize_quantity) if quantity else None
+    unit = None
+
+    if word:
+        unit, name_prefix = lookup(unit_word_table, word, split_unit_word)
+        if name_prefix:
+            name = name_prefix + " " + name
+    elif ANY_NAME_UNIT_PATTERN.search(name):
+        # the unit may be stuck directly to the ingredient name without any spacing, so filter whether the name contains any common units
+        lowered = name.lower()
+        for candidate, pattern in NAME_UNIT_PATTERNS:
+            if candidate in lowered:
+                match = pattern.search(name)
+                if match:
+                    unit = match.group(0)
+                    name = pattern.sub('', name, count=1).strip()
+                    break
+        if unit and unit.lower() not in COMMON_UNITS:
+            name = unit + " " + name
+            unit = None
+
+    if '(' in name or '[' in name:
+        name = BRACKETED_QUANTITY_PATTERN.sub('', name)
+    return [quantity, unit, name.strip()]
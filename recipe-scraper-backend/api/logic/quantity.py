@@ -0,0 +1,144 @@
+from fractions import Fraction
+from constants import quantity_separators
+from logic.ingredient_tokenizer import UNICODE_FRACTIONS
+
+# FUNCTION TO READ ONE SIDE OF A QUANTITY, eg. "1 0.5" or "1 1/2" -> 3/2, None if it isn't a number
+def parse_number(text):
+    parts = text.translate(UNICODE_FRACTIONS).split()
+    if not parts:
+        return None
+    try:
+        return sum(Fraction(part) for part in parts)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+def format_decimal(number, decimals):
+    # Scaled quantities drop a trailing ".0", converted ones have always kept it
+    text = str(float(number))
+    return text[:-2] if decimals == 3 and text.endswith(".0") else text
+
+class Quantity:
+    """
+    An ingredient quantity: a number, or a range when upper is set.
+
+    The numbers are exact Fractions as parsed from the page, and floats once multiplied by a unit conversion
+    factor. display is how the quantity was written and is shown until it is scaled or converted. After that it
+    is shown with decimals decimal places (3 once scaled, 2 once converted).
+
+    Quantities are immutable, so parsed lines, cached recipes and sessions can share them.
+    """
+
+    __slots__ = ('value', 'upper', 'display', 'decimals')
+
+    def __init__(self, value, upper=None, display=None, decimals=None):
+        set_attribute = object.__setattr__
+        set_attribute(self, 'value', value)
+        set_attribute(self, 'upper', upper)
+        set_attribute(self, 'display', display)
+        set_attribute(self, 'decimals', decimals)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Quantity is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Quantity is immutable")
+
+    def __reduce__(self):
+        # Pickled (process workers) and copied through the constructor, not by setting the slots
+        return (Quantity, (self.value, self.upper, self.display, self.decimals))
+
+    @classmethod
+    def parse(cls, quantity):
+        """
+        Quantity from a quantity string ("2", "1 0.5", "2-3", "5 to 6") or a number, None when there is no quantity.
+        Quantities that can't be read as numbers keep their text and are never scaled or converted.
+        """
+        if isinstance(quantity, Quantity):
+            return quantity
+        if not quantity:
+            return None
+        if isinstance(quantity, (int, float)):
+            return cls(quantity, display=quantity)
+
+        for separator in quantity_separators:
+            if separator in quantity:
+                parts = quantity.replace(" ", "").split(separator)
+                break
+        else:
+            parts = [quantity]
+        numbers = [parse_number(part) for part in parts]
+        if len(numbers) > 2 or any(number is None for number in numbers):
+            return cls(None, display=quantity)
+        return cls(numbers[0], numbers[1] if len(numbers) == 2 else None, display=quantity)
+
+    def scaled(self, servings, requested_serving_size):
+        """The quantity for requested_serving_size servings instead of servings, rounded to 3 decimal places"""
+        if self.value is None:
+            return self
+
+        def scale(number):
+            return round(number / servings * requested_serving_size, 3)
+
+        return Quantity(scale(self.value), None if self.upper is None else scale(self.upper), decimals=3)
+
+    def converted(self, factor):
+        """The quantity multiplied by a unit conversion factor, rounded to 2 decimal places"""
+        if self.value is None:
+            return self
+        return Quantity(round(self.value * factor, 2), None if self.upper is None else round(self.upper * factor, 2), decimals=2)
+
+    def format(self):
+        """The quantity as the endpoints send it"""
+        if self.decimals is None:
+            return self.display
+        if self.upper is None:
+            # Converted quantities have always been sent as numbers, scaled ones as strings
+            return float(self.value) if self.decimals == 2 else format_decimal(self.value, self.decimals)
+        return format_decimal(self.value, self.decimals) + '-' + format_decimal(self.upper, self.decimals)
+
+    def to_data(self):
+        """JSON-friendly form for the session and the result cache, Fractions become [numerator, denominator]"""
+        return [number_to_data(self.value), number_to_data(self.upper), self.display, self.decimals]
+
+    @classmethod
+    def from_data(cls, data):
+        value, upper, display, decimals = data
+        return cls(number_from_data(value), number_from_data(upper), display, decimals)
+
+    def __eq__(self, other):
+        if not isinstance(other, Quantity):
+            return NotImplemented
+        return (self.value, self.upper, self.display, self.decimals) == (other.value, other.upper, other.display, other.decimals)
+
+    def __hash__(self):
+        return hash((self.value, self.upper, self.display, self.decimals))
+
+    def __repr__(self):
+        return 'Quantity({!r})'.format(self.format())
+
+def number_to_data(number):
+    if isinstance(number, Fraction):
+        return [number.numerator, number.denominator]
+    return number
+
+def number_from_data(data):
+    if isinstance(data, list):
+        return Fraction(*data)
+    return data
+
+# Ingredient rows are [quantity, unit, name] with quantity a Quantity or None
+def format_ingredients(ingredients):
+    """The rows with each quantity formatted for a response, the only place quantities become strings again"""
+    if ingredients is None:
+        return None
+    return [[quantity.format() if quantity else quantity, unit, name] for quantity, unit, name in ingredients]
+
+def ingredients_to_data(ingredients):
+    if ingredients is None:
+        return None
+    return [[quantity.to_data() if quantity else None, unit, name] for quantity, unit, name in ingredients]
+
+def ingredients_from_data(data):
+    if data is None:
+        return None
+    return [[Quantity.from_data(quantity) if quantity else None, unit, name] for quantity, unit, name in data]
@@ -0,0 +1,34 @@
+from bs4 import BeautifulSoup
+from logic.dom_index import DomIndex
+from logic.html_pruning import prune_html
+from logic.recipe_name import extract_recipe_name
+from logic.recipe_steps import extract_recipe_steps
+from logic.recipe_ingredients import extract_ingredients
+from logic.recipe_servings import get_serving_size
+
+RECIPE_FIELDS = ('name', 'steps', 'ingredients', 'servings')
+
+# FUNCTION TO PARSE A PAGE ONCE AND RUN THE DOM EXTRACTORS FOR THE REQUESTED FIELDS
+# Module level and only taking bytes/strings so it can also be shipped to worker processes
+# The bytes/node counts of the pruning stage come back under 'pruning'
+def extract_recipe_fields(content, recipe_url, fields=RECIPE_FIELDS):
+    # Drop scripts, styles, nav, ads, comments etc. so the tree the extractors walk is smaller
+    pruned_content, pruning = prune_html(content)
+    soup = BeautifulSoup(pruned_content, 'lxml')  # Using lxml parser for better performance
+    index = DomIndex(soup)  # One traversal shared by all the extractors
+
+    extracted = {'pruning': pruning}
+    for field in fields:
+        if field == 'name':
+            extracted[field] = extract_recipe_name(soup, recipe_url, index)
+        elif field == 'steps':
+            extracted[field] = extract_recipe_steps(soup, index)
+        elif field == 'ingredients':
+            extracted[field] = extract_ingredients(soup, index)
+        elif field == 'servings':
+            extracted[field] = get_serving_size(soup, index)
+    return extracted
+
+# Runs once in every extraction worker process so the first real page doesn't pay for the imports and parser setup
+def warm_extraction_worker():
+    extract_recipe_fields(b'<html><body><h1>Recipe</h1></body></html>', 'https://example.com/recipe', ('name',))
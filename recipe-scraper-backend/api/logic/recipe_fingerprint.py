@@ -0,0 +1,43 @@
+import re
+import hashlib
+from logic.recipe_structured_data import extract_json_ld_recipe
+
+word_pattern = re.compile(r'\w+')
+
+shingle_size = 3
+
+# Only the name, ingredients and steps of the JSON-LD Recipe block. The visible text of a page is mostly its site
+# template, so two different recipes on one template look near-identical there; pages without JSON-LD get no fingerprint
+def extract_recipe_region(content):
+    recipe = extract_json_ld_recipe(content)
+    if not recipe or not (recipe['name'] and recipe['ingredients'] and recipe['steps']):
+        return None
+    return " ".join([recipe['name']] + recipe['ingredients'] + recipe['steps'])
+
+def simhash(tokens):
+    hashes = [hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest() for token in tokens]
+    if not hashes:
+        return None
+
+    # Count the set bits per position column by column instead of looping over 64 bits per shingle in Python
+    bit_strings = [format(int.from_bytes(h, 'big'), '064b') for h in hashes]
+    threshold = len(bit_strings) / 2
+    fingerprint = 0
+    for column in zip(*bit_strings):
+        fingerprint = (fingerprint << 1) | (column.count('1') > threshold)
+    return fingerprint
+
+# FUNCTION TO FINGERPRINT THE RECIPE PART OF A PAGE SO NEAR-IDENTICAL COPIES ON MIRRORS MATCH EACH OTHER
+def content_fingerprint(content):
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+
+    region = extract_recipe_region(content)
+    if region is None:
+        return None
+    words = word_pattern.findall(region.lower())
+    shingles = [" ".join(words[i:i + shingle_size]) for i in range(max(len(words) - shingle_size + 1, 1))] if words else []
+    return simhash(shingles)
+
+def hamming_distance(fingerprint1, fingerprint2):
+    return bin(fingerprint1 ^ fingerprint2).count('1')
@@ -2,8 +2,11 @@ import re
 from urllib.parse import urlparse
 from constants import *
 from util.emoji_helper import emoji_map
+from logic.dom_index import DomIndex
+
+def extract_recipe_name(soup, recipe_url, index=None):
+    index = index or DomIndex(soup)
 
-def extract_recipe_name(soup, recipe_url):
     # Parse the URL to extract the recipe name
     recipe_url = recipe_url[:-1] if recipe_url.endswith('/') else recipe_url
     parsed_url = urlparse(recipe_url)
@@ -13,8 +16,8 @@ def extract_recipe_name(soup, recipe_url):
     recipe_name_from_url = recipe_name_from_url[0]
 
     # labelled with ID or class
-    title_html = [title.text.strip() + " " for title in soup.find_all(['h1', 'h2'], {'id': re.compile(r'.*(title|heading|recipe-name).*', re.I)})]
-    title_html += [title.text.strip() + " " for title in soup.find_all(['h1', 'h2'], {'class': re.compile(r'.*(title|heading|recipe-name).*', re.I)})]
+    title_html = [title.text.strip() + " " for title in index.with_id('title', ['h1', 'h2'])]
+    title_html += [title.text.strip() + " " for title in index.with_class('title', ['h1', 'h2'])]
     recipe_name_list = [item.strip() for item in title_html if item.strip().istitle()]
 
     # compare which title/heading is most similar to the url cause the url usually has the recipe name in it
@@ -1,87 +1,60 @@
 import re
 from constants import *
+from fractions import Fraction
+from logic.dom_index import DomIndex
+from logic.quantity import Quantity
 
-# FUNCTION TO GET THE SERVING SIZE OF THE RECIPE ON THE WEBSITE
-def get_serving_size(soup):
-    servings = None
-    elements = soup.find_all(['p', 'span', 'em', 'div'])
-    target_elements = [element for element in elements if any(keyword.lower() in element.text.lower() for keyword in ['serves', 'servings', 'yield', 'serving'])]
+serving_keyword_pattern = re.compile(r'\b(?:serves|servings?|yields?)\b', re.I)
+# The number right after the keyword, eg. "Servings: 4", "Serves 4-6", "Yield: about 12 cookies"
+serving_after_keyword_pattern = re.compile(r'\s*[:\-]?\s*(?:about|approx\.?|approximately|up to)?\s*(\d+)', re.I)
+# The number right before "servings", eg. "Makes 12 servings"
+serving_before_keyword_pattern = re.compile(r'(\d+)\s*$')
 
-    for element in target_elements:
-        numbers = re.findall(r'\d+', element.get_text())
-        if numbers:
-            text = element.get_text()
-            # check if the serving number is inside the same element as the word servings or yield etc
-            match = re.search(r'(?:Yields:|Serves:|Servings:|Yield:|Serving:)\s*(.+)', text, re.IGNORECASE)
-            if match:
-                text = match.group(1)
-                text = text.split(',') # split it just in case it comes together with the prep time etc
-                # if after splitting its still very long, then split it again by spaces cause it probably still contains some other irrelevant information
-                if len(text[0]) > 12:
-                    text[0] = text[0].split(' ', 1)
-                    servings = text[0][0]
-                    break
-                else:
-                    servings = text[0]
-                    break
-            # if not, check whether it is at the same level in the DOM structure (for both this and next method, extract a digit once its found)
-            else:
-                current_element = element.find_next()
-                while current_element:
-                    numbers = re.findall(r'\d+', current_element.get_text())
-                    if numbers and len(current_element.get_text()) < 10:
-                        servings = list(filter(str.isdigit, current_element.get_text()))[0]
-                        break
-                    current_element = current_element.find_next()
-                if servings is not None:
+SERVING_LABEL_MAX_LENGTH = 40  # Only short label-like texts ("Servings:") get their neighbours searched, not prose
+SERVING_NEIGHBOUR_TEXT_NODES = 6  # How many of the following text nodes to look at for the number
+SERVING_NUMBER_MAX_LENGTH = 10  # A neighbour holding the number is short, eg. "4" or "4 people"
+
+# FUNCTION TO GET THE SERVING SIZE OF THE RECIPE ON THE WEBSITE
+# One pass over the page's text nodes, each node is matched once and the search for a number in the nodes after a label is capped
+def get_serving_size(soup, index=None):
+    index = index or DomIndex(soup)
+    text_nodes = index.text_nodes
+    prose_servings = None  # eg. "this serves 3!" in a paragraph, only used when no label is found
+
+    for position, text in enumerate(text_nodes):
+        is_label = len(text.strip()) <= SERVING_LABEL_MAX_LENGTH
+        keyword_match = None
+        for keyword_match in serving_keyword_pattern.finditer(text):
+            # check if the serving number is inside the same text as the word servings or yield etc
+            number = serving_after_keyword_pattern.match(text, keyword_match.end())
+            if not number and keyword_match.group().lower().startswith('serving'):
+                number = serving_before_keyword_pattern.search(text, 0, keyword_match.start())
+            if number:
+                if is_label or text.startswith(':', keyword_match.end()):
+                    return number.group(1)
+                prose_servings = prose_servings or number.group(1)
+
+        # if not, check the text right after the label (eg. <p>Servings: </p><span>4</span>)
+        if keyword_match and is_label:
+            for neighbour in text_nodes[position + 1:position + 1 + SERVING_NEIGHBOUR_TEXT_NODES]:
+                if serving_keyword_pattern.search(neighbour):
                     break
-                # if also not, then check the next elements within the same parent
-                else:
-                    current_element = element.parent
-                    while current_element:
-                        numbers = re.findall(r'\d+', current_element.get_text())
-                        if numbers and len(current_element.get_text()) < 10:
-                            servings = list(filter(str.isdigit, current_element.get_text()))[0]
-                            break
-                        current_element = current_element.find_next()
-                    if servings is not None:
-                        break
+                neighbour = neighbour.strip()
+                number = re.search(r'\d+', neighbour)
+                if number and len(neighbour) < SERVING_NUMBER_MAX_LENGTH:
+                    return number.group()
 
-    match = re.search(r'\d+', servings)
-    return str(match.group()) if match else None
+    return prose_servings
 
+# Returns new ingredient rows with the quantities scaled from servings to requested_serving_size, the rows passed in are left as they are
 def calculate_servings(ingredients, servings, requested_serving_size):
-    for ingredient in ingredients:
-        quantity = ingredient[0]
-        if not quantity:
-            continue
-
-        for separator in quantity_separators:
-            if separator in str(quantity):
-                quantity = str(quantity).replace(" ", "")
-                quantity = quantity.split(separator)
-                break
-
-        def convert_fraction(q):
-            for unicode_fraction, decimal in fraction_conversions.items():
-                q = str(q).replace(unicode_fraction, decimal)
-            return q
-
-        def adjust_quantity(q):
-            q = sum(float(num_str) for num_str in q.split(" "))
-            base_quantity = q / float(servings)
-            temp_quantity = round((base_quantity * requested_serving_size), 3)
-            temp_quantity = str(temp_quantity)
-            # Convert decimals to fractions using the fraction_conversions dictionary
-            for decimal, fraction in fraction_conversions.items():
-                if decimal.replace("0.", ".") in temp_quantity:
-                    temp_quantity = temp_quantity.replace(decimal.replace("0.", "."), " " + fraction)
-            return temp_quantity[:-2] if temp_quantity.endswith(".0") else temp_quantity
+    # Exact ratios, so 1/3 cup for 3 people is 1 cup for 9
+    servings = Fraction(servings)
+    requested_serving_size = Fraction(requested_serving_size)
 
-        if isinstance(quantity, list):
-            new_quantity = [adjust_quantity(convert_fraction(q)) for q in quantity]
-            ingredient[0] = '-'.join(new_quantity)
-        else:
-            ingredient[0] = adjust_quantity(convert_fraction(quantity))
+    scaled_ingredients = []
+    for quantity, unit, name in ingredients:
+        quantity = Quantity.parse(quantity)
+        scaled_ingredients.append([quantity.scaled(servings, requested_serving_size) if quantity else None, unit, name])
 
-    return ingredients
\ No newline at end of file
+    return scaled_ingredients
@@ -0,0 +1,125 @@
+import re
+import json
+import html
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Scanning the raw bytes lets us read the JSON-LD blocks without building the full tree
+json_ld_pattern = re.compile(rb'<script[^>]*type\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>', re.I | re.S)
+microdata_recipe_pattern = re.compile(r'schema\.org/Recipe', re.I)
+microdata_recipe_bytes_pattern = re.compile(rb'schema\.org/Recipe', re.I)
+
+def clean_structured_text(text):
+    if text is None:
+        return None
+    text = html.unescape(str(text))
+    # some sites leave html tags inside the json strings
+    text = re.sub(r'<[^>]+>', ' ', text)
+    return " ".join(text.split())
+
+def is_recipe_type(item):
+    item_type = item.get('@type')
+    if isinstance(item_type, list):
+        return any(str(t).lower() == 'recipe' for t in item_type)
+    return str(item_type).lower() == 'recipe'
+
+# The Recipe object can be at the top level, inside a list, inside @graph or nested under mainEntity etc
+def find_recipe_object(data):
+    if isinstance(data, list):
+        for item in data:
+            recipe = find_recipe_object(item)
+            if recipe:
+                return recipe
+    elif isinstance(data, dict):
+        if is_recipe_type(data):
+            return data
+        for value in data.values():
+            if isinstance(value, (dict, list)):
+                recipe = find_recipe_object(value)
+                if recipe:
+                    return recipe
+    return None
+
+def flatten_instructions(instructions):
+    steps = []
+    if isinstance(instructions, str):
+        steps += [line for line in (clean_structured_text(part) for part in re.split(r'\n+', html.unescape(instructions))) if line]
+    elif isinstance(instructions, list):
+        for item in instructions:
+            steps += flatten_instructions(item)
+    elif isinstance(instructions, dict):
+        # HowToSection and ItemList keep their steps in itemListElement, HowToStep keeps it in text
+        if 'itemListElement' in instructions:
+            steps += flatten_instructions(instructions['itemListElement'])
+        else:
+            text = clean_structured_text(instructions.get('text') or instructions.get('name'))
+            if text:
+                steps.append(text)
+    return steps
+
+def parse_structured_yield(recipe_yield):
+    if isinstance(recipe_yield, list):
+        for item in recipe_yield:
+            servings = parse_structured_yield(item)
+            if servings:
+                return servings
+        return None
+    match = re.search(r'\d+', str(recipe_yield)) if recipe_yield is not None else None
+    return str(match.group()) if match else None
+
+def extract_json_ld_recipe(content):
+    for match in json_ld_pattern.finditer(content):
+        raw = match.group(1).decode('utf-8', errors='replace').strip()
+        if not raw:
+            continue
+        try:
+            data = json.loads(raw, strict=False)
+        except ValueError:
+            continue
+
+        recipe = find_recipe_object(data)
+        if recipe:
+            ingredients = recipe.get('recipeIngredient') or recipe.get('ingredients') or []
+            if isinstance(ingredients, str):
+                ingredients = [ingredients]
+            return {
+                'name': clean_structured_text(recipe.get('name')) or None,
+                'steps': flatten_instructions(recipe.get('recipeInstructions')) or None,
+                'ingredients': [text for text in (clean_structured_text(i) for i in ingredients) if text] or None,
+                'servings': parse_structured_yield(recipe.get('recipeYield'))
+            }
+    return None
+
+def extract_microdata_recipe(content):
+    # Only build the subtree under the element marked as a schema.org Recipe
+    strainer = SoupStrainer(attrs={'itemtype': microdata_recipe_pattern})
+    soup = BeautifulSoup(content, 'lxml', parse_only=strainer)
+    recipe = soup.find(attrs={'itemtype': microdata_recipe_pattern})
+    if not recipe:
+        return None
+
+    def itemprop_values(*names):
+        values = []
+        for element in recipe.find_all(attrs={'itemprop': re.compile(r'^({})$'.format('|'.join(names)), re.I)}):
+            text = clean_structured_text(element.get('content') or element.get_text(" "))
+            if text:
+                values.append(text)
+        return values
+
+    names = itemprop_values('name')
+    return {
+        'name': names[0] if names else None,
+        'steps': itemprop_values('recipeInstructions') or None,
+        'ingredients': itemprop_values('recipeIngredient', 'ingredients') or None,
+        'servings': parse_structured_yield(itemprop_values('recipeYield'))
+    }
+
+# FUNCTION TO READ THE SCHEMA.ORG RECIPE (JSON-LD FIRST, THEN MICRODATA) THAT MOST LARGE RECIPE SITES EMBED
+def extract_structured_recipe(content):
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+
+    recipe = extract_json_ld_recipe(content)
+    if not recipe and microdata_recipe_bytes_pattern.search(content):
+        recipe = extract_microdata_recipe(content)
+
+    return recipe or {}
@@ -1,14 +1,21 @@
 import re
 import logging
-from copy import deepcopy
 from constants import *
 from logic.recipe_servings import calculate_servings
+from logic.ingredient_tokenizer import tokenize_ingredient
+from logic.quantity import Quantity
+from logic.unit_graph import unit_factor
+from logic.ingredient_density import ingredient_density, grams_per_ml
+from util.lru_memo import LRUMemo
+
+unit_period_pattern = re.compile(r'\s*\.\s*')
 
 def standardize_units(ingredients):
     def clean_unit(unit):
         # Remove any trailing periods and extra spaces
         if unit:
-            unit = re.sub(r'\s*\.\s*', '', unit)
+            if '.' in unit:
+                unit = unit_period_pattern.sub('', unit)
             unit = unit.strip().lower()
         return unit
     
@@ -22,66 +29,32 @@ def standardize_units(ingredients):
 
     return ingredients
 
+# Parsed lines shared across requests and recipes, "1 tsp salt" or "2 cloves garlic" turn up in thousands of recipes
+LINE_PARSE_CACHE_SIZE = 65536
+line_parse_cache = LRUMemo(max_entries=LINE_PARSE_CACHE_SIZE)
+
+def normalize_line(line):
+    # Lines that only differ in whitespace parse the same, so they share a cache entry
+    return ' '.join(line.split())
+
+def parse_line(line):
+    ingredient = tokenize_ingredient(line)
+    standardize_units([ingredient])
+    return (Quantity.parse(ingredient[0]), ingredient[1], ingredient[2])
+
+# FUNCTION TO PARSE ONE INGREDIENT LINE INTO (QUANTITY, UNIT, NAME)
+# The tuple (and the Quantity in it) is shared with every other caller that parsed the same line, so it can't be changed
+def parse_ingredient_line(line):
+    return line_parse_cache.get_or_compute(normalize_line(line), parse_line)
+
 # FUNCTIONS TO POSTPROCESS THE INGREDIENTS LIST - DOESN'T WORK WITH 3 TO 4, 1 TO 2 ETC. eg: https://www.simplyrecipes.com/recipes/spaghetti_alla_carbonara/
 def extract_units(ingredients):
-    parsed_ingredients = []
-    for ingredient in ingredients:
-        match = re.match(r'^((?:\d+\s*)?(?:\d*½|\d*¼|\d*[¾¾]|\d*⅛|\d*⅔|\d+\s*[/–-]|to\s*\d+)?[\s\d/–-]*)?[\s]*(?:([a-zA-Z]+)\b)?[\s]*(.*)$', ingredient)
-        quantity, unit, name = match.groups()
-        
-        if '-' in str(quantity):
-            quantity = str(quantity).replace(" ", "")
-        elif '–' in str(quantity):
-            quantity = str(quantity).replace(" ", "")
-        elif 'to' in str(quantity):
-            quantity = str(quantity).replace(" ", "")
-            quantity = quantity.split('to')
-            quantity = '-'.join(quantity)
-        else:
-            quantity = quantity.strip() if quantity else None
-            for fraction, decimal in fraction_conversions.items():
-                quantity = str(quantity).replace(fraction, decimal) if quantity else None
-        
-        if unit:
-            modified_unit = re.split(r'^({})'.format('|'.join(common_units)), unit)
-            if len(modified_unit) > 1:
-                # If unit is 'g' and next letter is vowel, treat whole as name, for example "garlic" vs "gchicken"
-                if modified_unit[1] == 'g' and modified_unit[2] and modified_unit[2][:1].lower() in 'aeiour':
-                    name = unit + " " + name
-                    unit = None
-                else:
-                    unit = modified_unit[1]
-                    name = modified_unit[2] + " " + name
-            else:
-                unit = modified_unit[0]
+    parsed_ingredients = [parse_ingredient_line(ingredient) for ingredient in ingredients]
 
-        else:
-            # the unit may be stuck directly to the ingredient name without any spacing, so filter whether the name contains any common units
-            logging.info("DEBUG: Unit is NoneType:", name)
-            for u in sorted(common_units, key=len, reverse=True):
-                if u in name.lower():
-                    pattern = re.compile(r'\b' + re.escape(u) + r'\b', re.IGNORECASE)
-                    match = pattern.search(name)
-                    if match:
-                        unit = match.group(0)
-                        name = pattern.sub('', name, count=1).strip()
-                        if not unit:
-                            modified_unit = re.split(r'^({})'.format('|'.join(common_units)), unit)
-                            unit = modified_unit[1] if len(modified_unit) > 1 else modified_unit[0]
-                            name = modified_unit[2] + " " + name if len(modified_unit) > 1 else name
-                        break
-        
-        if unit and unit.lower() not in common_units:
-            name = unit + " " + name
-            unit = None
-
-        # remove any extra quantity or unit in brackets, for example "1 cup (50ml) of water" because that won't get converted
-        name = re.sub(r'[\(\[]\s*\d+\s*[a-zA-Z]*\s*[\)\]]', '', name).strip()
-        
-        parsed_ingredients.append([quantity, unit, name.strip()])
-
-    standardized_ingredients = standardize_units(parsed_ingredients)
-    ingredients_pre_conversion = deepcopy(standardized_ingredients)
+    # Quantities are parsed once per distinct line, scaling and conversion only do arithmetic on them.
+    # Each caller gets its own row lists, the parsed tuples stay as they are
+    standardized_ingredients = [list(ingredient) for ingredient in parsed_ingredients]
+    ingredients_pre_conversion = [list(ingredient) for ingredient in parsed_ingredients]
     
     if any(i[1] in to_si_conversion for i in ingredients_pre_conversion):
         original_unit_type = "metric"
@@ -92,24 +65,57 @@ def extract_units(ingredients):
 
     return standardized_ingredients, original_unit_type, ingredients_pre_conversion
 
-def convert_units(ingredients, unit_type, requested_serving_size, servings, original_unit_type, ingredients_pre_conversion):
-    def convert_large_vals(converted_unit, converted_q):
-        # if the cup value is super small, change to teaspoons (1 cup = 48 teaspoons)
-        # if teaspoons is too much, change to tablespoons
-        if converted_unit == "cups" and converted_q < 0.1:
-            converted_unit = "tsp"
-            converted_q *= teaspoons_per_cup
-
-            if converted_q >= 3:
-                converted_unit = "tbsp"
-                converted_q /= teaspoons_per_tablespoon # 1 tablespoon = 3 teaspoons
-
-        # if oz is greater than 32, change to pounds (1lb = 16oz)
-        if converted_unit == "oz" and converted_q >= 32:
-            converted_q /= ounces_per_pound 
-            converted_unit = "lb"
-        return converted_unit, converted_q
+# FUNCTION TO PICK THE UNIT A CONVERTED QUANTITY IS SHOWN IN, RETURNS THE UNIT AND WHAT TO MULTIPLY THE QUANTITY BY
+def convert_large_vals(converted_unit, converted_q):
+    # if the cup value is super small, change to teaspoons (1 cup = 48 teaspoons)
+    # if teaspoons is too much, change to tablespoons
+    multiplier = 1
+    if converted_unit == "cups" and converted_q < 0.1:
+        converted_unit = "tsp"
+        multiplier = unit_factor("cups", "tsp")
+
+        if converted_q * multiplier >= 3:
+            converted_unit = "tbsp"
+            multiplier = unit_factor("cups", "tbsp") # 1 tablespoon = 3 teaspoons
+
+    # if oz is greater than 32, change to pounds (1lb = 16oz)
+    if converted_unit == "oz" and converted_q >= 32:
+        multiplier = unit_factor("oz", "lb")
+        converted_unit = "lb"
+    return converted_unit, multiplier
 
+# FUNCTION TO PICK WHAT AN INGREDIENT'S UNIT CONVERTS TO, RETURNS THE UNIT AND THE CONVERSION FACTOR (NONE IF IT ISN'T CONVERTED)
+def conversion_target(unit, name, conversion_dict):
+    converted_unit = conversion_dict.get(unit) if unit else None
+    if not converted_unit:
+        return None
+    # the ingredient's own density when it's in the density table, otherwise water for liquids and flour for solids
+    density = ingredient_density(name)
+    # convert liquids from cups/tsp/tbsp to ml and solids to g
+    if unit in ["cup", "cups"]:
+        liquid = density.liquid if density else any(liquid in name for liquid in liquids)
+        if liquid:
+            converted_unit = "ml"
+        else:
+            converted_unit = "g"
+    # convert grams of flour to cups of flour and not oz of flour
+    if any(solid in name for solid in solids) and unit in ['g']:
+        converted_unit = "cups"
+    return converted_unit, unit_factor(unit, converted_unit, grams_per_ml(density) if density else None)
+
+def convert_row(quantity, unit, name, conversion_dict):
+    quantity = Quantity.parse(quantity)
+    target = conversion_target(unit, name, conversion_dict)
+
+    if quantity and quantity.value is not None and target:
+        converted_unit, factor = target
+        # a range is shown in the unit picked for its lower end
+        converted_unit, multiplier = convert_large_vals(converted_unit, quantity.value * factor)
+        return [quantity.converted(factor * multiplier), converted_unit, name]
+    return [quantity, unit, name]
+
+# Returns new ingredient rows in the requested unit type, the rows passed in are left as they are
+def convert_units(ingredients, unit_type, requested_serving_size, servings, original_unit_type, ingredients_pre_conversion):
     # check if ingredients is populated or not first
     if not ingredients:
         return None
@@ -123,59 +129,22 @@ def convert_units(ingredients, unit_type, requested_serving_size, servings, orig
             return ingredients_pre_conversion
         else:
             logging.info("DEBUG: Conversion method 2")
-            ingredients = calculate_servings(deepcopy(ingredients_pre_conversion), servings, requested_serving_size)
-            return ingredients
+            return calculate_servings(ingredients_pre_conversion, servings, requested_serving_size)
             
     # only do the conversion if they want a different unit
-    else:
-        for ingredient in ingredients:
-            convert_to = None
-            quantity = ingredient[0]
-            if quantity: 
-                # handle cases where the quantity is a range
-                quantity = str(quantity).replace(" ", "")
-                for separator in quantity_separators:
-                    if separator in quantity:
-                        quantity = quantity.split(separator)
-                        break
-                else:
-                    # convert fractions to decimals
-                    for fraction, decimal in fraction_conversions.items():
-                        quantity = str(quantity).replace(fraction, decimal)
-                    quantity_parts = quantity.split(" ")
-                    quantity = sum(float(num_str) for num_str in quantity_parts)
-                    
-            unit = ingredient[1]
-            name = ingredient[2]
-
-            if quantity and unit and unit in [key for key, value in conversion_dict.items()]:
-                # convert liquids from cups/tsp/tbsp to ml and solids to g
-                if unit in ["cup", "cups"]:
-                    if any(liquid in name for liquid in liquids):
-                        convert_to = "ml" 
-                    else:
-                        convert_to = "g"
-                # convert grams of flour to cups of flour and not oz of flour
-                if any(solid in name for solid in solids) and unit in ['g']:
-                    convert_to = "cups"
-                converted_unit = convert_to if convert_to else [key for key, value in conversion_dict[unit].items()][0]
-                
-                # handle cases where the quantity is a range
-                if isinstance(quantity, list):
-                    converted_quantities = []
-                    for q in quantity:
-                        converted_q = float(q) * conversion_dict[unit][converted_unit]
-                        converted_unit, converted_q = convert_large_vals(converted_unit, converted_q)
-                        temp = round(converted_q, 2)
-                        converted_quantities.append(str(temp))
-                    converted_quantity = '-'.join(converted_quantities)
-                    ingredient[0] = converted_quantity
-                # handle normal single number quantities
-                else:
-                    converted_quantity = float(quantity) * conversion_dict[unit][converted_unit]
-                    converted_unit, converted_quantity = convert_large_vals(converted_unit, converted_quantity)
-                    ingredient[0] = round(converted_quantity, 2)
-                ingredient[1] = converted_unit
-        logging.info("DEBUG: Conversion method 3")
-
-    return ingredients
\ No newline at end of file
+    converted_ingredients = [convert_row(quantity, unit, name, conversion_dict) for quantity, unit, name in ingredients]
+    logging.info("DEBUG: Conversion method 3")
+
+    return converted_ingredients
+
+# Converts the ingredients of many recipes to unit_type at once, recipes is a list of (ingredients, original_unit_type).
+# Recipes already in unit_type come back as they are
+def convert_units_batch(recipes, unit_type):
+    conversion_dict = to_si_conversion if unit_type == "si" else to_metric_conversion
+    converted_recipes = []
+    for ingredients, original_unit_type in recipes:
+        if not ingredients or original_unit_type == unit_type:
+            converted_recipes.append(ingredients or None)
+        else:
+            converted_recipes.append([convert_row(quantity, unit, name, conversion_dict) for quantity, unit, name in ingredients])
+    return converted_recipes
@@ -0,0 +1,57 @@
+from logic.dom_index import HEADING_TAGS
+
+# Most elements a single heading's section walk looks at before giving up
+SECTION_NODE_BUDGET = 3000
+
+def heading_rank(heading):
+    # h1 -> 1 ... h6 -> 6, lower is higher rank
+    return int(heading.name[1])
+
+class SectionWalker:
+    """
+    Walks the section under a heading in document order, looking for the first element a match function accepts.
+
+    A section runs from the heading up to the next heading of equal or higher rank, and a single walk
+    looks at no more than node_budget elements. The elements come from the DomIndex in document order,
+    so a walk is a step along a list rather than a find_next()/find() at every element. Each element
+    is looked at once per walker: when a heading's walk runs into elements an earlier heading already
+    walked, it stops there and reuses what that walk found.
+    """
+
+    def __init__(self, index, match, node_budget=SECTION_NODE_BUDGET):
+        self.index = index
+        self.match = match
+        self.node_budget = node_budget
+        self.visited = {}  # position -> what the walk through that element ended up finding (None if nothing)
+        self.nodes_visited = 0
+
+    def walk(self, heading):
+        """
+        Returns whatever match returned for the first accepted element after the heading, None if
+        the section ends, the budget runs out, or nothing in it matched.
+        """
+        position = self.index.position(heading)
+        if position is None:
+            return None
+        rank = heading_rank(heading)
+        elements = self.index.elements
+        end = min(len(elements), position + 1 + self.node_budget)
+
+        walked = []
+        found = None
+        for position in range(position + 1, end):
+            if position in self.visited:
+                found = self.visited[position]
+                break
+            element = elements[position]
+            if element.name in HEADING_TAGS and heading_rank(element) <= rank:
+                break
+            walked.append(position)
+            found = self.match(element)
+            if found is not None:
+                break
+
+        self.nodes_visited += len(walked)
+        for position in walked:
+            self.visited[position] = found
+        return found
@@ -0,0 +1,29 @@
+import msgpack
+
+# Every encoded value starts with this byte, bumped whenever the layout of the stored data changes
+STATE_CODEC_VERSION = 1
+VERSION_BYTE = bytes([STATE_CODEC_VERSION])
+
+# msgpack integers stop at 64 bits, exact Fractions can go past that and are stored as decimal text in an ext type
+BIG_INT_EXT = 1
+
+def pack_default(obj):
+    if isinstance(obj, int):
+        return msgpack.ExtType(BIG_INT_EXT, str(obj).encode('ascii'))
+    raise TypeError("Can't encode {!r} in the recipe state".format(obj))
+
+def unpack_ext(code, data):
+    if code == BIG_INT_EXT:
+        return int(data)
+    return msgpack.ExtType(code, data)
+
+def encode_value(data):
+    """Version byte + msgpack of JSON-friendly data (the to_data forms), for the state store"""
+    return VERSION_BYTE + msgpack.packb(data, use_bin_type=True, default=pack_default)
+
+def decode_value(encoded):
+    """The data encode_value was given"""
+    version = encoded[0]
+    if version == STATE_CODEC_VERSION:
+        return msgpack.unpackb(encoded[1:], raw=False, strict_map_key=False, ext_hook=unpack_ext)
+    raise ValueError("Unsupported state codec version {}".format(version))
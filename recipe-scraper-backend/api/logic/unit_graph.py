@@ -0,0 +1,98 @@
+from collections import deque, defaultdict
+from fractions import Fraction
+from constants import unit_graph_edges, unit_dimensions, solid_grams_per_cup
+
+def exact(number):
+    # 236.588 -> Fraction(59147, 250) rather than the nearest binary float
+    return Fraction(str(number)) if isinstance(number, float) else Fraction(number)
+
+def build_unit_graph(edges):
+    # unit -> {neighbour: how many of the neighbour make one unit}, both directions of every edge
+    graph = defaultdict(dict)
+    for unit, other, amount in edges:
+        amount = exact(amount)
+        graph[unit][other] = amount
+        graph[other][unit] = 1 / amount
+    return graph
+
+def units_in_base(graph, dimensions):
+    # unit -> (dimension, how many of the dimension's base unit make one unit), walking out from each base unit
+    units = {}
+    for dimension, base_unit in dimensions.items():
+        units[base_unit] = (dimension, Fraction(1))
+        queue = deque([base_unit])
+        while queue:
+            unit = queue.popleft()
+            for other, amount in graph[unit].items():
+                if other not in units:
+                    units[other] = (dimension, units[unit][1] / amount)
+                    queue.append(other)
+
+    # Every edge has to agree with the paths the walk took, a second path with a different factor is a typo in the edges
+    for unit, neighbours in graph.items():
+        if unit not in units:
+            raise ValueError("Unit {!r} isn't connected to any base unit".format(unit))
+        for other, amount in neighbours.items():
+            if units[unit][1] != amount * units[other][1]:
+                raise ValueError("Conflicting conversion factors between {!r} and {!r}".format(unit, other))
+    return units
+
+UNITS = units_in_base(build_unit_graph(unit_graph_edges), unit_dimensions)
+
+# Grams per ml for going between mass and volume when no density is given
+DEFAULT_GRAMS_PER_ML = exact(solid_grams_per_cup) / UNITS['cup'][1]
+
+def pair_factor(from_unit, to_unit, grams_per_ml):
+    from_dimension, from_base = UNITS[from_unit]
+    to_dimension, to_base = UNITS[to_unit]
+    factor = from_base / to_base
+    if from_dimension == to_dimension:
+        return factor
+    if (from_dimension, to_dimension) == ('volume', 'mass'):
+        return factor * grams_per_ml
+    if (from_dimension, to_dimension) == ('mass', 'volume'):
+        return factor / grams_per_ml
+    return None
+
+def all_pair_factors(grams_per_ml):
+    factors = {}
+    for from_unit in UNITS:
+        for to_unit in UNITS:
+            factor = pair_factor(from_unit, to_unit, grams_per_ml)
+            if factor is not None:
+                factors[from_unit, to_unit] = factor
+    return factors
+
+# Every pair of units with a conversion between them, computed once so a conversion is a single dict lookup
+EXACT_UNIT_FACTORS = all_pair_factors(DEFAULT_GRAMS_PER_ML)
+UNIT_FACTORS = {pair: float(factor) for pair, factor in EXACT_UNIT_FACTORS.items()}
+
+def unit_factor(from_unit, to_unit, grams_per_ml=None):
+    """
+    What to multiply a quantity in from_unit by to get it in to_unit, None if there is no conversion between them
+
+    Args:
+        grams_per_ml: Density for going between mass and volume, the default solid density when None
+    """
+    if grams_per_ml is None:
+        return UNIT_FACTORS.get((from_unit, to_unit))
+    factor = EXACT_UNIT_FACTORS.get((from_unit, to_unit))
+    if factor is None or UNITS[from_unit][0] == UNITS[to_unit][0]:
+        return None if factor is None else float(factor)
+    return float(pair_factor(from_unit, to_unit, exact(grams_per_ml)))
+
+def to_base_unit(unit):
+    """The base unit a unit is measured in and the exact factor to it, None for units outside the graph"""
+    if unit not in UNITS:
+        return None
+    dimension, factor = UNITS[unit]
+    return unit_dimensions[dimension], factor
+
+def convert_many(conversions):
+    """Converts a batch of (value, from_unit, to_unit) at once, None for the ones with no conversion between their units"""
+    get_factor = UNIT_FACTORS.get
+    converted = []
+    for value, from_unit, to_unit in conversions:
+        factor = get_factor((from_unit, to_unit))
+        converted.append(None if factor is None or value is None else value * factor)
+    return converted
@@ -0,0 +1,282 @@
+import re
+import os
+import asyncio
+import hashlib
+
+# Local imports
+from util import *
+from constants import *
+from recipe_state import *
+from logic import *
+
+# Shared by the WSGI (app.py) and ASGI (asgi.py) servers so both modes fetch, cache and extract recipes the same way
+
+scrape_failed_message = "Oops! We encountered a hiccup while trying to extract the recipe from this website. It seems its structure is quite unique and our system is having trouble with it. We're continuously working on improvements though! Thank you for your patience and support. ^^"
+
+# asyncio fetch engine with connection reuse, per-host limits and the same retry strategy the requests session had
+fetch_engine_settings = {
+    'default_headers': headers,
+    'per_host_limit': int(os.getenv('RECIPE_SCRAPER_FETCH_PER_HOST_LIMIT', 8)),
+    'total_limit': int(os.getenv('RECIPE_SCRAPER_FETCH_TOTAL_LIMIT', 1000)),
+    'total_timeout': float(os.getenv('RECIPE_SCRAPER_FETCH_TIMEOUT', 30)),
+    'attempt_timeout': float(os.getenv('RECIPE_SCRAPER_FETCH_ATTEMPT_TIMEOUT', 10)),
+    'retries': 3,
+    'backoff_factor': 0.5,
+    'status_forcelist': [500, 502, 503, 504]
+}
+fetch_engine = FetchEngine(**fetch_engine_settings)
+
+# Cache of final extraction results, invalidated whenever the extraction logic changes
+recipe_cache = RecipeResultCache(
+    version=EXTRACTOR_VERSION,
+    max_entries=int(os.getenv('RECIPE_SCRAPER_RESULT_CACHE_SIZE', 1024)),
+    directory=os.getenv('RECIPE_SCRAPER_RESULT_CACHE_DIR')
+)
+
+# Concurrent scrapes of the same recipe wait on the first one instead of fetching and parsing again
+scrape_flight = SingleFlight()
+scrape_flight_timeout = float(os.getenv('RECIPE_SCRAPER_SINGLE_FLIGHT_TIMEOUT', 30))
+
+# Shared executor for the DOM extraction: "thread" (default), "process" to use every core, or "inline"
+# Process workers are spawned, so scripts using this module in process mode need the if __name__ == '__main__' guard
+extraction_executor = ExtractionExecutor(
+    mode=os.getenv('RECIPE_SCRAPER_EXTRACTION_MODE', 'thread'),
+    max_workers=int(os.getenv('RECIPE_SCRAPER_EXTRACTION_WORKERS', 0)) or None,
+    initializer=warm_extraction_worker
+)
+
+# Scraped recipes by recipe id, for the stateless GET /recipes/<recipe_id>/ingredients. The id is a hash of the stored
+# fields, so a recipe id always means the same ingredients and its responses can be cached for as long as they like
+recipe_store = create_state_store(
+    os.getenv('RECIPE_SCRAPER_STATE_STORE_URL'),
+    ttl=int(os.getenv('RECIPE_SCRAPER_RECIPE_TTL', 24 * 60 * 60)),
+    max_entries=int(os.getenv('RECIPE_SCRAPER_RECIPE_STORE_SIZE', 10000)),
+    key_prefix='recipe:'
+)
+RECIPE_STORE_FIELDS = ('servings', 'base_ingredients', 'original_unit_type')
+recipe_cache_max_age = int(os.getenv('RECIPE_SCRAPER_RECIPE_CACHE_MAX_AGE', 24 * 60 * 60))
+
+def extract_recipe_data_parallel(content, recipe_url, structured_recipe=None):
+    """Extract recipe data on the shared extraction executor, only running the DOM heuristics for fields the structured data could not fill"""
+    structured_recipe = structured_recipe or {}
+    recipe_name = structured_recipe.get('name')
+    recipe_steps = structured_recipe.get('steps')
+    ingredients = structured_recipe.get('ingredients')
+    servings = structured_recipe.get('servings')
+
+    # Parse the page once and run the extractors for the missing fields, skipping the full tree when the schema.org recipe already has everything
+    missing_fields = tuple(field for field, value in zip(RECIPE_FIELDS, (recipe_name, recipe_steps, ingredients, servings)) if not value)
+    if missing_fields:
+        extracted = extraction_executor.run(extract_recipe_fields, content, recipe_url, missing_fields)
+        datadog_logger.log("HTML pruning for " + recipe_url, {"endpoint": "scrapeRecipeSteps", **extracted['pruning']})
+        recipe_name = extracted.get('name', recipe_name)
+        recipe_steps = extracted.get('steps', recipe_steps)
+        ingredients = extracted.get('ingredients', ingredients)
+        servings = extracted.get('servings', servings)
+
+    return postprocess_text(recipe_name), postprocess_list(recipe_steps), postprocess_list(ingredients), servings
+
+def extract_recipe(content, recipe_url):
+    """Run the whole extraction on a fetched page and return everything the endpoints need from it"""
+    # Read the schema.org recipe first and only fall back to the DOM heuristics for what it is missing
+    structured_recipe = extract_structured_recipe(content)
+
+    # Extract all recipe data in parallel
+    recipe_name, recipe_steps, ingredients, servings = extract_recipe_data_parallel(content, recipe_url, structured_recipe)
+
+    original_unit_type = None
+    base_ingredients = None
+    if ingredients:
+        ingredients, original_unit_type, _ = extract_units(ingredients)
+        # Per-serving base quantities, so the serving size and unit type requests only multiply and look up
+        base_ingredients = prepare_ingredients(ingredients, servings, original_unit_type)
+
+    return {
+        'recipe_name': recipe_name,
+        'recipe_steps': recipe_steps,
+        'ingredients': ingredients,
+        'base_ingredients': base_ingredients,
+        'servings': servings,
+        'original_unit_type': original_unit_type
+    }
+
+def extract_recipe_cached(content, canonical_url):
+    """Extract a fetched page unless this page (or a near-identical copy of it) was already extracted with the current logic"""
+    cached = recipe_cache.get(canonical_url, content)
+    if cached is not None:
+        return recipe_from_data(cached)
+    # Only fingerprinted on a miss, so a warm hit stays a hash and a dict lookup
+    fingerprint = content_fingerprint(content)
+    cached = recipe_cache.get_similar(canonical_url, fingerprint) if fingerprint is not None else None
+    if cached is not None:
+        return recipe_from_data(cached)
+    recipe = extract_recipe(content, canonical_url)
+    recipe_cache.set(canonical_url, content, recipe_to_data(recipe), fingerprint)
+    return recipe
+
+# The cache stores JSON, the ingredient rows go in with their quantities in Quantity.to_data form
+def recipe_to_data(recipe):
+    return dict(recipe, ingredients=ingredients_to_data(recipe['ingredients']), base_ingredients=base_ingredients_to_data(recipe['base_ingredients']))
+
+def recipe_from_data(data):
+    return dict(data, ingredients=ingredients_from_data(data['ingredients']), base_ingredients=base_ingredients_from_data(data['base_ingredients']))
+
+def scrape_recipe(canonical_url):
+    """Fetch and extract a recipe, going through the page and result caches"""
+    # Served from the on-disk page cache when we fetched this recipe recently
+    content = page_cache.fetch(canonical_url, fetch_engine.get)
+    return extract_recipe_cached(content, canonical_url)
+
+async def scrape_recipe_async(canonical_url, fetcher):
+    """Same as scrape_recipe, awaiting the fetch and keeping the CPU-bound extraction off the event loop"""
+    content = await page_cache.fetch_async(canonical_url, fetcher.fetch)
+    return await asyncio.get_running_loop().run_in_executor(None, extract_recipe_cached, content, canonical_url)
+
+def save_scraped_recipe(session, recipe_url, recipe, client_conversion=False):
+    """
+    Start a new recipe state in the session from a scraped recipe and build the endpoint response
+
+    Args:
+        client_conversion: Also send the conversion_model, for the frontend to scale and convert without calling the API
+    """
+    recipe_state = RecipeState()
+    recipe_state.recipe_url = recipe_url
+    recipe_name = recipe['recipe_name']
+    recipe_steps = recipe['recipe_steps']
+    recipe_state.ingredients = recipe['ingredients']
+    recipe_state.base_ingredients = recipe['base_ingredients']
+    recipe_state.servings = recipe['servings']
+    recipe_state.original_unit_type = recipe['original_unit_type']
+
+    save_recipe_state(session, recipe_state)
+
+    # With error handling
+    if recipe_name and recipe_steps and recipe_state.ingredients and recipe_state.servings:
+        response = {
+            'recipe_id': store_recipe(recipe_state),
+            'recipe_url': recipe_url,
+            'recipe_name': recipe_name,
+            'recipe_steps': recipe_steps,
+            'ingredients': format_ingredients(recipe_state.ingredients),
+            'servings': recipe_state.servings,
+            'original_unit_type': recipe_state.original_unit_type
+        }
+        if client_conversion:
+            response['conversion_model'] = conversion_model(recipe_state.base_ingredients, recipe_state.servings, recipe_state.original_unit_type)
+        datadog_logger.log("ScrapeRecipeSteps succeeded for " + recipe_url + "\nResponse: " + str(response), {"endpoint": "scrapeRecipeSteps", "result": "success"})
+        return response, 200
+    else:
+        response = {"error": scrape_failed_message}
+        details = f"{recipe_url} | {recipe_name} | {recipe_steps} | {format_ingredients(recipe_state.ingredients)} | {recipe_state.servings} | {recipe_state.original_unit_type}"
+        datadog_logger.log("ScrapeRecipeSteps failed for " + recipe_url + "\nDetails: " + details, {"endpoint": "scrapeRecipeSteps", "result": "fail"})
+        return response, 200
+
+def convert_session_units(session, unit_type):
+    """Convert the ingredients of the recipe in the session to another unit type"""
+    recipe_state = get_recipe_state(session)
+    recipe_state.unit_type = unit_type
+
+    if recipe_state.base_ingredients:
+        # Shown for the serving size already asked for, whatever was converted or scaled before
+        result = ingredient_views(recipe_state.base_ingredients, unit_type, recipe_state.requested_serving_size, recipe_state.servings)
+        recipe_state.ingredients = result
+        save_recipe_state(session, recipe_state)
+
+        response = format_ingredients(result)
+        datadog_logger.log("ConvertUnits succeeded for " + recipe_state.recipe_url + "\nResponse: " + str(response), {"endpoint": "convertUnits", "result": "success"})
+        return response
+    else:
+        datadog_logger.log("ConvertUnits failed for " + str(recipe_state.recipe_url) + "\nResponse: None", {"endpoint": "convertUnits", "result": "fail"})
+        return None
+
+def scale_session_servings(session, serving_size):
+    """Recalculate the ingredients of the recipe in the session for another serving size"""
+    recipe_state = get_recipe_state(session)
+    recipe_state.requested_serving_size = float(serving_size)
+
+    if not serving_count(recipe_state.servings) or not recipe_state.base_ingredients:
+        return None
+
+    # Shown in the unit type last asked for (the scraped units until then)
+    recipe_state.ingredients = ingredient_views(recipe_state.base_ingredients, recipe_state.unit_type, recipe_state.requested_serving_size, recipe_state.servings)
+
+    save_recipe_state(session, recipe_state)
+    response = format_ingredients(recipe_state.ingredients)
+    if response:
+        datadog_logger.log("MultiplyServingSize succeeded for " + recipe_state.recipe_url + "\nResponse: " + str(response), {"endpoint": "multiplyServingSize", "result": "success"})
+    else:
+        datadog_logger.log("MultiplyServingSize failed for " + recipe_state.recipe_url + "\nResponse: None", {"endpoint": "multiplyServingSize", "result": "fail"})
+    return response
+
+def store_recipe(recipe_state):
+    """Keep the ingredients of a scraped recipe in the recipe store and return its recipe id"""
+    fields = recipe_state.encode_fields(RECIPE_STORE_FIELDS)
+    digest = hashlib.sha256()
+    for field in RECIPE_STORE_FIELDS:
+        digest.update(b'%d:' % len(fields[field]) + fields[field])
+    recipe_id = digest.hexdigest()[:32]
+    recipe_store.save(recipe_id, fields)
+    return recipe_id
+
+def parse_ingredients_query(unit_type, servings):
+    # (unit_type, serving size) from the query string, None for a parameter that isn't a valid value
+    if unit_type not in (None, '', 'si', 'metric'):
+        return None
+    if servings in (None, ''):
+        return unit_type or None, None
+    try:
+        serving_size = float(servings)
+    except ValueError:
+        return None
+    if not 0 < serving_size < float('inf'):
+        return None
+    return unit_type or None, serving_size
+
+def ingredients_etag(recipe_id, unit_type, serving_size):
+    # The response only depends on these and the conversion code, so it can be worked out without loading the recipe
+    key = '{}|{}|{}|{}'.format(recipe_id, unit_type, serving_size, EXTRACTOR_VERSION)
+    return '"{}"'.format(hashlib.sha256(key.encode('utf-8')).hexdigest()[:32])
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match check (weak comparison), also matching the ETag with the content coding suffix compression adds ("...:gzip")"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag or (candidate.startswith(etag[:-1] + ':') and candidate.endswith('"')):
+            return True
+    return False
+
+def recipe_ingredients(recipe_id, unit_type, servings, if_none_match=None):
+    """
+    GET /recipes/<recipe_id>/ingredients: the ingredients of a stored recipe in unit_type for servings servings,
+    only from the recipe id and the query parameters
+
+    Returns:
+        tuple: (response body or None for a 304, status, headers)
+    """
+    query = parse_ingredients_query(unit_type, servings)
+    if query is None:
+        return {'error': 'unit_type must be "si" or "metric" and servings a positive number'}, 400, {}
+    unit_type, serving_size = query
+
+    etag = ingredients_etag(recipe_id, unit_type, serving_size)
+    # The endpoint needs a token, so only the client's own cache may keep the response, never a shared one
+    headers = {'ETag': etag, 'Cache-Control': 'private, max-age={}'.format(recipe_cache_max_age)}
+    if etag_matches(if_none_match, etag):
+        return None, 304, headers
+
+    fields = recipe_store.load(recipe_id)
+    if not fields:
+        return {'error': 'Recipe not found, scrape it again to get a new recipe id'}, 404, {}
+    recipe_state = RecipeState()
+    recipe_state.decode_fields(fields)
+    # Scaling needs the scraped serving count, recipes without one are shown as scraped
+    if not serving_count(recipe_state.servings):
+        serving_size = None
+    response = format_ingredients(ingredient_views(recipe_state.base_ingredients, unit_type, serving_size, recipe_state.servings))
+    return response, 200, headers
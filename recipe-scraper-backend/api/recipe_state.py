@@ -1,46 +1,98 @@
+from logic.quantity import ingredients_to_data, ingredients_from_data
+from logic.ingredient_base import base_ingredients_to_data, base_ingredients_from_data
+from logic.state_codec import encode_value, decode_value
+from util.state_store import state_store, new_state_id
+
+# The fields of a recipe state, and for the ones holding objects how they become JSON-friendly data and back
+STATE_FIELDS = ('recipe_url', 'ingredients', 'servings', 'base_ingredients', 'converted', 'requested_serving_size', 'original_unit_type', 'unit_type')
+FIELD_CODECS = {
+    'ingredients': (ingredients_to_data, ingredients_from_data),
+    'base_ingredients': (base_ingredients_to_data, base_ingredients_from_data)
+}
+
+def field_to_data(field, value):
+    codec = FIELD_CODECS.get(field)
+    return codec[0](value) if codec else value
+
+def field_from_data(field, data):
+    codec = FIELD_CODECS.get(field)
+    return codec[1](data) if codec else data
+
 class RecipeState:
+    """
+    The recipe a session is working on.
+
+    Assigning a field marks it dirty, so a save only has to write the fields a request changed (converting
+    units rewrites the ingredient rows and unit_type but not the base ingredients). Ingredient rows are
+    [Quantity, unit, name] and are stored as positional arrays, with exact Fractions as [numerator, denominator].
+    """
+
+    __slots__ = STATE_FIELDS + ('dirty',)
+
     def __init__(self):
+        object.__setattr__(self, 'dirty', set())
         self.recipe_url = None
         self.ingredients = None
         self.servings = None
-        self.ingredients_pre_conversion = None
+        self.base_ingredients = None
         self.converted = False
         self.requested_serving_size = None
         self.original_unit_type = None
         self.unit_type = None
-    
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        self.dirty.add(name)
+
+    # The ingredient rows hold Quantity objects and the base ingredients BaseIngredients, stored in their JSON-friendly form
     def to_dict(self):
-        return {
-            'recipe_url': self.recipe_url,
-            'ingredients': self.ingredients,
-            'servings': self.servings,
-            'ingredients_pre_conversion': self.ingredients_pre_conversion,
-            'converted': self.converted,
-            'requested_serving_size': self.requested_serving_size,
-            'original_unit_type': self.original_unit_type,
-            'unit_type': self.unit_type
-        }
-    
+        return {field: field_to_data(field, getattr(self, field)) for field in STATE_FIELDS}
+
     def from_dict(self, data):
-        self.recipe_url = data.get('recipe_url')
-        self.ingredients = data.get('ingredients')
-        self.servings = data.get('servings')
-        self.ingredients_pre_conversion = data.get('ingredients_pre_conversion')
-        self.converted = data.get('converted')
-        self.requested_serving_size = data.get('requested_serving_size')
-        self.original_unit_type = data.get('original_unit_type')
-        self.unit_type = data.get('unit_type') 
-
-# Retrieve and store the recipe state in the session
+        for field in STATE_FIELDS:
+            object.__setattr__(self, field, field_from_data(field, data.get(field)))
+        self.dirty.clear()
+
+    def encode_fields(self, fields=None):
+        """Each of fields (all of them by default) in the binary state codec, for the state store"""
+        return {field: encode_value(field_to_data(field, getattr(self, field))) for field in (STATE_FIELDS if fields is None else fields)}
+
+    def decode_fields(self, encoded):
+        """Set the fields read from the state store, the ones missing keep their defaults"""
+        for field, value in encoded.items():
+            if field in STATE_FIELDS:
+                object.__setattr__(self, field, field_from_data(field, decode_value(value)))
+        self.dirty.clear()
+
+    def encode(self):
+        """The whole state as one binary value, the fields in STATE_FIELDS order"""
+        return encode_value([field_to_data(field, getattr(self, field)) for field in STATE_FIELDS])
+
+    @classmethod
+    def decode(cls, encoded):
+        recipe_state = cls()
+        recipe_state.from_dict(dict(zip(STATE_FIELDS, decode_value(encoded))))
+        return recipe_state
+
+# Retrieve and store the recipe state in the state store, the session only holds the id it is stored under
 def get_recipe_state(session):
-    if 'recipe_state' not in session:
-        session['recipe_state'] = RecipeState().to_dict()
-    
     recipe_state = RecipeState()
-    recipe_state.from_dict(session['recipe_state'])
-    session.modified = True
-    
+    state_id = session.get('state_id')
+    fields = state_store.load(state_id) if state_id else None
+    if fields:
+        recipe_state.decode_fields(fields)
     return recipe_state
 
 def save_recipe_state(session, recipe_state):
-    session['recipe_state'] = recipe_state.to_dict()
\ No newline at end of file
+    state_id = session.get('state_id')
+    if not state_id:
+        # Flask only sends a new cookie when the session changes, which is now just when a state is first stored
+        session['state_id'] = state_id = new_state_id()
+        fields = None
+    else:
+        # A new RecipeState has every field dirty, so starting a new recipe still replaces all of them
+        fields = sorted(recipe_state.dirty)
+    # Sessions from before the state store carried the whole state in the cookie
+    session.pop('recipe_state', None)
+    state_store.save(state_id, recipe_state.encode_fields(fields))
+    recipe_state.dirty.clear()
\ No newline at end of file
@@ -2,4 +2,12 @@ from .logging import *
 from .auth import *
 from .model_helper import *
 from .postprocess import *
-from .metrics import *
\ No newline at end of file
+from .metrics import *
+from .page_cache import *
+from .result_cache import *
+from .canonical_url import *
+from .single_flight import *
+from .async_fetch import *
+from .extraction_executor import *
+from .lru_memo import *
+from .state_store import *
\ No newline at end of file
@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import aiohttp
+import requests
+from urllib.parse import urlparse
+from contextlib import asynccontextmanager
+from requests.structures import CaseInsensitiveDict
+from typing import Optional, Dict, Iterable, AsyncIterator, Tuple, Union
+
+class FetchResponse:
+    """The parts of a requests.Response that the page cache and endpoints use"""
+
+    def __init__(self, url: str, status_code: int, headers: Dict[str, str], content: bytes):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError("{} Error for url: {}".format(self.status_code, self.url), response=self)
+
+class AsyncFetcher:
+    """
+    asyncio fetch engine with connection reuse, per-host concurrency limits, a total
+    deadline per fetch and retry/backoff matching the urllib3 Retry config the app used.
+
+    Failures are raised as requests exceptions so callers handle them exactly like
+    the old blocking http_session.get path.
+    """
+
+    def __init__(self, default_headers: Optional[Dict[str, str]] = None, per_host_limit: int = 8, total_limit: int = 1000,
+                 total_timeout: float = 30, attempt_timeout: float = 10, retries: int = 3, backoff_factor: float = 0.5,
+                 status_forcelist: Iterable[int] = (500, 502, 503, 504)):
+        self.default_headers = default_headers or {}
+        self.per_host_limit = per_host_limit
+        self.total_limit = total_limit
+        self.total_timeout = total_timeout
+        self.attempt_timeout = attempt_timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = set(status_forcelist)
+        self._session = None
+        self._total_semaphore = None
+        self._host_semaphores = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily so the session and semaphores belong to the loop that uses them
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.total_limit, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, headers=self.default_headers)
+            self._total_semaphore = asyncio.Semaphore(self.total_limit)
+            self._host_semaphores = {}
+        return self._session
+
+    @asynccontextmanager
+    async def _host_slot(self, url: str):
+        # A host's semaphore only lives while it has fetches running or waiting, so the dict never outgrows the busy hosts
+        host = urlparse(url).netloc
+        entry = self._host_semaphores.get(host)
+        if entry is None:
+            entry = self._host_semaphores[host] = [asyncio.Semaphore(self.per_host_limit), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._host_semaphores[host]
+
+    def _backoff(self, attempt: int) -> float:
+        # Same schedule as urllib3's Retry: retry straight away once, then backoff_factor * 2^(n-1)
+        return 0 if attempt <= 1 else self.backoff_factor * (2 ** (attempt - 1))
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResponse:
+        """
+        Fetch a URL, retrying connection errors, attempts that time out and retryable statuses until the total deadline.
+        A malformed or non-HTTP URL fails straight away
+
+        Args:
+            url: The URL to fetch
+            headers: Extra request headers, eg. conditional request validators
+
+        Returns:
+            FetchResponse: The final response, which may still be an error status
+        """
+        if urlparse(url).scheme.lower() not in ('http', 'https'):
+            raise requests.exceptions.InvalidSchema("No connection adapters were found for {!r}".format(url))
+
+        session = self._get_session()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.total_timeout
+
+        attempt = 0
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise requests.Timeout("Timed out fetching {} after {} attempts".format(url, attempt))
+
+            try:
+                async with self._total_semaphore, self._host_slot(url):
+                    async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=min(remaining, self.attempt_timeout))) as response:
+                        content = await response.read()
+                        fetched = FetchResponse(str(response.url), response.status, response.headers, content)
+                if fetched.status_code not in self.status_forcelist or attempt >= self.retries:
+                    return fetched
+                retry_after = fetched.headers.get('Retry-After')
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else self._backoff(attempt + 1)
+            except (aiohttp.InvalidURL, aiohttp.NonHttpUrlClientError) as e:
+                # Retrying can't fix the URL itself
+                raise requests.exceptions.InvalidURL("Invalid URL {!r}: {}".format(url, str(e)))
+            except asyncio.TimeoutError:
+                if attempt >= self.retries:
+                    raise requests.Timeout("Timed out fetching {} after {} attempts".format(url, attempt + 1))
+                delay = self._backoff(attempt + 1)
+            except aiohttp.ClientError as e:
+                if attempt >= self.retries:
+                    raise requests.ConnectionError("Failed to fetch {}: {}".format(url, str(e)))
+                delay = self._backoff(attempt + 1)
+
+            attempt += 1
+            await asyncio.sleep(min(delay, max(deadline - loop.time(), 0)))
+
+    async def fetch_many(self, urls: Iterable[str], headers: Optional[Dict[str, str]] = None) -> AsyncIterator[Tuple[str, Union[FetchResponse, Exception]]]:
+        """
+        Fetch many URLs concurrently
+
+        Yields:
+            (url, response or exception) tuples in the order the fetches complete
+        """
+        async def fetch_one(url):
+            try:
+                return url, await self.fetch(url, headers)
+            except requests.RequestException as e:
+                return url, e
+
+        for task in asyncio.as_completed([fetch_one(url) for url in urls]):
+            yield await task
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+class FetchEngine:
+    """
+    Runs an AsyncFetcher on a background event loop so synchronous code (the Flask
+    endpoints, worker threads, scripts) can share one pool of in-flight fetches.
+    """
+
+    def __init__(self, **fetcher_kwargs):
+        self.fetcher = AsyncFetcher(**fetcher_kwargs)
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="fetch_engine", daemon=True).start()
+            return self._loop
+
+    def submit(self, url: str, headers: Optional[Dict[str, str]] = None):
+        """Start a fetch on the background loop and return a concurrent.futures.Future for it"""
+        return asyncio.run_coroutine_threadsafe(self.fetcher.fetch(url, headers), self._get_loop())
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResponse:
+        """Blocking fetch with the same call signature as requests.Session.get"""
+        return self.submit(url, headers).result()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._loop is not None:
+                asyncio.run_coroutine_threadsafe(self.fetcher.close(), self._loop).result()
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
@@ -0,0 +1,49 @@
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only track where the click came from and never change the page
+tracking_param_pattern = re.compile(r'^(utm_.*|fbclid|gclid|dclid|gbraid|wbraid|msclkid|yclid|mc_cid|mc_eid|_ga|_gl|igshid|ref|ref_src|amp|print)$', re.I)
+
+# Trailing path segments of AMP and print versions of the same recipe page
+alternate_view_segments = ['amp', 'print']
+
+default_ports = {'http': 80, 'https': 443}
+
+def canonicalize_url(url):
+    """
+    Normalize a recipe URL so variants of the same page share one cache entry.
+
+    Strips tracking parameters and fragments, lowercases the scheme and host, drops
+    default ports, duplicate and trailing slashes and the /amp/ or /print/ views.
+
+    Args:
+        url (str): The URL as pasted by the user
+
+    Returns:
+        str: The canonical URL
+
+    Raises:
+        ValueError: If the URL has no scheme or can't be parsed
+    """
+    url = url.strip()
+    if '://' not in url:
+        # Same as requests did before URLs were canonicalized
+        raise ValueError("Invalid URL {!r}: No scheme supplied. Perhaps you meant https://{}?".format(url, url))
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+
+    host = (parts.hostname or '').rstrip('.')
+    if parts.port and parts.port != default_ports.get(scheme):
+        host = '{}:{}'.format(host, parts.port)
+
+    path = re.sub(r'/{2,}', '/', parts.path)
+    segments = [segment for segment in path.split('/') if segment]
+    while segments and segments[-1].lower() in alternate_view_segments:
+        segments.pop()
+    path = '/' + '/'.join(segments)
+
+    query_params = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if not tracking_param_pattern.match(key)]
+    query = urlencode(sorted(query_params))
+
+    return urlunsplit((scheme, host, path, query, ''))
@@ -0,0 +1,149 @@
+import os
+import time
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional, Dict, Any, Callable
+
+EXTRACTION_MODES = ('inline', 'thread', 'process')
+
+def _timed_call(fn: Callable, *args) -> tuple:
+    # Runs inside the worker, wall clock so start/finish times are comparable across processes
+    started_at = time.time()
+    result = fn(*args)
+    return started_at, time.time(), result
+
+class ExtractionExecutor:
+    """
+    Long-lived executor for the CPU-bound recipe extraction.
+
+    Modes:
+        inline: run in the calling thread
+        thread: a shared thread pool, no per-request pool setup but still bound by the GIL
+        process: warm worker processes that get the raw page bytes, so extraction runs on every core
+
+    Records how long each task waited for a worker and how long it ran, to size the pool per core count.
+    """
+
+    def __init__(self, mode: str = 'thread', max_workers: Optional[int] = None,
+                 initializer: Optional[Callable] = None, sample_size: int = 1024):
+        if mode not in EXTRACTION_MODES:
+            raise ValueError("Unknown extraction mode {}, expected one of {}".format(mode, ', '.join(EXTRACTION_MODES)))
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self.initializer = initializer
+        self.tasks = 0
+        self.failures = 0
+        self.in_flight = 0
+        self._queue_wait_samples = deque(maxlen=sample_size)
+        self._exec_samples = deque(maxlen=sample_size)
+        self._queue_wait_total = 0.0
+        self._exec_total = 0.0
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # Created on first use: worker processes import the app modules again, and must not start pools of their own
+        with self._lock:
+            if self._pool is None:
+                if self.mode == 'process':
+                    # spawn rather than fork, the app already runs threads (fetch engine loop, log shipping)
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'),
+                                                     initializer=self.initializer)
+                    # Start every worker now instead of one per submit
+                    for _ in range(self.max_workers):
+                        self._pool.submit(time.sleep, 0)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="extraction",
+                                                    initializer=self.initializer)
+            return self._pool
+
+    def _record(self, submitted_at: float, started_at: float, finished_at: float) -> None:
+        queue_wait = max(started_at - submitted_at, 0)
+        exec_time = finished_at - started_at
+        with self._lock:
+            self._queue_wait_samples.append(queue_wait)
+            self._exec_samples.append(exec_time)
+            self._queue_wait_total += queue_wait
+            self._exec_total += exec_time
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """
+        Run fn(*args) on the executor
+
+        Args:
+            fn: A module level function when running in process mode, it is pickled by reference
+            args: Its arguments, eg. the raw page bytes
+
+        Returns:
+            Future: Resolves to the return value of fn
+        """
+        submitted_at = time.time()
+        with self._lock:
+            self.tasks += 1
+            self.in_flight += 1
+
+        future = Future()
+
+        def done(timed_future):
+            with self._lock:
+                self.in_flight -= 1
+            try:
+                started_at, finished_at, result = timed_future.result()
+            except BaseException as e:
+                with self._lock:
+                    self.failures += 1
+                future.set_exception(e)
+                return
+            self._record(submitted_at, started_at, finished_at)
+            future.set_result(result)
+
+        if self.mode == 'inline':
+            timed_future = Future()
+            try:
+                timed_future.set_result(_timed_call(fn, *args))
+            except Exception as e:
+                timed_future.set_exception(e)
+            done(timed_future)
+        else:
+            self._get_pool().submit(_timed_call, fn, *args).add_done_callback(done)
+        return future
+
+    def run(self, fn: Callable, *args) -> Any:
+        """Blocking version of submit"""
+        return self.submit(fn, *args).result()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: Task counts plus average/p50/p95/max queue wait and execution time in milliseconds over the recent tasks
+        """
+        def summary(samples, total, count):
+            if not samples:
+                return {'avg_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+            ordered = sorted(samples)
+            return {
+                'avg_ms': round(total / count * 1000, 3),
+                'p50_ms': round(ordered[len(ordered) // 2] * 1000, 3),
+                'p95_ms': round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000, 3),
+                'max_ms': round(ordered[-1] * 1000, 3)
+            }
+
+        with self._lock:
+            completed = self.tasks - self.in_flight - self.failures
+            return {
+                'mode': self.mode,
+                'workers': self.max_workers,
+                'tasks': self.tasks,
+                'failures': self.failures,
+                'in_flight': self.in_flight,
+                'queue_wait': summary(self._queue_wait_samples, self._queue_wait_total, max(completed, 1)),
+                'exec': summary(self._exec_samples, self._exec_total, max(completed, 1))
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
@@ -2,8 +2,8 @@ import requests
 import time
 import os
 import threading
-import queue
-from concurrent.futures import ThreadPoolExecutor, Future
+import atexit
+from collections import deque
 from typing import Optional, Dict, Any, List
 from datadog_api_client import ApiClient, Configuration
 from datadog_api_client.v2.api.logs_api import LogsApi
@@ -54,75 +54,155 @@ class GrafanaLogger:
             return False
 
 class DatadogLogger:
-    def __init__(self):
-        # Create a thread pool with a maximum of 2 worker threads
-        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="datadog_logger")
+    """
+    Ships log lines to Datadog in batches from a background thread.
+
+    log() only appends to a bounded ring buffer, so a request never waits on Datadog and memory stays
+    capped however far behind the intake is. A flusher thread sends up to batch_size lines per request,
+    as soon as that many are waiting or every flush_interval_ms, through one ApiClient kept for the life
+    of the logger. When the buffer is full the oldest line is dropped (drop_policy='oldest') or the new
+    one is (drop_policy='newest'), and the drops are counted in stats().
+
+    The flusher is started by the first log() in each process, so forked workers get their own.
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval_ms: int = 1000, max_buffer: int = 10000, drop_policy: str = 'oldest',
+                 send_timeout: float = 5, configuration: Optional[Configuration] = None):
+        if drop_policy not in ('oldest', 'newest'):
+            raise ValueError("drop_policy must be 'oldest' or 'newest'")
+        # Datadog takes at most 1000 logs per request
+        self.batch_size = max(1, min(batch_size, 1000))
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_buffer = max_buffer
+        self.drop_policy = drop_policy
+        self.send_timeout = send_timeout
+        self.configuration = configuration
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flusher = None
+        self._flusher_pid = None
+        self._api_client = None
         self._is_shutdown = False
 
-    def _send_log(self, message: str, labels: Optional[Dict[str, str]] = None) -> bool:
+    def log(self, message: str, labels: Optional[Dict[str, str]] = None) -> None:
         """
-        Internal method to send a log message to Datadog
+        Queue a log message for Datadog, never blocks
+
+        Args:
+            message: The message to log
+            labels: Optional dictionary of labels to attach to the log entry
+        """
+        with self._lock:
+            if self._is_shutdown:
+                return
+            if self._flusher is None or self._flusher_pid != os.getpid():
+                self._start_flusher()
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                if self.drop_policy == 'newest':
+                    return
+                self._buffer.popleft()
+            self._buffer.append((str(message), dict(labels) if labels else None))
+            if len(self._buffer) >= self.batch_size:
+                self._wakeup.notify()
+
+    def _start_flusher(self) -> None:
+        # A forked child inherits the parent's buffer and client but not its thread, it starts over with its own
+        if self._flusher_pid is not None and self._flusher_pid != os.getpid():
+            self._buffer.clear()
+            self._api_client = None
+        self._flusher_pid = os.getpid()
+        self._flusher = threading.Thread(target=self._flush_loop, name="datadog_logger", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._lock:
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._buffer) < self.batch_size and not self._is_shutdown:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.wait(remaining)
+                if not self._buffer:
+                    if self._is_shutdown:
+                        return
+                    continue
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            self._send_batch(batch)
+
+    def _logs_api(self) -> LogsApi:
+        if self._api_client is None:
+            configuration = self.configuration or Configuration()
+            configuration.request_timeout = self.send_timeout
+            self._api_client = ApiClient(configuration)
+        return LogsApi(self._api_client)
+
+    def _send_batch(self, batch: List[Any]) -> bool:
+        """
+        Send one batch of (message, labels) in a single request to Datadog
         """
-        if self._is_shutdown:
-            print("Logger is shut down, cannot send logs")
-            return False
-            
         try:
-            configuration = Configuration()
-            
-            # Convert labels to Datadog tags format
-            tags = []
-            if labels:
-                tags = [f"{k}:{v}" for k, v in labels.items()]
-            
-            log_item = HTTPLogItem(
-                ddsource="recipe-scraper",
-                ddtags=",".join(tags) if tags else None,
-                message=str(message),
-                service="recipe-scraper-backend"
-            )
-            
-            body = HTTPLog([log_item])
-            
-            with ApiClient(configuration) as api_client:
-                api_instance = LogsApi(api_client)
-                response = api_instance.submit_log(
-                    content_encoding=ContentEncoding.DEFLATE,
-                    body=body
+            body = HTTPLog([
+                HTTPLogItem(
+                    ddsource="recipe-scraper",
+                    # Convert labels to Datadog tags format
+                    ddtags=",".join(f"{k}:{v}" for k, v in labels.items()) if labels else None,
+                    message=message,
+                    service="recipe-scraper-backend"
                 )
-                return True  # If we get here, the log was accepted (202)
+                for message, labels in batch
+            ])
+            self._logs_api().submit_log(content_encoding=ContentEncoding.DEFLATE, body=body)
         except Exception as e:
-            print(f"Failed to send log to Datadog: {str(e)}")
+            with self._lock:
+                self.failed += len(batch)
+            print(f"Failed to send {len(batch)} logs to Datadog: {str(e)}")
             return False
+        with self._lock:
+            self.sent += len(batch)
+            self.batches += 1
+        return True
 
-    def log(self, message: str, labels: Optional[Dict[str, str]] = None) -> None:
-        """
-        Asynchronously send a log message to Datadog using a thread pool
-        
-        Args:
-            message: The message to log
-            labels: Optional dictionary of labels to attach to the log entry
-        """
-        if not self._is_shutdown:
-            # Submit the logging task to the thread pool
-            self.executor.submit(self._send_log, message, labels)
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'buffered': len(self._buffer),
+                'sent': self.sent,
+                'batches': self.batches,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'max_buffer': self.max_buffer
+            }
 
-    def shutdown(self, timeout: int = 5) -> None:
+    def shutdown(self, timeout: float = 5) -> None:
         """
-        Explicitly shutdown the thread pool with a timeout
-        
+        Stop taking logs and flush what is buffered, giving up after timeout seconds
+
         Args:
-            timeout: Number of seconds to wait for pending tasks
+            timeout: Seconds to wait for the buffered logs to be sent, the ones still buffered after that are dropped
         """
-        if not self._is_shutdown:
+        with self._lock:
+            if self._is_shutdown:
+                return
             self._is_shutdown = True
-            try:
-                # First try graceful shutdown
-                self.executor.shutdown(wait=True, timeout=timeout)
-            except TimeoutError:
-                print("Timeout waiting for Datadog logs to flush, forcing shutdown")
-                # Force shutdown by cancelling pending tasks
-                self.executor.shutdown(wait=False)
+            self._wakeup.notify_all()
+            flusher = self._flusher if self._flusher_pid == os.getpid() else None
+        if flusher is not None:
+            flusher.join(timeout)
+        with self._lock:
+            if self._buffer:
+                print(f"Timeout waiting for Datadog logs to flush, dropping {len(self._buffer)} logs")
+                self.dropped += len(self._buffer)
+                self._buffer.clear()
+        if flusher is None or not flusher.is_alive():
+            if self._api_client is not None:
+                self._api_client.close()
 
 # Create logger instances
 # grafana_logger = GrafanaLogger(
@@ -130,4 +210,11 @@ class DatadogLogger:
 #     api_key=os.getenv('GRAFANA_TOKEN')
 # )
 
-datadog_logger = DatadogLogger()
\ No newline at end of file
+datadog_logger = DatadogLogger(
+    batch_size=int(os.getenv('RECIPE_SCRAPER_LOG_BATCH_SIZE', 100)),
+    flush_interval_ms=int(os.getenv('RECIPE_SCRAPER_LOG_FLUSH_INTERVAL_MS', 1000)),
+    max_buffer=int(os.getenv('RECIPE_SCRAPER_LOG_BUFFER_SIZE', 10000)),
+    drop_policy=os.getenv('RECIPE_SCRAPER_LOG_DROP_POLICY', 'oldest')
+)
+# Send what is still buffered when the process exits
+atexit.register(datadog_logger.shutdown, float(os.getenv('RECIPE_SCRAPER_LOG_SHUTDOWN_TIMEOUT', 5)))
\ No newline at end of file
@@ -3,7 +3,8 @@ from flask_restx import fields
 def create_models(api):
     # Define models for the input payloads
     recipe_url_model = api.model('RecipeURL', {
-        'recipe_url': fields.String(required=True, description='URL of the recipe')
+        'recipe_url': fields.String(required=True, description='URL of the recipe'),
+        'client_conversion': fields.Boolean(required=False, description='Also send the conversion_model to scale and convert the ingredients client-side')
     })
 
     unit_type_model = api.model('UnitType', {
@@ -14,4 +15,8 @@ def create_models(api):
         'serving_size': fields.String(required=True, description='Numeric value')
     })
 
-    return recipe_url_model, unit_type_model, serving_size_model 
\ No newline at end of file
+    recipe_urls_model = api.model('RecipeURLs', {
+        'recipe_urls': fields.List(fields.String, required=True, description='URLs of the recipes')
+    })
+
+    return recipe_url_model, unit_type_model, serving_size_model, recipe_urls_model 
\ No newline at end of file
@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import tempfile
+import threading
+from typing import Optional, Dict, Any, Callable
+
+class PageCache:
+    """
+    On-disk cache of fetched recipe pages keyed by URL.
+
+    Each entry is stored as a raw body file plus a small JSON metadata file holding
+    the ETag/Last-Modified validators, so stale entries are revalidated with a
+    conditional request instead of being downloaded again.
+    """
+
+    def __init__(self, directory: str, ttl: int = 3600, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._total_bytes = self._scan_total_bytes()
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key + '.body'), os.path.join(self.directory, key + '.json')
+
+    def _scan_total_bytes(self) -> int:
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.body'):
+                total += entry.stat().st_size
+        return total
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Read a cached entry
+
+        Args:
+            url: The URL the page was cached under
+
+        Returns:
+            dict: The metadata with the page bytes under 'content', or None if not cached
+        """
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, 'r') as f:
+                entry = json.load(f)
+            with open(body_path, 'rb') as f:
+                entry['content'] = f.read()
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry.get('fetched_at', 0) < self.ttl
+
+    def conditional_headers(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url: str, content: bytes, response_headers: Optional[Dict[str, str]] = None) -> None:
+        """
+        Save a page and its validators, evicting old pages if the cache is over its size limit
+
+        Args:
+            url: The URL to cache the page under
+            content: The raw page bytes
+            response_headers: The upstream response headers, used for the ETag/Last-Modified validators
+        """
+        response_headers = response_headers or {}
+        if 'no-store' in response_headers.get('Cache-Control', '').lower() or len(content) > self.max_bytes:
+            return
+
+        body_path, meta_path = self._paths(url)
+        metadata = {
+            'url': url,
+            'etag': response_headers.get('ETag'),
+            'last_modified': response_headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+            'size': len(content)
+        }
+        with self._lock:
+            previous_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+            self._write_atomic(body_path, content)
+            self._write_atomic(meta_path, json.dumps(metadata).encode('utf-8'))
+            self._total_bytes += len(content) - previous_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def refresh(self, url: str, entry: Dict[str, Any], response_headers: Optional[Dict[str, str]] = None) -> None:
+        """Restart the TTL of an entry after the upstream site answered 304 Not Modified"""
+        response_headers = response_headers or {}
+        _, meta_path = self._paths(url)
+        metadata = {key: value for key, value in entry.items() if key != 'content'}
+        metadata['etag'] = response_headers.get('ETag') or entry.get('etag')
+        metadata['last_modified'] = response_headers.get('Last-Modified') or entry.get('last_modified')
+        metadata['fetched_at'] = time.time()
+        with self._lock:
+            self._write_atomic(meta_path, json.dumps(metadata).encode('utf-8'))
+
+    def _evict(self) -> None:
+        # Least recently used first, the body file's atime is bumped on every hit
+        bodies = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.body'):
+                stat = entry.stat()
+                bodies.append((stat.st_atime, stat.st_size, entry.path))
+        self._total_bytes = sum(size for _, size, _ in bodies)
+
+        for _, size, body_path in sorted(bodies):
+            if self._total_bytes <= self.max_bytes:
+                break
+            for path in (body_path, body_path[:-len('.body')] + '.json'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def _touch(self, url: str) -> None:
+        body_path, _ = self._paths(url)
+        try:
+            os.utime(body_path)
+        except OSError:
+            pass
+
+    def _before_fetch(self, url: str, headers: Optional[Dict[str, str]]):
+        # Returns the cached entry (if any), whether it can be served as is and the headers to send upstream
+        entry = self.get(url)
+        if entry and self.is_fresh(entry):
+            with self._lock:
+                self.hits += 1
+            self._touch(url)
+            return entry, True, None
+
+        request_headers = dict(headers or {})
+        if entry:
+            request_headers.update(self.conditional_headers(entry))
+        return entry, False, request_headers
+
+    def _after_fetch(self, url: str, entry: Optional[Dict[str, Any]], response) -> bytes:
+        if entry and response.status_code == 304:
+            with self._lock:
+                self.revalidations += 1
+            self.refresh(url, entry, response.headers)
+            self._touch(url)
+            return entry['content']
+
+        response.raise_for_status()
+        with self._lock:
+            self.misses += 1
+        self.store(url, response.content, response.headers)
+        return response.content
+
+    def fetch(self, url: str, fetcher: Callable, headers: Optional[Dict[str, str]] = None) -> bytes:
+        """
+        Return the page bytes for a URL, going upstream only when the cached copy is missing or stale
+
+        Args:
+            url: The URL to fetch
+            fetcher: Called as fetcher(url, headers=...) and returns a requests-style response
+            headers: Request headers to send upstream
+
+        Returns:
+            bytes: The raw page content
+        """
+        entry, is_fresh, request_headers = self._before_fetch(url, headers)
+        if is_fresh:
+            return entry['content']
+        return self._after_fetch(url, entry, fetcher(url, headers=request_headers))
+
+    async def fetch_async(self, url: str, fetcher: Callable, headers: Optional[Dict[str, str]] = None) -> bytes:
+        """Same as fetch, for an async fetcher such as AsyncFetcher.fetch. The cache's file reads and writes run in a thread off the event loop"""
+        loop = asyncio.get_running_loop()
+        entry, is_fresh, request_headers = await loop.run_in_executor(None, self._before_fetch, url, headers)
+        if is_fresh:
+            return entry['content']
+        response = await fetcher(url, headers=request_headers)
+        return await loop.run_in_executor(None, self._after_fetch, url, entry, response)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'evictions': self.evictions,
+                'bytes': self._total_bytes
+            }
+
+page_cache = PageCache(
+    directory=os.getenv('RECIPE_SCRAPER_PAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'recipe-scraper-page-cache')),
+    ttl=int(os.getenv('RECIPE_SCRAPER_PAGE_CACHE_TTL', 3600)),
+    max_bytes=int(os.getenv('RECIPE_SCRAPER_PAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+)
@@ -0,0 +1,166 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+from typing import Optional, Dict, Any
+from logic.recipe_fingerprint import hamming_distance
+
+class RecipeResultCache:
+    """
+    Cache of final extraction results keyed by URL, a hash of the fetched page and the extractor version.
+
+    Entries live in an in-memory LRU and, when a directory is given, are also written to
+    disk so they survive restarts and are shared between worker processes. Complete results
+    can also be registered under a content fingerprint (simhash) so a near-identical copy of
+    the recipe served by a mirror on another host maps to the same entry.
+    """
+
+    fingerprint_bands = 4
+    max_fingerprint_distance = 1
+    # A result is only shared through its fingerprint when it has all of these
+    complete_fields = ('recipe_name', 'recipe_steps', 'ingredients')
+
+    def __init__(self, version: str, max_entries: int = 1024, directory: Optional[str] = None):
+        self.version = version
+        self.max_entries = max_entries
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.fingerprint_hits = 0
+        self._entries = OrderedDict()
+        self._fingerprints = {}
+        self._fingerprint_bands = {}
+        self._lock = threading.Lock()
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, url: str, content: bytes) -> str:
+        content_hash = hashlib.sha256(content).hexdigest()
+        return hashlib.sha256('\0'.join([self.version, url, content_hash]).encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.json')
+
+    def _bands(self, fingerprint: int):
+        # Two fingerprints within max_fingerprint_distance bits always share at least one whole band
+        band_bits = 64 // self.fingerprint_bands
+        mask = (1 << band_bits) - 1
+        return [(i, (fingerprint >> (i * band_bits)) & mask) for i in range(self.fingerprint_bands)]
+
+    def _index_fingerprint(self, key: str, fingerprint: int, host: str) -> None:
+        self._fingerprints[key] = (fingerprint, host)
+        for band in self._bands(fingerprint):
+            self._fingerprint_bands.setdefault(band, set()).add(key)
+
+    def _forget(self, key: str) -> None:
+        indexed = self._fingerprints.pop(key, None)
+        if indexed is not None:
+            fingerprint, _ = indexed
+            for band in self._bands(fingerprint):
+                keys = self._fingerprint_bands.get(band)
+                if keys:
+                    keys.discard(key)
+                    if not keys:
+                        del self._fingerprint_bands[band]
+
+    def _find_similar(self, fingerprint: int, host: str) -> Optional[str]:
+        # Pages on the same host share a template, a near match there is more likely another recipe than a copy
+        for band in self._bands(fingerprint):
+            for key in self._fingerprint_bands.get(band, ()):
+                indexed_fingerprint, indexed_host = self._fingerprints[key]
+                if indexed_host != host and hamming_distance(fingerprint, indexed_fingerprint) <= self.max_fingerprint_distance:
+                    return key
+        return None
+
+    def _remember(self, key: str, encoded: str) -> None:
+        self._entries[key] = encoded
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted_key, _ = self._entries.popitem(last=False)
+            self._forget(evicted_key)
+
+    def get(self, url: str, content: bytes) -> Optional[Dict[str, Any]]:
+        """
+        Look up the extraction result for a page
+
+        Args:
+            url: The URL the page was fetched from
+            content: The raw page bytes
+
+        Returns:
+            dict: A fresh copy of the cached result, or None on a miss
+        """
+        key = self.key(url, content)
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+
+        if encoded is None and self.directory:
+            try:
+                with open(self._path(key), 'r') as f:
+                    encoded = f.read()
+            except OSError:
+                encoded = None
+            if encoded is not None:
+                with self._lock:
+                    self._remember(key, encoded)
+
+        with self._lock:
+            if encoded is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # Stored encoded so callers can mutate what they get back without touching the cache
+        return json.loads(encoded)
+
+    def get_similar(self, url: str, fingerprint: int) -> Optional[Dict[str, Any]]:
+        """
+        Look up the complete result of a near-identical page on another host, for when get() missed
+
+        Args:
+            url: The URL the page was fetched from
+            fingerprint: The page's content fingerprint
+
+        Returns:
+            dict: A fresh copy of the cached result, or None if no page is close enough
+        """
+        with self._lock:
+            similar_key = self._find_similar(fingerprint, urlparse(url).hostname)
+            if similar_key is None:
+                return None
+            encoded = self._entries[similar_key]
+            self._entries.move_to_end(similar_key)
+            self.fingerprint_hits += 1
+        return json.loads(encoded)
+
+    def set(self, url: str, content: bytes, result: Dict[str, Any], fingerprint: Optional[int] = None) -> None:
+        """
+        Save the extraction result for a page
+
+        Args:
+            url: The URL the page was fetched from
+            content: The raw page bytes
+            result: The extraction result, must be JSON serializable
+            fingerprint: Optional content fingerprint to also make a complete result reachable from near-identical pages
+        """
+        key = self.key(url, content)
+        encoded = json.dumps(result)
+        with self._lock:
+            self._remember(key, encoded)
+            self._forget(key)
+            if fingerprint is not None and all(result.get(field) for field in self.complete_fields):
+                self._index_fingerprint(key, fingerprint, urlparse(url).hostname)
+
+        if self.directory:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.write(encoded)
+            os.replace(temp_path, self._path(key))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'fingerprint_hits': self.fingerprint_hits, 'entries': len(self._entries)}
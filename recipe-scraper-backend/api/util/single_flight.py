@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import concurrent.futures
+from concurrent.futures import Future
+from typing import Optional, Dict, Any, Callable, Awaitable
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls that share a key.
+
+    The first caller for a key runs the function, every caller that arrives while it
+    is still running waits for that same result (or exception) instead of repeating the work.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Run fn once for all concurrent callers with the same key
+
+        Args:
+            key: Identifies the work, eg. the canonical recipe URL
+            fn: The function to run if no call for this key is in flight
+            timeout: How many seconds a waiting caller waits for the in-flight call
+
+        Returns:
+            The result of fn, shared by every caller that was coalesced into the call
+
+        Raises:
+            TimeoutError: If a waiting caller gave up before the in-flight call finished
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = Future()
+                self._calls[key] = call
+            else:
+                self.coalesced += 1
+
+        if not is_leader:
+            try:
+                return call.result(timeout=timeout)
+            except concurrent.futures.TimeoutError:
+                raise TimeoutError("Timed out waiting for the in-flight call for {}".format(key))
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            # Later callers start a new call instead of reusing this result
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'coalesced': self.coalesced, 'in_flight': len(self._calls)}
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines running on one event loop"""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """
+        Await fn once for all concurrent callers with the same key
+
+        Raises:
+            TimeoutError: If a waiting caller gave up before the in-flight call finished
+        """
+        call = self._calls.get(key)
+        if call is not None:
+            self.coalesced += 1
+            try:
+                # shield so a waiter timing out doesn't cancel the call for everyone else
+                return await asyncio.wait_for(asyncio.shield(call), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError("Timed out waiting for the in-flight call for {}".format(key))
+
+        call = asyncio.get_running_loop().create_future()
+        self._calls[key] = call
+        try:
+            result = await fn()
+        except BaseException as e:
+            call.set_exception(e)
+            # Nobody may be waiting on it, don't let asyncio complain about an unretrieved exception
+            call.exception()
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {'coalesced': self.coalesced, 'in_flight': len(self._calls)}
@@ -0,0 +1,181 @@
+import os
+import time
+import redis
+import secrets
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+
+def new_state_id() -> str:
+    """A random id for a new recipe state, the only thing the session cookie carries"""
+    return secrets.token_urlsafe(16)
+
+class StateStore(ABC):
+    """
+    Server-side store for the recipe state of each session, kept under a random state id.
+
+    A state is a dict of named fields with already-encoded bytes values. save() only writes
+    the fields it is given, so callers can save just what changed. Every load and save pushes
+    the state's expiry back by ttl seconds.
+    """
+
+    @abstractmethod
+    def load(self, state_id: str) -> Optional[Dict[str, bytes]]:
+        """
+        Read a state
+
+        Args:
+            state_id: The id the state was saved under
+
+        Returns:
+            dict: Field name -> encoded value, or None if there is no such state (or it expired)
+        """
+
+    @abstractmethod
+    def save(self, state_id: str, fields: Dict[str, bytes]) -> None:
+        """
+        Write fields of a state, creating it if needed. Fields not passed keep their saved value
+
+        Args:
+            state_id: The id to save the state under
+            fields: Field name -> encoded value
+        """
+
+    @abstractmethod
+    def delete(self, state_id: str) -> None:
+        """Remove a state"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring"""
+
+class MemoryStateStore(StateStore):
+    """
+    In-process state store: an LRU of at most max_entries states, each expiring ttl seconds after it was last used.
+
+    Only visible to the process it lives in, use KeyValueStateStore when requests are spread over
+    several worker processes or machines.
+    """
+
+    def __init__(self, ttl: int = 1800, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._states = OrderedDict()  # state id -> (expires at, fields), least recently used first
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        # Every use moves a state to the end with a fresh expiry, so the expired ones are all at the front
+        while self._states:
+            state_id, (expires_at, _) = next(iter(self._states.items()))
+            if expires_at > now:
+                break
+            del self._states[state_id]
+            self.expirations += 1
+
+    def load(self, state_id: str) -> Optional[Dict[str, bytes]]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._states.get(state_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._states[state_id] = (now + self.ttl, entry[1])
+            self._states.move_to_end(state_id)
+            self.hits += 1
+            return dict(entry[1])
+
+    def save(self, state_id: str, fields: Dict[str, bytes]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._states.get(state_id)
+            saved = dict(entry[1]) if entry else {}
+            saved.update(fields)
+            self._states[state_id] = (now + self.ttl, saved)
+            self._states.move_to_end(state_id)
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, state_id: str) -> None:
+        with self._lock:
+            self._states.pop(state_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'expirations': self.expirations, 'entries': len(self._states)}
+
+class KeyValueStateStore(StateStore):
+    """
+    State store on a networked key-value server speaking the Redis protocol (Redis, Valkey, KeyDB...).
+
+    Each state is a hash under its state id, so saving a few fields is an HSET of just those. The
+    commands of one load/save go out together as one pipeline, so one round trip over a pooled
+    connection of the redis client.
+    """
+
+    def __init__(self, client: redis.Redis, ttl: int = 1800, key_prefix: str = 'recipe-state:'):
+        self.client = client
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self.round_trips = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str, timeout: float = 2.0, **kwargs) -> 'KeyValueStateStore':
+        """redis://[:password@]host[:port][/db]"""
+        return cls(redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout), **kwargs)
+
+    def _execute(self, build) -> List[Any]:
+        # build queues the commands on the pipeline, they are sent and answered in one round trip
+        with self.client.pipeline(transaction=False) as pipeline:
+            build(pipeline)
+            replies = pipeline.execute()
+        with self._lock:
+            self.round_trips += 1
+        return replies
+
+    def _key(self, state_id: str) -> str:
+        return self.key_prefix + state_id
+
+    def load(self, state_id: str) -> Optional[Dict[str, bytes]]:
+        key = self._key(state_id)
+        values, _ = self._execute(lambda pipeline: pipeline.hgetall(key).pexpire(key, int(self.ttl * 1000)))
+        if not values:
+            return None
+        return {field.decode('utf-8'): value for field, value in values.items()}
+
+    def save(self, state_id: str, fields: Dict[str, bytes]) -> None:
+        key = self._key(state_id)
+        def build(pipeline):
+            if fields:
+                pipeline.hset(key, mapping=fields)
+            pipeline.pexpire(key, int(self.ttl * 1000))
+        self._execute(build)
+
+    def delete(self, state_id: str) -> None:
+        self.client.delete(self._key(state_id))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'round_trips': self.round_trips}
+
+def create_state_store(url: Optional[str], ttl: int = 1800, max_entries: int = 10000, key_prefix: str = 'recipe-state:') -> StateStore:
+    """A KeyValueStateStore for a redis:// URL (its keys starting with key_prefix), the in-process MemoryStateStore otherwise"""
+    if url and url.startswith('redis://'):
+        return KeyValueStateStore.from_url(url, ttl=ttl, key_prefix=key_prefix)
+    return MemoryStateStore(ttl=ttl, max_entries=max_entries)
+
+# Where the recipe state of every session lives, the session cookie only holds the state id.
+# RECIPE_SCRAPER_STATE_STORE_URL=redis://host:6379/0 shares the states between worker processes and machines
+state_store = create_state_store(
+    os.getenv('RECIPE_SCRAPER_STATE_STORE_URL'),
+    ttl=int(os.getenv('RECIPE_SCRAPER_STATE_TTL', 30 * 60)),
+    max_entries=int(os.getenv('RECIPE_SCRAPER_STATE_STORE_SIZE', 10000))
+)
@@ -0,0 +1,149 @@
+"""
+Concurrent-connection capacity of the WSGI (app.py) and ASGI (asgi.py) modes.
+
+Starts a local recipe site that answers after a fixed delay (standing in for slow
+upstream recipe websites), serves the API both ways and fires batches of concurrent
+/scrape-recipe-steps requests for unique recipe URLs at each, so every request has
+to go upstream.
+
+Usage (from recipe-scraper-backend/):
+    python benchmarks/asgi_vs_wsgi.py --concurrency 50 200 500 --upstream-delay 1.0
+
+WSGI mode runs under gunicorn with gthread workers (threads bound the number of
+scrapes in flight), ASGI mode runs under uvicorn with a single worker process.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import aiohttp
+import jwt
+from aiohttp import web
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api')
+SECRET_KEY = 'benchmark'
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def recipe_page(number):
+    recipe = {
+        "@type": "Recipe",
+        "name": "Benchmark recipe {}".format(number),
+        "recipeIngredient": ["2 cups flour", "1 tsp salt", "3 eggs", "250 ml milk"],
+        "recipeInstructions": ["Mix everything.", "Rest for 10 minutes.", "Cook until golden."],
+        "recipeYield": "4 servings"
+    }
+    filler = "<p>Recipe story paragraph.</p>" * 200
+    return '<html><head><script type="application/ld+json">{}</script></head><body>{}</body></html>'.format(json.dumps(recipe), filler)
+
+async def start_upstream(delay):
+    async def handle(request):
+        await asyncio.sleep(delay)
+        return web.Response(text=recipe_page(request.match_info['number']), content_type='text/html')
+
+    web_app = web.Application()
+    web_app.router.add_get('/recipe/{number}', handle)
+    runner = web.AppRunner(web_app)
+    await runner.setup()
+    port = free_port()
+    await web.TCPSite(runner, '127.0.0.1', port, backlog=4096).start()
+    return runner, 'http://127.0.0.1:{}'.format(port)
+
+def start_server(mode, port, threads):
+    env = dict(
+        os.environ,
+        RECIPE_SCRAPER_USERNAME='benchmark',
+        RECIPE_SCRAPER_PASSWORD='benchmark',
+        RECIPE_SCRAPER_SESSION_KEY=SECRET_KEY,
+        RECIPE_SCRAPER_PAGE_CACHE_DIR=tempfile.mkdtemp(prefix='recipe-scraper-bench-'),
+        # Every fake recipe lives on the same host, lift the per-host limit so it behaves like many different sites
+        RECIPE_SCRAPER_FETCH_PER_HOST_LIMIT='100000',
+        DD_API_KEY=''
+    )
+    if mode == 'wsgi':
+        command = [sys.executable, '-m', 'gunicorn', '--chdir', API_DIR, '-w', '1', '-k', 'gthread', '--threads', str(threads),
+                   '--backlog', '4096', '-b', '127.0.0.1:{}'.format(port), '--log-level', 'warning', 'app:app']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', '--app-dir', API_DIR, '--host', '127.0.0.1', '--port', str(port),
+                   '--backlog', '4096', '--log-level', 'warning', 'asgi:asgi_app']
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('{} server did not start'.format(mode))
+
+async def run_load(api_url, upstream_url, concurrency, first_recipe, timeout):
+    token = jwt.encode({'username': 'benchmark', 'exp': int(time.time()) + 3600}, SECRET_KEY, algorithm='HS256')
+    latencies = []
+    errors = 0
+
+    async def one(session, number):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            async with session.post(api_url + '/scrape-recipe-steps', json={'recipe_url': '{}/recipe/{}'.format(upstream_url, number)},
+                                    headers={'Authorization': token}) as response:
+                body = await response.json(content_type=None)
+                if response.status != 200 or 'error' in body:
+                    errors += 1
+                    return
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            errors += 1
+            return
+        latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(session, first_recipe + i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'ok': len(latencies),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 2),
+        'req_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000) if latencies else None,
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000) if latencies else None
+    }
+
+async def main(args):
+    upstream, upstream_url = await start_upstream(args.upstream_delay)
+    first_recipe = 0
+    try:
+        for mode in ('wsgi', 'asgi'):
+            port = free_port()
+            process = start_server(mode, port, args.threads)
+            try:
+                for concurrency in args.concurrency:
+                    result = await run_load('http://127.0.0.1:{}'.format(port), upstream_url, concurrency, first_recipe, args.timeout)
+                    first_recipe += concurrency
+                    print('{:<5} concurrency={:<5} {}'.format(mode, concurrency, result), flush=True)
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        await upstream.cleanup()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200, 500])
+    parser.add_argument('--upstream-delay', type=float, default=1.0, help='Seconds the fake recipe site takes to answer')
+    parser.add_argument('--threads', type=int, default=32, help='gthread threads for the WSGI worker')
+    parser.add_argument('--timeout', type=float, default=60, help='Client timeout per request in seconds')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,76 @@
+"""
+Scaling and converting a whole meal plan at once with IngredientBatch, against ingredient_views per recipe.
+
+A plan is --recipes recipes of --lines-per-recipe lines from the golden corpus in
+unit_tests/fixtures/ingredient_lines.json, prepared the way ScrapeRecipeSteps stores them. Each round shows
+the plan in both unit types and a few serving sizes. "batch" includes building the arrays, "batch (reused)"
+builds them once per plan and only times views().
+
+Usage (from recipe-scraper-backend/):
+    python benchmarks/batch_engine.py --recipes 50 --lines-per-recipe 12
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'api')]
+
+from logic.recipe_units import extract_units
+from logic.ingredient_base import prepare_ingredients, ingredient_views
+from logic.batch_engine import IngredientBatch
+
+REQUESTS = [(unit_type, serving_size) for unit_type in ('si', 'metric') for serving_size in (None, 2, 7, 2.5)]
+
+def meal_plan(corpus, recipes, lines_per_recipe, seed):
+    rng = random.Random(seed)
+    plan = []
+    for _ in range(recipes):
+        ingredients, original_unit_type, _ = extract_units(rng.sample(corpus, lines_per_recipe))
+        servings = rng.choice(['2', '4', '6 servings', '8'])
+        plan.append((prepare_ingredients(ingredients, servings, original_unit_type), servings))
+    return plan
+
+def scalar(plan):
+    return [[ingredient_views(base_ingredients, unit_type, serving_size, servings) for base_ingredients, servings in plan] for unit_type, serving_size in REQUESTS]
+
+def batch(plan):
+    engine = IngredientBatch(plan)
+    return [engine.views(unit_type, serving_size) for unit_type, serving_size in REQUESTS]
+
+def best_of(repeats, fn):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recipes', type=int, nargs='+', default=[50, 500])
+    parser.add_argument('--lines-per-recipe', type=int, default=12)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, 'unit_tests', 'fixtures', 'ingredient_lines.json'), encoding='utf-8') as f:
+        corpus = [entry['line'] for entry in json.load(f)]
+
+    for recipes in args.recipes:
+        plan = meal_plan(corpus, recipes, args.lines_per_recipe, args.seed)
+        assert scalar(plan) == batch(plan)
+        engine = IngredientBatch(plan)
+        lines = recipes * args.lines_per_recipe * len(REQUESTS)
+
+        scalar_time = best_of(args.repeats, lambda: scalar(plan))
+        batch_time = best_of(args.repeats, lambda: batch(plan))
+        reused_time = best_of(args.repeats, lambda: [engine.views(unit_type, serving_size) for unit_type, serving_size in REQUESTS])
+        print('recipes={} lines={} (x{} unit type/serving size requests)'.format(recipes, recipes * args.lines_per_recipe, len(REQUESTS)))
+        print('  ingredient_views  {:>8.1f} ms  {:>6.2f} us/line'.format(scalar_time * 1000, scalar_time / lines * 1e6))
+        print('  batch             {:>8.1f} ms  {:>6.2f} us/line  ({:.1f}x)'.format(batch_time * 1000, batch_time / lines * 1e6, scalar_time / batch_time))
+        print('  batch (reused)    {:>8.1f} ms  {:>6.2f} us/line  ({:.1f}x)'.format(reused_time * 1000, reused_time / lines * 1e6, scalar_time / reused_time))
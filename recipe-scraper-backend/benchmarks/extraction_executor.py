@@ -0,0 +1,64 @@
+"""
+Throughput of the extraction executor modes, to size RECIPE_SCRAPER_EXTRACTION_MODE/WORKERS per core count.
+
+Submits the same page (no structured data, so every DOM extractor runs) many times
+at once and reports pages per second plus the executor's queue-wait and execution
+time percentiles.
+
+Usage (from recipe-scraper-backend/):
+    python benchmarks/extraction_executor.py --pages 200 --workers 1 2 4 8
+    python benchmarks/extraction_executor.py --html saved_recipe_page.html
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path[:0] = [os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api')]
+
+from util.extraction_executor import ExtractionExecutor
+from logic.recipe_extraction import extract_recipe_fields, warm_extraction_worker
+
+def synthetic_page():
+    ingredients = ''.join('<li>{} cups ingredient number {}</li>'.format(i % 4 + 1, i) for i in range(25))
+    steps = ''.join('<li>Step {}: stir the pot and wait a little while.</li>'.format(i) for i in range(15))
+    story = ''.join('<div class="story"><p>Paragraph {} about this recipe and the family it came from.</p><span>More text</span></div>'.format(i) for i in range(400))
+    return ('<html><body><h1 class="entry-title">Benchmark Chicken Stew</h1>{}'
+            '<div class="recipe-ingredients"><ul>{}</ul></div><div class="recipe-instructions"><ol>{}</ol></div>'
+            '<p>Servings: 4</p></body></html>').format(story, ingredients, steps).encode('utf-8')
+
+def run(mode, workers, content, pages):
+    executor = ExtractionExecutor(mode=mode, max_workers=workers, initializer=warm_extraction_worker)
+    try:
+        # Warm up the pool before timing
+        executor.run(extract_recipe_fields, content, 'https://example.com/benchmark-chicken-stew')
+        start = time.perf_counter()
+        futures = [executor.submit(extract_recipe_fields, content, 'https://example.com/benchmark-chicken-stew') for _ in range(pages)]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+        stats = executor.stats()
+    finally:
+        executor.shutdown()
+    print('{:<8} workers={:<3} {:>7.1f} pages/s  queue_wait p50={}ms p95={}ms  exec p50={}ms p95={}ms'.format(
+        mode, workers, pages / elapsed, stats['queue_wait']['p50_ms'], stats['queue_wait']['p95_ms'],
+        stats['exec']['p50_ms'], stats['exec']['p95_ms']), flush=True)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 4])
+    parser.add_argument('--html', help='Benchmark with a saved recipe page instead of the synthetic one')
+    args = parser.parse_args()
+
+    if args.html:
+        with open(args.html, 'rb') as f:
+            content = f.read()
+    else:
+        content = synthetic_page()
+    print('cpu_count={} page_bytes={}'.format(os.cpu_count(), len(content)))
+
+    run('inline', 1, content, args.pages)
+    for mode in ('thread', 'process'):
+        for workers in sorted(set(args.workers)):
+            run(mode, workers, content, args.pages)
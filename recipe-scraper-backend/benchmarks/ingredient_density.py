@@ -0,0 +1,78 @@
+"""
+Microseconds per ingredient name to find its density, and how that changes as the density table grows.
+
+The names are the ones extract_units gets out of the golden corpus in unit_tests/fixtures/ingredient_lines.json.
+The table is the bundled api/data/ingredient_densities.csv, padded with made-up ingredient names for the larger
+sizes. reference_find is a whole-word regex per table entry, the straightforward way to do the same lookup,
+kept here only to compare against.
+
+Usage (from recipe-scraper-backend/):
+    python benchmarks/ingredient_density.py --sizes 500 5000 50000
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'api')]
+
+from logic.recipe_units import extract_units
+from logic.ingredient_density import DensityIndex, IngredientDensity, load_densities, name_variants
+
+def padded_table(densities, size):
+    padding = [IngredientDensity('ingredient {} {}'.format(i, 'abcdefghij'[i % 10] * (3 + i % 5)), 100.0, False) for i in range(max(0, size - len(densities)))]
+    return densities + padding
+
+def reference_index(densities):
+    patterns = [(len(variant), re.compile(r'(?<![^\W_])' + re.escape(variant) + r'(?![^\W_])'), density) for density in densities for variant in name_variants(density.name)]
+
+    def find(name):
+        text = name.lower()
+        best = None
+        for length, pattern, density in patterns:
+            # longest name, then the one ending last
+            for match in pattern.finditer(text):
+                if best is None or (length, match.end()) > best[0]:
+                    best = ((length, match.end()), density)
+        return best[1] if best else None
+
+    return find
+
+def best_of(repeats, fn, names):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for name in names:
+            fn(name)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 5000, 50000])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--reference-names', type=int, default=200, help='names to time the per-entry regex on, it is slow')
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, 'unit_tests', 'fixtures', 'ingredient_lines.json'), encoding='utf-8') as f:
+        names = [name for _, _, name in extract_units([entry['line'] for entry in json.load(f)])[0]]
+    densities = load_densities()
+    print('names={} table={} entries'.format(len(names), len(densities)))
+
+    for size in args.sizes:
+        table = padded_table(densities, size)
+        start = time.perf_counter()
+        index = DensityIndex(table)
+        built = time.perf_counter() - start
+        automaton = best_of(args.repeats, index.find, names)
+
+        reference_find = reference_index(table)
+        sample = names[:args.reference_names]
+        assert [reference_find(name) for name in sample] == [index.find(name) for name in sample]
+        reference = best_of(1, reference_find, sample)
+        print('entries={:>6}  automaton {:>6.2f} us/name (built in {:>6.0f} ms)  per-entry regex {:>9.1f} us/name'.format(
+            len(table), automaton / len(names) * 1e6, built * 1000, reference / len(sample) * 1e6))
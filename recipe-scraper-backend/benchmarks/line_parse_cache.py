@@ -0,0 +1,67 @@
+"""
+extract_units throughput with and without the shared line parse cache, on a stream of recipes.
+
+Each recipe draws --lines-per-recipe lines from the golden corpus in unit_tests/fixtures/ingredient_lines.json
+with a Zipf-like popularity (a few lines like "1 tsp salt" in most recipes, a long tail of lines seen once),
+which is roughly how ingredient lines recur across recipe sites. --distinct-lines caps how many different lines
+the stream uses, to see the hit rate with a small or large vocabulary against --cache-size.
+
+Usage (from recipe-scraper-backend/):
+    python benchmarks/line_parse_cache.py --recipes 2000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'api')]
+
+from util.lru_memo import LRUMemo
+from logic import recipe_units
+from logic.recipe_units import extract_units, parse_line
+
+def uncached_extract_units(ingredients):
+    parsed = [parse_line(recipe_units.normalize_line(line)) for line in ingredients]
+    return [list(row) for row in parsed], [list(row) for row in parsed]
+
+def recipe_stream(corpus, recipes, lines_per_recipe, distinct_lines, seed):
+    rng = random.Random(seed)
+    vocabulary = corpus[:distinct_lines]
+    # More lines than the corpus has get a made-up suffix, still parsing like real lines
+    vocabulary += ['{} ({})'.format(corpus[i % len(corpus)], i) for i in range(len(vocabulary), distinct_lines)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    return [rng.choices(vocabulary, weights, k=lines_per_recipe) for _ in range(recipes)]
+
+def timed(fn, stream):
+    start = time.perf_counter()
+    for recipe in stream:
+        fn(recipe)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recipes', type=int, default=2000)
+    parser.add_argument('--lines-per-recipe', type=int, default=12)
+    parser.add_argument('--distinct-lines', type=int, nargs='+', default=[2000, 20000])
+    parser.add_argument('--cache-size', type=int, default=recipe_units.LINE_PARSE_CACHE_SIZE)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, 'unit_tests', 'fixtures', 'ingredient_lines.json'), encoding='utf-8') as f:
+        corpus = [entry['line'] for entry in json.load(f)]
+
+    for distinct_lines in args.distinct_lines:
+        stream = recipe_stream(corpus, args.recipes, args.lines_per_recipe, distinct_lines, args.seed)
+        lines = args.recipes * args.lines_per_recipe
+        recipe_units.line_parse_cache = LRUMemo(max_entries=args.cache_size)
+
+        uncached = timed(uncached_extract_units, stream)
+        cached = timed(extract_units, stream)
+        stats = recipe_units.line_parse_cache.stats()
+        print('recipes={} lines={} distinct={} cache={}'.format(args.recipes, lines, distinct_lines, args.cache_size))
+        print('  uncached   {:>9.0f} lines/s  {:>7.1f} ms'.format(lines / uncached, uncached * 1000))
+        print('  cached     {:>9.0f} lines/s  {:>7.1f} ms  ({:.1f}x)  hit rate {:.1%}  entries {}  evictions {}'.format(
+            lines / cached, cached * 1000, uncached / cached, stats['hit_rate'], stats['entries'], stats['evictions']))
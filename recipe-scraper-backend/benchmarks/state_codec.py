@@ -0,0 +1,86 @@
+"""
+Size and encode/decode time of a recipe state in the binary state codec, against to_dict/from_dict through JSON.
+
+"json" is to_dict + json.dumps and json.loads + from_dict, how the state was stored before the binary codec.
+"binary" is RecipeState.encode/decode (a version byte + msgpack of the same positional data). "convert save"
+is what a unit conversion writes to the state store: every field before the dirty-field tracking, only
+unit_type and the ingredient rows after it.
+
+Recipes have --ingredients ingredient lines from the golden corpus in unit_tests/fixtures/ingredient_lines.json.
+
+Usage (from recipe-scraper-backend/):
+    python benchmarks/state_codec.py --ingredients 5 15 30 60
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'api')]
+
+from recipe_state import RecipeState
+from logic.recipe_units import extract_units
+from logic.ingredient_base import prepare_ingredients, ingredient_views
+
+def make_state(corpus, ingredients, rng):
+    state = RecipeState()
+    state.recipe_url = 'https://www.example.com/recipes/{}'.format(rng.randrange(10 ** 6))
+    state.ingredients, state.original_unit_type, _ = extract_units(rng.sample(corpus, ingredients))
+    state.servings = '4'
+    state.base_ingredients = prepare_ingredients(state.ingredients, state.servings, state.original_unit_type)
+    state.unit_type = 'si'
+    state.requested_serving_size = 6.0
+    state.ingredients = ingredient_views(state.base_ingredients, 'si', 6, state.servings)
+    return state
+
+def json_encode(state):
+    return json.dumps(state.to_dict()).encode('utf-8')
+
+def json_decode(encoded):
+    state = RecipeState()
+    state.from_dict(json.loads(encoded))
+    return state
+
+def best_of(repeats, number, fn):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ingredients', type=int, nargs='+', default=[5, 15, 30, 60])
+    parser.add_argument('--number', type=int, default=500)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, 'unit_tests', 'fixtures', 'ingredient_lines.json'), encoding='utf-8') as f:
+        corpus = [entry['line'] for entry in json.load(f)]
+    rng = random.Random(args.seed)
+
+    for ingredients in args.ingredients:
+        state = make_state(corpus, ingredients, rng)
+        json_encoded = json_encode(state)
+        binary_encoded = state.encode()
+        assert RecipeState.decode(binary_encoded).to_dict() == json_decode(json_encoded).to_dict()
+
+        timings = {
+            'json': (best_of(args.repeats, args.number, lambda: json_encode(state)), best_of(args.repeats, args.number, lambda: json_decode(json_encoded))),
+            'binary': (best_of(args.repeats, args.number, state.encode), best_of(args.repeats, args.number, lambda: RecipeState.decode(binary_encoded)))
+        }
+        full_save = sum(len(value) for value in state.encode_fields().values())
+        convert_save = sum(len(value) for value in state.encode_fields(['unit_type', 'ingredients']).values())
+
+        print('ingredients={}'.format(ingredients))
+        for name, size in (('json', len(json_encoded)), ('binary', len(binary_encoded))):
+            encode_time, decode_time = timings[name]
+            print('  {:<7} {:>6} bytes  encode {:>7.1f} us  decode {:>7.1f} us'.format(name, size, encode_time * 1e6, decode_time * 1e6))
+        print('  convert save  {:>6} bytes of {} ({:.0%})'.format(convert_save, full_save, convert_save / full_save))
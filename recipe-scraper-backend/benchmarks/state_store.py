@@ -0,0 +1,105 @@
+"""
+Per-request cost of loading and saving the recipe state, kept in the signed session cookie against the state store.
+
+Every convert/scale request loads the recipe state, changes it and saves it again. With the state in the
+cookie that is verifying and parsing the whole signed cookie, then serializing and signing it again for
+the response (the browser also uploads and downloads all of it). With the state store the cookie only
+carries the state id, and the state is read from and written to the store: the in-process MemoryStateStore,
+or a KeyValueStateStore talking to the LocalKeyValueServer stand-in from unit_tests on localhost (a real Redis on another machine adds
+its network round trip on top).
+
+Recipes have --ingredients ingredient lines from the golden corpus in unit_tests/fixtures/ingredient_lines.json.
+
+Usage (from recipe-scraper-backend/):
+    python benchmarks/state_store.py --ingredients 5 15 30 60
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from flask import Flask
+from flask.sessions import SecureCookieSessionInterface
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'api'), ROOT]
+
+import recipe_state
+from recipe_state import RecipeState, get_recipe_state, save_recipe_state
+from logic.recipe_units import extract_units
+from logic.ingredient_base import prepare_ingredients, ingredient_views
+from util.state_store import MemoryStateStore, KeyValueStateStore
+from unit_tests.key_value_server import LocalKeyValueServer
+
+def make_state(corpus, ingredients, rng):
+    state = RecipeState()
+    state.recipe_url = 'https://www.example.com/recipes/{}'.format(rng.randrange(10 ** 6))
+    state.ingredients, state.original_unit_type, _ = extract_units(rng.sample(corpus, ingredients))
+    state.servings = '4'
+    state.base_ingredients = prepare_ingredients(state.ingredients, state.servings, state.original_unit_type)
+    state.unit_type = 'si'
+    state.ingredients = ingredient_views(state.base_ingredients, 'si', None, state.servings)
+    return state
+
+def cookie_request(serializer, cookie):
+    # What get_recipe_state/save_recipe_state did when the session held the whole state
+    session = serializer.loads(cookie)
+    state = RecipeState()
+    state.from_dict(session['recipe_state'])
+    state.requested_serving_size = 8.0
+    session['recipe_state'] = state.to_dict()
+    return serializer.dumps(session)
+
+def store_request(serializer, cookie):
+    session = serializer.loads(cookie)
+    state = get_recipe_state(session)
+    state.requested_serving_size = 8.0
+    save_recipe_state(session, state)
+    # The id is already in the session, Flask would not send the cookie again
+    return cookie
+
+def best_of(repeats, requests, fn):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(requests):
+            fn()
+        elapsed = (time.perf_counter() - start) / requests
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ingredients', type=int, nargs='+', default=[5, 15, 30, 60])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, 'unit_tests', 'fixtures', 'ingredient_lines.json'), encoding='utf-8') as f:
+        corpus = [entry['line'] for entry in json.load(f)]
+    rng = random.Random(args.seed)
+
+    flask_app = Flask(__name__)
+    flask_app.secret_key = 'benchmark'
+    serializer = SecureCookieSessionInterface().get_signing_serializer(flask_app)
+    server = LocalKeyValueServer().start()
+    stores = [('memory', MemoryStateStore()), ('key-value', KeyValueStateStore.from_url(server.url))]
+
+    for ingredients in args.ingredients:
+        state = make_state(corpus, ingredients, rng)
+        cookie = serializer.dumps({'recipe_state': state.to_dict()})
+        cookie_time = best_of(args.repeats, args.requests, lambda: cookie_request(serializer, cookie))
+        print('ingredients={}'.format(ingredients))
+        print('  cookie      {:>8.1f} us/request  cookie {:>6} bytes'.format(cookie_time * 1e6, len(cookie)))
+
+        for name, store in stores:
+            recipe_state.state_store = store
+            session = {}
+            save_recipe_state(session, state)
+            store_cookie = serializer.dumps(session)
+            store_time = best_of(args.repeats, args.requests, lambda: store_request(serializer, store_cookie))
+            print('  {:<10}  {:>8.1f} us/request  cookie {:>6} bytes  ({:.1f}x)'.format(name, store_time * 1e6, len(store_cookie), cookie_time / store_time))
+
+    server.stop()
@@ -0,0 +1,132 @@
+import time
+import socket
+import threading
+import socketserver
+
+class ServerError(Exception):
+    """An error reply"""
+
+def read_command(reader):
+    # Redis protocol (RESP) array of bulk strings, as every client sends its commands
+    line = reader.readline()
+    if not line.startswith(b'*') or not line.endswith(b'\r\n'):
+        raise ConnectionError("Connection closed")
+    command = []
+    for _ in range(int(line[1:-2])):
+        length = int(reader.readline()[1:-2])
+        data = reader.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError("Connection closed")
+        command.append(data[:-2])
+    return command
+
+class Map(dict):
+    """A map reply, sent as a RESP3 map to connections that asked for protocol 3 and as a flat array otherwise"""
+
+def encode_reply(value, protocol: int = 2) -> bytes:
+    if isinstance(value, Map):
+        if protocol == 3:
+            return b'%%%d\r\n' % len(value) + b''.join(encode_reply(part, protocol) for item in value.items() for part in item)
+        return encode_reply([part for item in value.items() for part in item], protocol)
+    if isinstance(value, ServerError):
+        return b'-%s\r\n' % str(value).encode('utf-8')
+    if isinstance(value, str):
+        return b'+%s\r\n' % value.encode('utf-8')
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, bytes):
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    return b'*%d\r\n' % len(value) + b''.join(encode_reply(item, protocol) for item in value)
+
+class LocalKeyValueServer:
+    """
+    Stand-in for a Redis server, for the tests and benchmarks of KeyValueStateStore.
+
+    Serves the handful of commands the state store sends (HELLO, PING, AUTH, SELECT, CLIENT, HSET,
+    HGETALL, PEXPIRE, DEL, FLUSHALL, DBSIZE) over the Redis protocol (RESP2, or RESP3 after HELLO 3)
+    on 127.0.0.1, one thread per connection.
+    Everything lives in a dict, nothing is persisted.
+    """
+
+    def __init__(self, port: int = 0):
+        self.data = {}  # key -> (expires at or None, {field: value})
+        self.lock = threading.Lock()
+        self.connections = 0
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with server.lock:
+                    server.connections += 1
+                protocol = 2
+                while True:
+                    try:
+                        command = read_command(self.rfile)
+                    except (ConnectionError, OSError, ValueError):
+                        return
+                    if command[0].upper() == b'HELLO':
+                        protocol = int(command[1]) if len(command) > 1 else protocol
+                        reply = Map({'server': 'redis', 'version': '7.2.0', 'proto': protocol, 'mode': 'standalone', 'role': 'master', 'modules': []})
+                    else:
+                        reply = server.run(command)
+                    self.wfile.write(encode_reply(reply, protocol))
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server(('127.0.0.1', port), Handler)
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return 'redis://127.0.0.1:{}'.format(self._server.server_address[1])
+
+    def start(self) -> 'LocalKeyValueServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[0] is not None and entry[0] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    def run(self, command):
+        name, args = command[0].upper(), command[1:]
+        with self.lock:
+            if name in (b'PING', b'AUTH', b'SELECT', b'CLIENT'):
+                return 'PONG' if name == b'PING' else 'OK'
+            if name == b'HSET':
+                entry = self._live(args[0]) or (None, {})
+                fields = entry[1]
+                added = sum(1 for field in args[1::2] if field not in fields)
+                fields.update(zip(args[1::2], args[2::2]))
+                self.data[args[0]] = (entry[0], fields)
+                return added
+            if name == b'HGETALL':
+                entry = self._live(args[0])
+                return Map(entry[1] if entry else {})
+            if name == b'PEXPIRE':
+                entry = self._live(args[0])
+                if not entry:
+                    return 0
+                self.data[args[0]] = (time.monotonic() + int(args[1]) / 1000, entry[1])
+                return 1
+            if name == b'DEL':
+                return sum(1 for key in args if self.data.pop(key, None) is not None)
+            if name == b'FLUSHALL':
+                self.data.clear()
+                return 'OK'
+            if name == b'DBSIZE':
+                return sum(1 for key in list(self.data) if self._live(key))
+        return ServerError("ERR unknown command '{}'".format(name.decode('utf-8', 'replace')))
@@ -1,19 +1,94 @@
 import pytest
 import sys
+import re
 import os
+import time
+import threading
+import itertools
+import shutil
+import subprocess
+import zlib
+import json
+from fractions import Fraction
+import http.server
+import asyncio
+import requests
+from aiohttp import web
+from starlette.testclient import TestClient
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import app
+from asgi import asgi_app
 from bs4 import BeautifulSoup
-from app import extract_recipe_steps_manual, extract_recipe_steps_labelled, extract_ingredients, extract_recipe_name, get_serving_size, postprocess_list, postprocess_text, standardize_units, extract_units, calculate_servings, convert_units
-from util.auth import verify_credentials
+from app import extract_recipe_steps_manual, extract_recipe_steps_labelled, extract_ingredients, extract_recipe_name, get_serving_size, postprocess_list, postprocess_text, standardize_units, extract_units, calculate_servings, convert_units, extract_structured_recipe, extract_recipe_data_parallel
+from util.auth import verify_credentials, generate_token
+from util.page_cache import PageCache
+from util.result_cache import RecipeResultCache
+from util.canonical_url import canonicalize_url
+from util.lru_memo import LRUMemo
+from util.logging import DatadogLogger
+from datadog_api_client import Configuration
+from util.state_store import StateStore, MemoryStateStore, KeyValueStateStore
+from unit_tests.key_value_server import LocalKeyValueServer
+from util.single_flight import SingleFlight
+from util.async_fetch import AsyncFetcher, FetchEngine
+from util.extraction_executor import ExtractionExecutor
+from logic.recipe_extraction import extract_recipe_fields, warm_extraction_worker
+from logic.dom_index import DomIndex
+from logic.section_walker import SectionWalker
+from logic.ingredient_tokenizer import tokenize_ingredient
+from logic.quantity import Quantity, format_ingredients
+from logic.recipe_units import parse_ingredient_line
+from logic.ingredient_base import prepare_ingredients, ingredient_views
+from logic.conversion_model import conversion_model
+from logic.batch_engine import IngredientBatch
+from logic.unit_graph import UNITS, UNIT_FACTORS, unit_factor, convert_many
+from logic.ingredient_density import DensityIndex, IngredientDensity, ingredient_density
+from app import convert_units_batch
+import recipe_state as recipe_state_module
+import recipe_pipeline
+from recipe_state import RecipeState, get_recipe_state, save_recipe_state
+from logic.state_codec import encode_value, decode_value
+from logic.html_pruning import prune_html
+from logic.recipe_fingerprint import content_fingerprint, hamming_distance
 
 @pytest.fixture
 def client():
     with app.test_client() as client:
         yield client
 
+# Local stand-in for recipe websites, serves the pages in recipe_site.pages and 404 for anything else
+@pytest.fixture
+def recipe_site():
+    class RecipeSiteHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            page = server.pages.get(self.path)
+            server.requests.append(self.path)
+            if page is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.end_headers()
+            self.wfile.write(page if isinstance(page, bytes) else page.encode("utf-8"))
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RecipeSiteHandler)
+    server.pages = {}
+    server.requests = []
+    server.url = "http://127.0.0.1:{}".format(server.server_port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+def json_ld_recipe_page(name, ingredients, steps, servings):
+    recipe = {"@type": "Recipe", "name": name, "recipeIngredient": ingredients, "recipeInstructions": steps, "recipeYield": servings}
+    return '<html><head><script type="application/ld+json">{}</script></head><body></body></html>'.format(json.dumps(recipe))
+
 # Test extract_recipe_steps_labelled function
 def test_extract_recipe_steps_labelled():
     soup = BeautifulSoup("<html><body><div><li id='instruction1'>Boil the water</li><li class='direction'>Peel the potato</li><p class='step'>Serve hot</p></div></body></html>", 'html.parser')
@@ -43,6 +118,41 @@ def test_extract_ingredients():
     result_manual = extract_ingredients(soup_with_manual_ingredients)
     assert result_manual == ["Ingredient 5", "Ingredient 6"]
 
+# Test SectionWalker class on the heading-anchored steps/ingredients extraction
+def test_section_walker():
+    # The section ends at the next heading of equal or higher rank, lower ranked headings are part of it
+    soup = BeautifulSoup("<html><body><h2>Ingredients</h2><p>Serve with love</p><h2>Notes</h2><ul><li>Not an ingredient</li></ul></body></html>", 'html.parser')
+    assert extract_ingredients(soup) == []
+    soup = BeautifulSoup("<html><body><h2>Ingredients</h2><h3>For the sauce</h3><ul><li>1 cup milk</li></ul></body></html>", 'html.parser')
+    assert extract_ingredients(soup) == ["1 cup milk"]
+
+    # <p> ingredients are taken when one of them has a common unit
+    soup = BeautifulSoup("<html><body><div><h2>Ingredients</h2><p>2 eggs</p><p>1 cup flour</p></div></body></html>", 'html.parser')
+    assert extract_ingredients(soup) == ["2 eggs", "1 cup flour"]
+
+    # Headings sharing a section walk it once and keep the steps in order without duplicates
+    soup = BeautifulSoup("<html><body><h2>Method</h2><h3>Directions</h3><div><ol><li>Mix</li><li>Bake</li></ol></div></body></html>", 'html.parser')
+    assert extract_recipe_steps_manual(soup) == ["Mix", "Bake"]
+    index = DomIndex(soup)
+    walker = SectionWalker(index, lambda element: element if element.name == 'ol' else None)
+    assert [walker.walk(header) for header in index.headings_containing(['method', 'directions'])] == [soup.ol, soup.ol]
+    assert walker.nodes_visited <= len(index.elements)
+
+    # The node budget caps how far a single walk goes
+    soup = BeautifulSoup("<html><body><h2>Directions</h2>" + "<div>filler</div>" * 50 + "<ol><li>Too far</li></ol></body></html>", 'html.parser')
+    walker = SectionWalker(DomIndex(soup), lambda element: element if element.name == 'ol' else None, node_budget=10)
+    assert walker.walk(soup.h2) is None
+    assert walker.nodes_visited == 10
+
+    # Many matching headings on a long page, each element is looked at once so this stays linear
+    soup = BeautifulSoup("<html><body>" + "<h3>Instructions</h3><div><span>filler</span></div>" * 2000 + "<h2>Directions</h2><ol><li>Step 1</li></ol></body></html>", 'html.parser')
+    index = DomIndex(soup)
+    walker = SectionWalker(index, lambda element: element if element.name == 'ol' else None)
+    for header in index.headings_containing(['instructions', 'directions']):
+        walker.walk(header)
+    assert walker.nodes_visited <= len(index.elements)
+    assert extract_recipe_steps_manual(soup, index) == ["Step 1"]
+
 # Test extract_recipe_name function
 def test_extract_recipe_name():
     # Case where recipe name is found in the URL
@@ -68,6 +178,557 @@ def test_get_serving_size():
     result_in_next_elements = get_serving_size(soup_with_serving_in_next_elements)
     assert result_in_next_elements == '4'
 
+    # Case where the number comes before the keyword or has more than one digit
+    assert get_serving_size(BeautifulSoup("<html><body><p>Makes 12 servings</p></body></html>", 'html.parser')) == '12'
+    assert get_serving_size(BeautifulSoup("<html><body><div><span>Serves</span><em>10</em></div></body></html>", 'html.parser')) == '10'
+
+    # Case where a comment mentions servings before the recipe card does
+    soup_with_comment = BeautifulSoup("<html><body><p>Loved it, this easily serves 3 for us and the leftovers were great!</p><p>Yield: 8 slices</p></body></html>", 'html.parser')
+    assert get_serving_size(soup_with_comment) == '8'
+
+    # Case where there is no serving size on the page
+    assert get_serving_size(BeautifulSoup("<html><body><p>Boil the water</p></body></html>", 'html.parser')) is None
+
+# Test get_serving_size function on deeply nested pages, the time taken should grow linearly with the page
+def test_get_serving_size_deep_nesting():
+    def deeply_nested_page(depth):
+        html = ''.join('<div><span>Level {} notes</span>'.format(i) for i in range(depth)) + '<p>Servings: </p><span>6</span>' + '</div>' * depth
+        return BeautifulSoup(html, 'html.parser')
+
+    def best_time(soup):
+        times = []
+        for _ in range(3):
+            start = time.perf_counter()
+            assert get_serving_size(soup) == '6'
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    small_time = best_time(deeply_nested_page(1000))
+    large_time = best_time(deeply_nested_page(4000))
+    # 4x the nesting is ~4x the time when linear and ~16x when quadratic
+    assert large_time < small_time * 8
+
+# Test DomIndex class, every lookup matches the soup.find_all call it replaces
+def test_dom_index():
+    html = ("<html><body><h1 class='entry-title'>Pancakes</h1><div class='ad'><h2 id='heading-ad'>Sponsored</h2></div>"
+            "<ul class='ingredients-list'><li id='ingredient-1'>1 egg</li><li class='wprm-ingredient'>1 cup milk</li></ul>"
+            "<h2>Ingredients</h2><p class='ingredient note'>Optional</p>"
+            "<h3>How to make <span>pancakes</span></h3><ol><li class='step'>Whisk</li><li id='direction-2'>Fry</li></ol><p>Serves 4</p></body></html>")
+    for parser in ("lxml", "html.parser"):
+        soup = BeautifulSoup(html, parser)
+        index = DomIndex(soup)
+        assert index.find_all(['p', 'span', 'em', 'div']) == soup.find_all(['p', 'span', 'em', 'div'])
+        assert index.find_all('li') == soup.find_all('li')
+        assert index.with_id('ingredient', 'li') == soup.find_all('li', id=re.compile(r'.*(ingredient).*', re.I))
+        assert index.with_class('ingredient', ['ol', 'ul', 'div']) == soup.find_all(['ol', 'ul', 'div'], {'class': re.compile(r'ingredient', re.I)})
+        assert index.with_class('instruction', ['p', 'li']) == soup.find_all(['p', 'li'], {'class': re.compile(r'instruction|direction|step', re.I)})
+        assert index.with_id('title', ['h1', 'h2']) == soup.find_all(['h1', 'h2'], {'id': re.compile(r'.*(title|heading|recipe-name).*', re.I)})
+        assert [heading.name for heading in index.headings_containing(['ingredients', 'how to make'])] == ['h2', 'h3']
+        assert index.position(soup.find('h1')) < index.position(soup.find('ol'))
+
+# Test prune_html function
+def test_prune_html():
+    html = ('<html><head><script>var a = "<b>";</script><script type="application/ld+json">{"name": "Fish & Chips"}</script><style>.a{}</style></head>'
+            '<body><nav><ul><li>Home</li></ul></nav><!-- comment --><div class="ad-slot"><p>Advertisement</p></div>'
+            '<div class="adthrive-content"><h1 class="entry-title">Fish &amp; Chips</h1><p>Serves 4<br><img src="fish.png"></p><svg><path d="M0"/></svg>'
+            '<div id="comments"><p>Serves 3!</p><script type="application/ld+json">{"@type": "Comment"}</script></div></div></body></html>').encode("utf-8")
+    pruned, stats = prune_html(html)
+    soup = BeautifulSoup(pruned, 'lxml')
+
+    # JSON-LD is kept as is, even from inside a pruned comment section
+    assert [script.string for script in soup.find_all('script')] == ['{"name": "Fish & Chips"}', '{"@type": "Comment"}']
+    assert soup.find_all(['style', 'nav', 'svg']) == []
+    assert soup.find(class_='ad-slot') is None and soup.find(id='comments') is None
+    # Wrappers that only contain "ad" inside a longer class name are not pruned
+    assert soup.find(class_='adthrive-content').find('h1').text == "Fish & Chips"
+    assert soup.find('p').get_text() == "Serves 4"
+    assert soup.find('img')['src'] == "fish.png"
+
+    assert stats["bytes_before"] == len(html)
+    assert stats["bytes_after"] < stats["bytes_before"]
+    assert stats["nodes_after"] == len(soup.find_all(True))
+    assert stats["nodes_before"] > stats["nodes_after"]
+
+    # Case where the body is empty or can't be decoded
+    assert prune_html(b"") == ("", {"bytes_before": 0, "bytes_after": 0, "nodes_before": 0, "nodes_after": 0})
+    assert prune_html(b"\xff\xfe")[0] == ""
+
+# Test that an empty or undecodable page gets the usual scrape failure message instead of a 500
+def test_empty_recipe_page(client, recipe_site):
+    recipe_site.pages["/empty"] = b""
+    recipe_site.pages["/undecodable"] = b"\xff\xfe"
+    for path in ("/empty", "/undecodable"):
+        response = client.post('/scrape-recipe-steps', headers={"Authorization": generate_token("tester")}, json={"recipe_url": recipe_site.url + path})
+        assert response.status_code == 200
+        assert "error" in response.get_json()
+
+# Test extract_structured_recipe function
+def test_extract_structured_recipe():
+    # Case where the recipe is a JSON-LD object inside @graph with sectioned instructions
+    json_ld_html = """<html><head><script type="application/ld+json">
+    {"@context": "https://schema.org", "@graph": [
+        {"@type": "WebPage", "name": "Not the recipe"},
+        {"@type": ["Recipe"], "name": "Best Mashed Potatoes &amp; Gravy", "recipeYield": ["10", "10 servings"],
+         "recipeIngredient": ["5 pounds potatoes", "1 cup whole milk"],
+         "recipeInstructions": [{"@type": "HowToSection", "name": "Potatoes", "itemListElement": [
+            {"@type": "HowToStep", "text": "Boil the potatoes."}, {"@type": "HowToStep", "text": "Mash the potatoes."}]}]}
+    ]}</script></head><body></body></html>"""
+    result_json_ld = extract_structured_recipe(json_ld_html)
+    assert result_json_ld == {
+        "name": "Best Mashed Potatoes & Gravy",
+        "steps": ["Boil the potatoes.", "Mash the potatoes."],
+        "ingredients": ["5 pounds potatoes", "1 cup whole milk"],
+        "servings": "10"
+    }
+
+    # Case where the recipe is marked up with microdata
+    microdata_html = """<html><body><div itemscope itemtype="https://schema.org/Recipe">
+    <h1 itemprop="name">Pancakes</h1><meta itemprop="recipeYield" content="4 servings">
+    <ul><li itemprop="recipeIngredient">1 cup flour</li><li itemprop="recipeIngredient">1 egg</li></ul>
+    <ol><li itemprop="recipeInstructions">Whisk everything.</li></ol></div></body></html>"""
+    result_microdata = extract_structured_recipe(microdata_html)
+    assert result_microdata == {
+        "name": "Pancakes",
+        "steps": ["Whisk everything."],
+        "ingredients": ["1 cup flour", "1 egg"],
+        "servings": "4"
+    }
+
+    # Case where there is no structured data at all
+    assert extract_structured_recipe("<html><body><p>Serves: 4</p></body></html>") == {}
+
+# Test extract_recipe_data_parallel function
+def test_extract_recipe_data_parallel():
+    # Case where the structured data is missing the servings so only that falls back to the DOM heuristics
+    content = b"<html><body><p>Serves: 6</p></body></html>"
+    structured_recipe = {"name": "Pancakes", "steps": ["Whisk everything."], "ingredients": ["1 egg"], "servings": None}
+    result = extract_recipe_data_parallel(content, "https://example.com/pancakes", structured_recipe)
+    assert result == ("Pancakes", ["Whisk everything."], ["1 egg"], "6")
+
+# Test ExtractionExecutor class, every mode gives the same result as extracting in the calling thread
+def test_extraction_executor():
+    content = b"<html><body><h1 class='recipe-title'>Fluffy Pancakes</h1><ol class='instructions'><li>Whisk everything.</li><li>Fry.</li></ol><p>Serves: 6</p></body></html>"
+    expected = extract_recipe_fields(content, "https://example.com/fluffy-pancakes")
+    assert expected["name"] == "Fluffy Pancakes"
+    assert expected["servings"] == "6"
+
+    for mode in ("inline", "thread", "process"):
+        executor = ExtractionExecutor(mode=mode, max_workers=2, initializer=warm_extraction_worker)
+        try:
+            futures = [executor.submit(extract_recipe_fields, content, "https://example.com/fluffy-pancakes") for _ in range(4)]
+            assert [future.result(timeout=60) for future in futures] == [expected] * 4
+
+            # Failures in the worker reach the caller
+            with pytest.raises(TypeError):
+                executor.run(extract_recipe_fields, None, "https://example.com/fluffy-pancakes")
+
+            stats = executor.stats()
+            assert stats["mode"] == mode
+            assert (stats["tasks"], stats["failures"], stats["in_flight"]) == (5, 1, 0)
+            assert stats["exec"]["max_ms"] > 0
+            assert stats["queue_wait"]["max_ms"] >= stats["queue_wait"]["p50_ms"] >= 0
+        finally:
+            executor.shutdown()
+
+    # Case where the mode is misspelled
+    with pytest.raises(ValueError):
+        ExtractionExecutor(mode="processes")
+
+# Test PageCache class
+def test_page_cache(tmp_path):
+    class FakeResponse:
+        def __init__(self, status_code, content=b"", headers=None):
+            self.status_code = status_code
+            self.content = content
+            self.headers = headers or {}
+
+        def raise_for_status(self):
+            pass
+
+    sent_headers = []
+    def fetcher(url, headers=None):
+        sent_headers.append(headers)
+        if headers.get("If-None-Match") == '"v1"':
+            return FakeResponse(304)
+        return FakeResponse(200, b"<html>" + url.encode() + b"</html>", {"ETag": '"v1"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"})
+
+    cache = PageCache(str(tmp_path), ttl=60, max_bytes=100)
+    url = "https://example.com/recipe"
+
+    # Case where the page is fetched and cached, then served from disk
+    assert cache.fetch(url, fetcher) == b"<html>https://example.com/recipe</html>"
+    assert cache.fetch(url, fetcher) == b"<html>https://example.com/recipe</html>"
+    assert len(sent_headers) == 1
+
+    # Case where the entry is stale and gets revalidated with its validators
+    cache.ttl = 0
+    assert cache.fetch(url, fetcher) == b"<html>https://example.com/recipe</html>"
+    assert sent_headers[-1] == {"If-None-Match": '"v1"', "If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT"}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1 and cache.stats()["revalidations"] == 1
+
+    # Case where the cache goes over its size limit and evicts the least recently used page
+    cache.ttl = 60
+    for i in range(3):
+        cache.fetch("https://example.com/recipe-{}".format(i), fetcher)
+    assert cache.stats()["bytes"] <= 100
+    assert cache.stats()["evictions"] >= 1
+    assert cache.get("https://example.com/recipe-2") is not None
+
+    # Case where the async fetch path reads and writes the cache files off the event loop
+    disk_calls_on_event_loop = []
+    class RecordingPageCache(PageCache):
+        def get(self, url):
+            disk_calls_on_event_loop.append(running_event_loop())
+            return super().get(url)
+        def store(self, url, content, response_headers=None):
+            disk_calls_on_event_loop.append(running_event_loop())
+            return super().store(url, content, response_headers)
+    def running_event_loop():
+        try:
+            return asyncio.get_running_loop() is not None
+        except RuntimeError:
+            return False
+    async def async_fetcher(url, headers=None):
+        return fetcher(url, headers)
+
+    async_cache = RecordingPageCache(str(tmp_path / "async"), ttl=60)
+    assert asyncio.run(async_cache.fetch_async(url, async_fetcher)) == b"<html>https://example.com/recipe</html>"
+    assert asyncio.run(async_cache.fetch_async(url, async_fetcher)) == b"<html>https://example.com/recipe</html>"
+    assert async_cache.stats()["hits"] == 1 and async_cache.stats()["misses"] == 1
+    assert len(disk_calls_on_event_loop) == 3 and not any(disk_calls_on_event_loop)
+
+# Test RecipeResultCache class
+def test_recipe_result_cache(tmp_path):
+    url = "https://example.com/recipe"
+    content = b"<html>recipe</html>"
+    result = {"recipe_name": "Recipe", "ingredients": [["1", "cup", "milk"]], "servings": "4"}
+
+    cache = RecipeResultCache(version="v1", max_entries=2, directory=str(tmp_path))
+    assert cache.get(url, content) is None
+    cache.set(url, content, result)
+
+    # Case where the cached result is returned as a copy that callers can safely mutate
+    cached = cache.get(url, content)
+    assert cached == result
+    cached["ingredients"][0][0] = "2"
+    assert cache.get(url, content) == result
+
+    # Case where a warm hit comes from memory in well under a millisecond
+    start = time.perf_counter()
+    for _ in range(100):
+        cache.get(url, content)
+    assert (time.perf_counter() - start) / 100 < 0.001
+
+    # Case where the page content changed
+    assert cache.get(url, b"<html>updated recipe</html>") is None
+
+    # Case where a new process reads the file-backed tier, and where the extractor version changed
+    assert RecipeResultCache(version="v1", directory=str(tmp_path)).get(url, content) == result
+    assert RecipeResultCache(version="v2", directory=str(tmp_path)).get(url, content) is None
+
+# Test MemoryStateStore and KeyValueStateStore classes, and that the session cookie only carries the state id
+def test_state_store(client, recipe_site):
+    # Case where saves merge into the stored fields and the least recently used state is evicted
+    store = MemoryStateStore(ttl=60, max_entries=2)
+    store.save("a", {"servings": b'"4"', "unit_type": b'null'})
+    store.save("a", {"unit_type": b'"si"'})
+    assert store.load("a") == {"servings": b'"4"', "unit_type": b'"si"'}
+    store.save("b", {"servings": b'"2"'})
+    store.load("a")
+    store.save("c", {"servings": b'"6"'})
+    assert store.load("b") is None
+    assert store.load("a") is not None and store.load("c") is not None
+    assert store.stats()["evictions"] == 1
+
+    # Case where a state expires ttl seconds after it was last used
+    store = MemoryStateStore(ttl=0.05)
+    store.save("a", {"servings": b'"4"'})
+    time.sleep(0.1)
+    assert store.load("a") is None
+    assert store.stats()["expirations"] == 1
+
+    # Case where a store that doesn't implement the whole interface can't be created
+    class PartialStore(StateStore):
+        def load(self, state_id):
+            return None
+    with pytest.raises(TypeError):
+        PartialStore()
+
+    # Case where the networked store runs against the local stand-in, over one pooled connection
+    server = LocalKeyValueServer().start()
+    try:
+        store = KeyValueStateStore.from_url(server.url, ttl=60)
+        assert store.load("a") is None
+        store.save("a", {"servings": b'"4"', "unit_type": b'null'})
+        store.save("a", {"unit_type": b'"si"'})
+        assert store.load("a") == {"servings": b'"4"', "unit_type": b'"si"'}
+        store.delete("a")
+        assert store.load("a") is None
+        assert server.connections == 1
+
+        store = KeyValueStateStore.from_url(server.url, ttl=0.05)
+        store.save("a", {"servings": b'"4"'})
+        time.sleep(0.1)
+        assert store.load("a") is None
+    finally:
+        server.stop()
+
+    # Case where the recipe is kept server-side and the session only holds the id it is stored under
+    recipe_site.pages["/pancakes"] = json_ld_recipe_page("Pancakes", ["1 cup flour", "2 eggs"], ["Whisk everything."], "4")
+    auth_headers = {"Authorization": generate_token("tester")}
+    response = client.post('/scrape-recipe-steps', headers=auth_headers, json={"recipe_url": recipe_site.url + "/pancakes"})
+    assert response.status_code == 200
+    with client.session_transaction() as session:
+        assert list(session.keys()) == ["state_id"]
+        state_id = session["state_id"]
+    response = client.post('/calculate-serving-ingredients', headers=auth_headers, json={"serving_size": "8"})
+    assert response.json == [["2", "cup", "flour"], ["4", None, "eggs"]]
+    with client.session_transaction() as session:
+        assert session["state_id"] == state_id
+
+# Test RecipeState binary codec and dirty-field saves
+def test_recipe_state_codec(monkeypatch):
+    recipe_state = RecipeState()
+    recipe_state.recipe_url = "https://example.com/recipe"
+    recipe_state.ingredients, recipe_state.original_unit_type, _ = extract_units(["1 ½ cups sugar", "2-3 cloves garlic", "1 lb potatoes", "salt"])
+    recipe_state.servings = "4"
+    recipe_state.base_ingredients = prepare_ingredients(recipe_state.ingredients, "4", recipe_state.original_unit_type)
+    recipe_state.ingredients = ingredient_views(recipe_state.base_ingredients, "si", 7, "4")
+
+    # Case where the whole state round-trips, smaller than its JSON form
+    encoded = recipe_state.encode()
+    assert encoded[0] == 1
+    assert len(encoded) < len(json.dumps(recipe_state.to_dict()).encode("utf-8"))
+    restored = RecipeState.decode(encoded)
+    assert restored.to_dict() == recipe_state.to_dict()
+    assert restored.ingredients == recipe_state.ingredients
+    assert not restored.dirty
+
+    # Case where numbers past 64 bits survive and unknown versions are refused
+    assert decode_value(encode_value([2 ** 70, -2 ** 90])) == [2 ** 70, -2 ** 90]
+    for encoded in (b"\x02" + encode_value(None)[1:], b'{"servings": "4"}', b'\n{"servings": "4"}'):
+        with pytest.raises(ValueError):
+            decode_value(encoded)
+
+    # Case where a new recipe writes every field and a unit conversion only the fields it changed
+    store = MemoryStateStore()
+    monkeypatch.setattr(recipe_state_module, "state_store", store)
+    session = {}
+    save_recipe_state(session, recipe_state)
+    assert set(store.load(session["state_id"])) == set(recipe_state.to_dict())
+    saved = []
+    monkeypatch.setattr(store, "save", lambda state_id, fields: saved.append(set(fields)))
+    loaded = get_recipe_state(session)
+    loaded.unit_type = "si"
+    loaded.ingredients = ingredient_views(loaded.base_ingredients, "si", None, loaded.servings)
+    save_recipe_state(session, loaded)
+    assert saved == [{"unit_type", "ingredients"}]
+    assert not loaded.dirty
+
+# Test DatadogLogger class against a local stand-in for the Datadog log intake
+def test_datadog_logger():
+    class IntakeHandler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            if self.headers.get("Content-Encoding") == "deflate":
+                body = zlib.decompress(body)
+            time.sleep(intake.delay)
+            intake.batches.append([item["message"] for item in json.loads(body)])
+            self.send_response(202)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    intake = http.server.ThreadingHTTPServer(("127.0.0.1", 0), IntakeHandler)
+    intake.batches = []
+    intake.delay = 0
+    threading.Thread(target=intake.serve_forever, daemon=True).start()
+    configuration = lambda: Configuration(host="http://127.0.0.1:{}".format(intake.server_port))
+
+    def wait_for(condition, timeout=3):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+    try:
+        # Case where full batches go out as soon as they fill up and the rest when the flush interval passes
+        logger = DatadogLogger(batch_size=10, flush_interval_ms=1000, configuration=configuration())
+        for i in range(25):
+            logger.log("line {}".format(i), {"endpoint": "test"})
+        assert wait_for(lambda: len(intake.batches) == 2)
+        assert [len(batch) for batch in intake.batches] == [10, 10]
+        assert wait_for(lambda: len(intake.batches) == 3)
+        assert [message for batch in intake.batches for message in batch] == ["line {}".format(i) for i in range(25)]
+        # The intake records a batch before it answers, the logger only counts it once the answer arrives
+        assert wait_for(lambda: logger.stats()["sent"] == 25)
+        assert logger.stats()["batches"] == 3
+        logger.shutdown()
+
+        # Case where a slow intake fills the buffer: log() doesn't wait, the oldest lines are dropped and counted
+        intake.batches.clear()
+        intake.delay = 0.2
+        logger = DatadogLogger(batch_size=5, flush_interval_ms=10, max_buffer=20, configuration=configuration())
+        start = time.perf_counter()
+        for i in range(200):
+            logger.log("line {}".format(i))
+        assert time.perf_counter() - start < 0.5
+        stats = logger.stats()
+        # Everything logged is buffered, sent, dropped, or in the one batch being sent
+        assert stats["buffered"] <= 20
+        assert 200 - 5 <= stats["buffered"] + stats["sent"] + stats["dropped"] <= 200
+
+        # Case where shutdown gives up at its deadline and drops what is left
+        start = time.perf_counter()
+        logger.shutdown(timeout=0.3)
+        assert time.perf_counter() - start < 0.6
+        stats = logger.stats()
+        assert stats["buffered"] == 0
+        assert stats["dropped"] > 180
+        logger.log("after shutdown")
+        assert logger.stats()["buffered"] == 0
+
+        # Case where the newest lines are the ones dropped
+        intake.delay = 0
+        logger = DatadogLogger(batch_size=1000, flush_interval_ms=10000, max_buffer=3, drop_policy="newest", configuration=configuration())
+        intake.batches.clear()
+        for i in range(5):
+            logger.log("line {}".format(i))
+        logger.shutdown()
+        assert intake.batches == [["line 0", "line 1", "line 2"]]
+        assert logger.stats()["dropped"] == 2
+    finally:
+        intake.shutdown()
+
+# Test canonicalize_url function
+def test_canonicalize_url():
+    canonical_url = "https://www.example.com/recipes/best-pie"
+    assert canonicalize_url("https://WWW.Example.com:443/recipes//best-pie/?utm_source=x&utm_medium=y#jump-to-recipe") == canonical_url
+    assert canonicalize_url("https://www.example.com/recipes/best-pie/amp/") == canonical_url
+    assert canonicalize_url("https://www.example.com/recipes/best-pie/print/?amp") == canonical_url
+    assert canonicalize_url("https://www.example.com/recipes/best-pie?b=2&a=1&fbclid=abc") == canonical_url + "?a=1&b=2"
+
+    # Case where the URL has no scheme, rejected as it was before canonicalization
+    with pytest.raises(ValueError):
+        canonicalize_url("www.example.com/recipes/best-pie")
+
+# Test content_fingerprint function
+def test_content_fingerprint():
+    template = ("<html><head>{}</head><body><nav>Home Recipes About Contact</nav>"
+                + "<p>Subscribe to our newsletter for weekly dinner ideas and family favourites</p>" * 40
+                + "<h1>{}</h1><ol>{}</ol><footer>Copyright {}</footer></body></html>")
+    def page(name, ingredients, steps, site, json_ld=True):
+        recipe = json.dumps({"@context": "https://schema.org", "@type": "Recipe", "name": name, "url": "https://{}/".format(site),
+                             "recipeIngredient": ingredients, "recipeInstructions": [{"@type": "HowToStep", "text": step} for step in steps]})
+        script = '<script type="application/ld+json">{}</script>'.format(recipe) if json_ld else ""
+        return template.format(script, name, "".join("<li>{}</li>".format(step) for step in steps), site)
+
+    mash = ("Mashed Potatoes", ["2 lb potatoes", "4 tbsp butter", "1/2 cup milk"], ["Boil the potatoes until tender.", "Mash with the butter and milk until smooth."])
+    stir_fry = ("Ginger Chicken", ["1 lb chicken", "2 tbsp soy sauce", "1 tbsp ginger"], ["Slice the chicken thinly.", "Stir fry with the soy sauce and ginger."])
+    original = content_fingerprint(page(*mash, "example.com"))
+    mirror = content_fingerprint(page(*mash, "mirror.example.org").replace("<ol>", "<div class='ad'>Buy now</div><ol>"))
+    different = content_fingerprint(page(*stir_fry, "example.com"))
+
+    assert original == mirror
+    assert hamming_distance(original, different) > RecipeResultCache.max_fingerprint_distance
+
+    # Case where the page has no JSON-LD recipe, its text is mostly the site template so it gets no fingerprint
+    assert content_fingerprint(page(*mash, "example.com", json_ld=False)) is None
+
+    # Case where a mirror of an already extracted page on another host is served from the result cache
+    result = {"recipe_name": "Mashed Potatoes", "recipe_steps": ["Boil"], "ingredients": [["2", "lb", "potatoes"]]}
+    cache = RecipeResultCache(version="v1")
+    cache.set("https://example.com/mash", b"original", result, original)
+    assert cache.get("https://mirror.example.org/mash", b"mirror") is None
+    assert cache.get_similar("https://mirror.example.org/mash", mirror) == result
+    assert cache.get_similar("https://other.example.net/stir-fry", different) is None
+
+    # Case where the same fingerprint on the same host, or for an incomplete result, is never shared
+    assert cache.get_similar("https://example.com/mash-2", mirror) is None
+    cache.set("https://partial.example.com/mash", b"partial", dict(result, recipe_steps=None), original)
+    cache.set("https://example.com/mash", b"original", dict(result, recipe_steps=None), original)
+    assert cache.get_similar("https://mirror.example.org/mash", mirror) is None
+
+# Test that two different recipes on one shared site template never share a result cache entry
+def test_content_fingerprint_shared_template(monkeypatch):
+    template = ("<html><body><nav>Home Recipes About</nav>" + "<p>Get our newsletter for weekly dinner ideas</p>" * 60
+                + "<h1>{}</h1><ul>{}</ul><ol>{}</ol><footer>Copyright Example</footer></body></html>")
+    pie = template.format("Apple Pie", "<li>4 apples</li><li>1 cup sugar</li>", "<li>Bake the pie for 45 minutes.</li>").encode('utf-8')
+    soup = template.format("Tomato Soup", "<li>6 tomatoes</li><li>1 onion</li>", "<li>Simmer the soup for 20 minutes.</li>").encode('utf-8')
+
+    monkeypatch.setattr(recipe_pipeline, 'recipe_cache', RecipeResultCache(version="v1"))
+    first = recipe_pipeline.extract_recipe_cached(pie, "https://example.com/apple-pie")
+    second = recipe_pipeline.extract_recipe_cached(soup, "https://example.com/tomato-soup")
+    mirrored = recipe_pipeline.extract_recipe_cached(soup, "https://mirror.example.org/tomato-soup")
+    assert first['recipe_name'] == "Apple Pie"
+    assert second['recipe_name'] == mirrored['recipe_name'] == "Tomato Soup"
+    assert recipe_pipeline.recipe_cache.stats()['fingerprint_hits'] == 0
+
+    # Case where a warm hit does not fingerprint the page again
+    monkeypatch.setattr(recipe_pipeline, 'content_fingerprint', lambda content: pytest.fail("fingerprinted on a cache hit"))
+    assert recipe_pipeline.extract_recipe_cached(pie, "https://example.com/apple-pie")['recipe_name'] == "Apple Pie"
+
+# Test SingleFlight class
+def test_single_flight():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_scrape():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"recipe_name": "Recipe"}
+
+    # Case where concurrent callers for the same key share one call
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("https://example.com/recipe", slow_scrape)))
+    leader.start()
+    started.wait(5)
+    waiters = [threading.Thread(target=lambda: results.append(flight.do("https://example.com/recipe", slow_scrape, timeout=5))) for _ in range(5)]
+    for waiter in waiters:
+        waiter.start()
+    while flight.stats()["coalesced"] < 5:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader] + waiters:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{"recipe_name": "Recipe"}] * 6
+    assert flight.stats() == {"coalesced": 5, "in_flight": 0}
+
+    # Case where the leader fails and the waiters get the same error
+    started.clear()
+    release.clear()
+    errors = []
+    def failing_scrape():
+        started.set()
+        release.wait(5)
+        raise ValueError("upstream failed")
+    def call_and_record_error(timeout=None):
+        try:
+            flight.do("https://example.com/broken", failing_scrape, timeout=timeout)
+        except Exception as e:
+            errors.append(e)
+    leader = threading.Thread(target=call_and_record_error)
+    leader.start()
+    started.wait(5)
+    waiter = threading.Thread(target=call_and_record_error, args=(5,))
+    waiter.start()
+    while flight.stats()["coalesced"] < 6:
+        time.sleep(0.01)
+
+    # Case where a waiter gives up before the leader finishes
+    with pytest.raises(TimeoutError):
+        flight.do("https://example.com/broken", failing_scrape, timeout=0.01)
+    release.set()
+    leader.join()
+    waiter.join()
+    assert [str(e) for e in errors] == ["upstream failed", "upstream failed"]
+
 # Test postprocess_list function
 def test_postprocess_list():
     # Case where list is not empty
@@ -122,7 +783,7 @@ def test_extract_units():
     "toppings: chopped fresh chives or green onions, freshly-cracked black pepper"
   ]
     ingredients, original_unit_type, ingredients_pre_conversion = extract_units(input)
-    assert ingredients == [
+    assert format_ingredients(ingredients) == [
         ["5", "lb", "potatoes(I use half Yukon Gold, half Russet potatoes)"],
         ["2", None, "large cloves garlic, minced"],
         [None, None, "fine sea salt"],
@@ -134,6 +795,252 @@ def test_extract_units():
     assert original_unit_type == 'metric'
     assert ingredients_pre_conversion == ingredients
 
+# Test extract_units function on the golden corpus of ingredient lines (expected output recorded from the per-line regex implementation)
+def test_extract_units_golden_corpus():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'ingredient_lines.json'), encoding='utf-8') as f:
+        corpus = json.load(f)
+    ingredients, _, ingredients_pre_conversion = extract_units([entry['line'] for entry in corpus])
+    mismatches = [(entry['line'], entry['expected'], parsed) for entry, parsed in zip(corpus, format_ingredients(ingredients)) if parsed != entry['expected']]
+    assert mismatches == []
+    assert ingredients_pre_conversion == ingredients
+
+    # Unicode fractions, ranges, units stuck to the name, and overlapping fractions keep their old replacement order
+    lines = ["1 ½ cups granulated sugar", "2 to 3 Tbsp. olive oil", "2–3 cloves garlic", "1 (14 oz) can diced tomatoes", "1/3/4 cup milk"]
+    assert [tokenize_ingredient(line) for line in lines] == [
+        ["1 0.5", "cups", "granulated sugar"],
+        ["2-3", "Tbsp", ". olive oil"],
+        ["2–3", "cloves", "garlic"],
+        ["1", "can", "diced tomatoes"],
+        ["1/0.75", "cup", "milk"]
+    ]
+
+# Test Quantity class
+def test_quantity():
+    # Parsed once into exact numbers, the text is what gets shown until the quantity is scaled or converted
+    quantity = Quantity.parse("1 0.5")
+    assert (quantity.value, quantity.upper, quantity.format()) == (Fraction(3, 2), None, "1 0.5")
+    quantity = Quantity.parse("5 to 6")
+    assert (quantity.value, quantity.upper, quantity.format()) == (5, 6, "5 to 6")
+    assert Quantity.parse("") is None and Quantity.parse(None) is None
+    assert Quantity.parse(2267.96).format() == 2267.96
+
+    # Anything that isn't a number or a range of two keeps its text and is left alone
+    for text in ["1/0.75", "1-2-3", "-2"]:
+        quantity = Quantity.parse(text)
+        assert quantity.value is None
+        assert quantity.scaled(Fraction(4), Fraction(8)).format() == text
+        assert quantity.converted(236.588).format() == text
+
+    # Scaling is exact, converting multiplies by the float factor
+    assert Quantity.parse("1/3").scaled(Fraction(1), Fraction(3)).format() == "1"
+    assert Quantity.parse("2-3").scaled(Fraction(4), Fraction(6)).format() == "3-4.5"
+    assert Quantity.parse("1 1/2").converted(236.588).format() == 354.88
+    assert Quantity.parse("1-2").converted(236.588).format() == "236.59-473.18"
+
+    # Mixed numbers are converted as the sum of their parts
+    converted = convert_units([["1 1/2", "cup", "whole milk"]], "si", None, 4, "metric", None)
+    assert format_ingredients(converted) == [[354.88, "ml", "whole milk"]]
+
+    # Stored in the session as JSON and read back unchanged
+    recipe_state = RecipeState()
+    recipe_state.ingredients, original_unit_type, _ = extract_units(["1 ½ cups sugar", "2-3 cloves garlic", "salt"])
+    recipe_state.base_ingredients = prepare_ingredients(recipe_state.ingredients, "4", original_unit_type)
+    recipe_state.ingredients = calculate_servings(recipe_state.ingredients, 4, 6)
+    restored = RecipeState()
+    restored.from_dict(json.loads(json.dumps(recipe_state.to_dict())))
+    assert restored.ingredients == recipe_state.ingredients
+    assert [b.to_data() for b in restored.base_ingredients] == [b.to_data() for b in recipe_state.base_ingredients]
+    assert format_ingredients(restored.ingredients) == [["2.25", "cups", "sugar"], ["3-4.5", "cloves", "garlic"], [None, None, "salt"]]
+
+# Test parse_ingredient_line function
+def test_parse_ingredient_line():
+    # Lines that only differ in whitespace share one immutable parse
+    parsed = parse_ingredient_line("2 cloves garlic")
+    assert parse_ingredient_line("  2  cloves   garlic ") is parsed
+    assert parsed == (Quantity.parse("2"), "cloves", "garlic")
+    with pytest.raises(AttributeError):
+        parsed[0].value = 3
+
+    # Changing the rows extract_units returns doesn't reach the cached parse
+    ingredients, _, ingredients_pre_conversion = extract_units(["2 cloves garlic"])
+    ingredients[0][1] = "heads"
+    assert ingredients_pre_conversion[0][1] == "cloves"
+    assert parse_ingredient_line("2 cloves garlic")[1] == "cloves"
+
+    # Least recently used entries go first, hits and misses are counted
+    memo = LRUMemo(max_entries=2)
+    assert memo.get_or_compute("a", str.upper) == "A"
+    assert memo.get_or_compute("b", str.upper) == "B"
+    assert memo.get_or_compute("a", str.upper) == "A"
+    memo.get_or_compute("c", str.upper)
+    memo.get_or_compute("b", str.upper)
+    stats = memo.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['entries']) == (1, 4, 2, 2)
+    assert stats['hit_rate'] == 0.2
+
+    # Every thread gets the same answer, and the memo never grows past its bound
+    memo = LRUMemo(max_entries=50)
+    results = []
+    def worker():
+        results.append([memo.get_or_compute(i % 80, lambda key: (key, key * 2)) for i in range(400)])
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(result == [(i % 80, i % 80 * 2) for i in range(400)] for result in results)
+    assert memo.stats()['entries'] == 50
+
+# Test ingredient_density function
+def test_ingredient_density():
+    # Longest whole-word match, singular and plural forms of the table names
+    assert ingredient_density("coconut milk, well shaken").name == "coconut milk"
+    assert ingredient_density("Brown Sugar, packed").grams_per_cup == 213
+    assert ingredient_density("fresh cranberry").name == "cranberries"
+    assert ingredient_density("watermelon, cubed") is None
+    assert ingredient_density("") is None
+
+    # Equal length matches go to the last one
+    index = DensityIndex([IngredientDensity("sugar", 200, False), IngredientDensity("flour", 125, False), IngredientDensity("flourless", 1, False)])
+    assert index.find("flour and sugar").name == "sugar"
+    assert index.find("sugar, flourless").name == "flourless"
+    assert index.find("sugarflour") is None
+
+    # Cups are converted with the ingredient's own density, liquids by volume
+    converted = convert_units([["1", "cup", "granulated sugar"], ["1", "cup", "chicken stock"], ["1", "cup", "mystery powder"]], "si", None, 4, "metric", None)
+    assert format_ingredients(converted) == [[200.0, "g", "granulated sugar"], [236.59, "ml", "chicken stock"], [125.39, "g", "mystery powder"]]
+    converted = convert_units([["100", "g", "all-purpose flour"]], "metric", None, 4, "si", None)
+    assert format_ingredients(converted) == [[0.8, "cups", "all-purpose flour"]]
+
+# Test unit_graph factors
+def test_unit_graph():
+    # Every pair of units in the same dimension converts there and back to the same amount, and through any third unit
+    for (from_unit, to_unit), factor in UNIT_FACTORS.items():
+        assert factor * UNIT_FACTORS[to_unit, from_unit] == pytest.approx(1)
+        for via_unit in UNITS:
+            if (from_unit, via_unit) in UNIT_FACTORS:
+                assert UNIT_FACTORS[from_unit, via_unit] * UNIT_FACTORS[via_unit, to_unit] == pytest.approx(factor)
+
+    assert unit_factor("lb", "g") == 453.592
+    assert unit_factor("g", "lb") == pytest.approx(1 / 453.592)
+    assert unit_factor("cups", "tsp") == 48
+    assert unit_factor("cup", "g") == 125.39
+    assert unit_factor("cup", "g", grams_per_ml=1) == 236.588
+    assert unit_factor("dozen", "g") is None
+    assert unit_factor("cloves", "g") is None
+
+    assert convert_many([(2, "kg", "g"), (1, "tbsp", "tsp"), (1, "can", "g"), (None, "kg", "g")]) == [2000, 3, None, None]
+
+    # Converts every recipe the same as convert_units would on its own
+    recipes = [
+        ([["1", "cup", "whole milk"], ["8", "oz", "cream cheese"]], "metric"),
+        ([["500", "g", "flour"], ["2", None, "eggs"]], "si"),
+        ([["3", "cups", "water"]], "si")
+    ]
+    converted = convert_units_batch(recipes, "si")
+    for (ingredients, original_unit_type), result in zip(recipes, converted):
+        assert result == convert_units(ingredients, "si", None, 4, original_unit_type, ingredients)
+    assert format_ingredients(converted[0]) == [[236.59, "ml", "whole milk"], [226.8, "g", "cream cheese"]]
+
+# Test IngredientBatch against ingredient_views
+def test_ingredient_batch():
+    with open(os.path.join(os.path.dirname(__file__), 'fixtures', 'ingredient_lines.json'), encoding='utf-8') as f:
+        lines = [entry['line'] for entry in json.load(f)]
+    # Amounts landing right on a promotion threshold or a rounding tie, plus the golden corpus
+    lines = ["1.6 oz cream cheese", "0.1 cup milk", "1/16 cup water", "2 1/2 oz butter", "1/8 lb potatoes"] + lines
+
+    recipes = []
+    for i, servings in zip(range(0, len(lines), 10), itertools.cycle(["4", None, "6 servings", "1", "0", "20"])):
+        ingredients, original_unit_type, _ = extract_units(lines[i:i + 10])
+        recipes.append((prepare_ingredients(ingredients, servings, original_unit_type), servings))
+
+    batch = IngredientBatch(recipes)
+    for unit_type in ("si", "metric", None):
+        for serving_sizes in (None, 2, 7, 2.5, 0.5, [None, 3, 1] * (len(recipes) // 3) + [8] * (len(recipes) % 3)):
+            per_recipe = serving_sizes if isinstance(serving_sizes, list) else [serving_sizes] * len(recipes)
+            expected = [ingredient_views(base_ingredients, unit_type, serving_size, servings) for (base_ingredients, servings), serving_size in zip(recipes, per_recipe)]
+            assert batch.views(unit_type, serving_sizes) == expected
+
+    assert IngredientBatch([]).views("si", 2) == []
+
+# Test the frontend's ingredientConversion.mjs against ingredient_views, every case run through both
+def test_conversion_model_parity(client, recipe_site):
+    node = shutil.which("node")
+    if node is None:
+        pytest.skip("node is needed to run the frontend module")
+    module = os.path.join(os.path.dirname(__file__), "..", "..", "recipe-scraper-frontend", "src", "ingredientConversion.mjs")
+    with open(os.path.join(os.path.dirname(__file__), "fixtures", "ingredient_lines.json"), encoding="utf-8") as f:
+        corpus = [entry["line"] for entry in json.load(f)][:400]
+    # Promotions to tsp/tbsp/lb and their thresholds, ranges and ingredients with densities
+    corpus += ["0.05 cups milk", "0.01 cup sugar", "40 oz beef", "32 oz pork", "1-2 cups flour", "1/3 cup honey", "2 1/2 cups coconut milk", "500 g flour"]
+
+    models = []
+    cases = []
+    expected = []
+    for i, servings in zip(range(0, len(corpus), 8), itertools.cycle(["4", "6 servings", None, "1", "3-4", "a few"])):
+        ingredients, original_unit_type, _ = extract_units(corpus[i:i + 8])
+        base_ingredients = prepare_ingredients(ingredients, servings, original_unit_type)
+        models.append(conversion_model(base_ingredients, servings, original_unit_type))
+        for unit_type, serving_size in itertools.product([None, "si", "metric"], [None, 1, 2.5, 7, 1 / 3, 0.1, 100]):
+            cases.append([len(models) - 1, unit_type, serving_size])
+            # The session endpoints read the serving size with float()
+            expected.append(format_ingredients(ingredient_views(base_ingredients, unit_type, None if serving_size is None else float(serving_size), servings)))
+
+    runner = """import {{ ingredientRows }} from {};
+let input = '';
+process.stdin.on('data', (chunk) => input += chunk).on('end', () => {{
+  const {{ models, cases }} = JSON.parse(input);
+  process.stdout.write(JSON.stringify(cases.map(([model, unitType, servingSize]) => ingredientRows(models[model], unitType, servingSize))));
+}});""".format(json.dumps("file://" + os.path.abspath(module)))
+    result = subprocess.run([node, "--input-type=module", "-e", runner], input=json.dumps({"models": models, "cases": cases}), capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    actual = json.loads(result.stdout)
+    assert len(actual) == len(cases)
+    for case, expected_rows, actual_rows in zip(cases, json.loads(json.dumps(expected)), actual):
+        assert actual_rows == expected_rows, case
+
+    # Case where the scrape endpoint only sends the model when asked for it
+    recipe_site.pages["/soup"] = json_ld_recipe_page("Soup", ["2 cups broth", "1 lb carrots"], ["Simmer."], "4")
+    auth_headers = {"Authorization": generate_token("tester")}
+    response = client.post('/scrape-recipe-steps', headers=auth_headers, json={"recipe_url": recipe_site.url + "/soup"})
+    assert "conversion_model" not in response.json
+    response = client.post('/scrape-recipe-steps', headers=auth_headers, json={"recipe_url": recipe_site.url + "/soup", "client_conversion": True})
+    model = response.json["conversion_model"]
+    assert model["version"] == 1 and model["servings"] == 4
+    assert model["units"]["lb"] == ["mass", "56699/125"]
+    assert [row[:3] for row in model["ingredients"]] == response.json["ingredients"]
+
+# Test ingredient_views function
+def test_ingredient_views():
+    ingredients, original_unit_type, _ = extract_units(["5 to 6 lb potatoes", "2 large cloves garlic", "6 tbsp butter", "1 1/2 cup whole milk", "4 oz cream cheese", "fine sea salt"])
+    base_ingredients = prepare_ingredients(ingredients, "4 servings", original_unit_type)
+    assert original_unit_type == "metric"
+
+    # Stored per serving in g/ml, or counted in their own unit
+    assert [b.base_unit for b in base_ingredients] == ["g", None, "ml", "ml", "g", None]
+    assert base_ingredients[0].per_serving == Fraction(5) * Fraction("453.592") / 4
+
+    # The scraped rows until something is scaled or converted, no unit type means the original units
+    assert ingredient_views(base_ingredients, None, None, "4 servings") == ingredients
+    assert ingredient_views(base_ingredients, "metric", None, "4 servings") == ingredients
+
+    # Same as converting or scaling the scraped rows
+    assert format_ingredients(ingredient_views(base_ingredients, "si", None, "4 servings")) == format_ingredients(convert_units(ingredients, "si", None, 4, "metric", ingredients))
+    assert format_ingredients(ingredient_views(base_ingredients, None, 6, "4 servings")) == format_ingredients(calculate_servings(ingredients, 4, 6))
+
+    # Converted and scaled in one go, whichever was asked for first
+    assert format_ingredients(ingredient_views(base_ingredients, "si", 8, "4 servings")) == [
+        ["4535.92-5443.1", "g", "potatoes"],
+        ["4", None, "large cloves garlic"],
+        ["12", "tbsp", "butter"],
+        ["709.76", "ml", "whole milk"],
+        ["226.8", "g", "cream cheese"],
+        [None, None, "fine sea salt"]
+    ]
+
+    # Nothing to scale from without a serving count
+    assert ingredient_views(base_ingredients, None, 8, None) == ingredients
+
 # Test calculate_servings function
 def test_calculate_servings():
     servings = 4
@@ -158,7 +1065,7 @@ def test_calculate_servings():
         [None, None, "toppings : chopped fresh chives or green onions, freshly-cracked black pepper"]
     ]
     result_calculated = calculate_servings(input_ingredients, servings, requested_serving_size)
-    assert result_calculated == expected_result
+    assert format_ingredients(result_calculated) == expected_result
 
 # Test convert_units function
 def test_convert_units():
@@ -188,11 +1095,241 @@ def test_convert_units():
     
     # Test converting to a different unit type
     result_diff_unit = convert_units(input_data, "si", 4, 4, "metric", input_data)
-    assert result_diff_unit == output_data
+    assert format_ingredients(result_diff_unit) == output_data
     
-    # Test converting with a requested serving size different from the original serving size
+    # Test converting quantities that are already in the requested unit type, they stay as they are
     result_req_serving_size = convert_units(output_data, "si", 4, 4, "metric", input_data)
-    assert result_req_serving_size == input_data
+    assert format_ingredients(result_req_serving_size) == output_data
+
+# Test AsyncFetcher class against a local aiohttp server
+def test_async_fetcher():
+    state = {"flaky_calls": 0, "in_flight": 0, "max_in_flight": 0}
+
+    async def flaky(request):
+        state["flaky_calls"] += 1
+        if state["flaky_calls"] < 3:
+            return web.Response(status=503)
+        return web.Response(text="recipe", headers={"ETag": '"v1"'})
+
+    async def slow(request):
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        await asyncio.sleep(0.05)
+        state["in_flight"] -= 1
+        return web.Response(text=request.path)
+
+    async def hang(request):
+        await asyncio.sleep(0.5)
+        return web.Response(text="too late")
+
+    async def stalls_once(request):
+        state["stall_calls"] = state.get("stall_calls", 0) + 1
+        if state["stall_calls"] == 1:
+            await asyncio.sleep(0.5)
+        return web.Response(text="recipe")
+
+    async def run():
+        server_app = web.Application()
+        server_app.router.add_get("/flaky", flaky)
+        server_app.router.add_get("/slow/{n}", slow)
+        server_app.router.add_get("/hang", hang)
+        server_app.router.add_get("/stalls-once", stalls_once)
+        runner = web.AppRunner(server_app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        base_url = "http://127.0.0.1:{}".format(runner.addresses[0][1])
+
+        try:
+            async with AsyncFetcher(per_host_limit=2, total_timeout=2, backoff_factor=0.01) as fetcher:
+                # Case where retryable statuses are retried with backoff
+                response = await fetcher.fetch(base_url + "/flaky")
+                assert response.status_code == 200
+                assert response.content == b"recipe"
+                assert response.headers.get("etag") == '"v1"'
+                assert state["flaky_calls"] == 3
+
+                # Case where many fetches to one host stay under the per-host limit
+                urls = [base_url + "/slow/{}".format(i) for i in range(8)]
+                results = [result async for result in fetcher.fetch_many(urls)]
+                assert sorted(url for url, _ in results) == sorted(urls)
+                assert all(response.status_code == 200 for _, response in results)
+                assert state["max_in_flight"] == 2
+                # Hosts with nothing in flight don't keep a semaphore around
+                assert fetcher._host_semaphores == {}
+
+            # Case where an attempt that times out is retried like any other transient failure
+            async with AsyncFetcher(total_timeout=2, attempt_timeout=0.2, backoff_factor=0.01) as fetcher:
+                response = await fetcher.fetch(base_url + "/stalls-once")
+                assert response.content == b"recipe"
+                assert state["stall_calls"] == 2
+
+            # Case where a malformed or non-HTTP URL fails straight away instead of being retried
+            async with AsyncFetcher(total_timeout=5, backoff_factor=10) as fetcher:
+                start = time.perf_counter()
+                with pytest.raises(requests.exceptions.InvalidSchema):
+                    await fetcher.fetch("ftp://127.0.0.1/recipe")
+                with pytest.raises(requests.exceptions.InvalidURL):
+                    await fetcher.fetch("http://:80/recipe")
+                assert time.perf_counter() - start < 1
+
+            # Case where the total deadline runs out
+            async with AsyncFetcher(total_timeout=0.2) as fetcher:
+                with pytest.raises(requests.Timeout):
+                    await fetcher.fetch(base_url + "/hang")
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+# Test FetchEngine class from synchronous code
+def test_fetch_engine(recipe_site):
+    recipe_site.pages["/pancakes"] = "<html>pancakes</html>"
+    engine = FetchEngine(total_timeout=5)
+    try:
+        assert engine.get(recipe_site.url + "/pancakes").content == b"<html>pancakes</html>"
+        with pytest.raises(requests.HTTPError):
+            engine.get(recipe_site.url + "/missing").raise_for_status()
+    finally:
+        engine.close()
+
+# Test the batch scraping endpoint against a local recipe site
+def test_scrape_recipes_batch(client, recipe_site, monkeypatch):
+    recipe_site.pages["/pancakes"] = json_ld_recipe_page("Pancakes", ["1 cup flour", "2 eggs"], ["Whisk everything."], "4")
+    recipe_site.pages["/waffles"] = json_ld_recipe_page("Waffles", ["2 cups flour"], ["Heat the waffle iron."], "2 servings")
+    recipe_urls = [recipe_site.url + "/pancakes", recipe_site.url + "/waffles", recipe_site.url + "/missing"]
+
+    response = client.post('/scrape-recipes-batch',
+                           headers={"Authorization": generate_token("tester")},
+                           json={"recipe_urls": recipe_urls})
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert sorted(record["recipe_url"] for record in records) == sorted(recipe_urls)
+    records_by_url = {record["recipe_url"]: record for record in records}
+    assert records_by_url[recipe_site.url + "/pancakes"]["ingredients"] == [["1", "cup", "flour"], ["2", None, "eggs"]]
+    assert records_by_url[recipe_site.url + "/waffles"]["servings"] == "2"
+    assert "error" in records_by_url[recipe_site.url + "/missing"]
+
+    # Case where extracting one page raises, only that URL gets an error record and the stream carries on
+    app_module = sys.modules['app']
+    scrape_recipe = app_module.scrape_recipe
+    def broken_scrape(canonical_url):
+        if canonical_url.endswith("/waffles"):
+            raise RuntimeError("extractor bug")
+        return scrape_recipe(canonical_url)
+    monkeypatch.setattr(app_module, 'scrape_recipe', broken_scrape)
+    recipe_urls = [recipe_site.url + "/waffles", "https://example.com:99999/recipe", recipe_site.url + "/pancakes"]
+    response = client.post('/scrape-recipes-batch', headers={"Authorization": generate_token("tester")}, json={"recipe_urls": recipe_urls})
+    records_by_url = {record["recipe_url"]: record for record in map(json.loads, response.get_data(as_text=True).splitlines())}
+    assert sorted(records_by_url) == sorted(recipe_urls)
+    assert records_by_url[recipe_site.url + "/waffles"]["error"] == "Failed to extract the recipe from this website"
+    assert "error" in records_by_url["https://example.com:99999/recipe"]
+    assert records_by_url[recipe_site.url + "/pancakes"]["recipe_name"] == "Pancakes"
+
+    # Case where the request body isn't a list of URLs
+    response = client.post('/scrape-recipes-batch', headers={"Authorization": generate_token("tester")}, json={"recipe_urls": "not a list"})
+    assert response.status_code == 400
+
+# Test that /scrape-recipe-steps answers a missing or malformed recipe_url with a 400
+def test_scrape_recipe_steps_invalid_url(client):
+    for body in ({}, {"recipe_url": None}, {"recipe_url": "  "}, {"recipe_url": "https://example.com:99999/recipe"}, {"recipe_url": "http://[::1/recipe"}, {"recipe_url": "www.example.com/recipe"}):
+        response = client.post('/scrape-recipe-steps', headers={"Authorization": generate_token("tester")}, json=body)
+        assert response.status_code == 400
+        assert "error" in response.get_json()
+
+# Test the stateless ingredients endpoint of both apps, same answers as the session endpoints with ETags and 304s
+def test_recipe_ingredients(client, recipe_site):
+    recipe_site.pages["/stew"] = json_ld_recipe_page("Stew", ["1 lb beef", "2 cups water", "1 onion"], ["Simmer everything."], "4")
+    auth_headers = {"Authorization": generate_token("tester")}
+    response = client.post('/scrape-recipe-steps', headers=auth_headers, json={"recipe_url": recipe_site.url + "/stew"})
+    recipe_id = response.json["recipe_id"]
+    path = '/recipes/{}/ingredients'.format(recipe_id)
+
+    # Case where the ingredients match the session endpoints
+    client.post('/convert-recipe-units', headers=auth_headers, json={"unit_type": "si"})
+    expected = client.post('/calculate-serving-ingredients', headers=auth_headers, json={"serving_size": "6"}).json
+    response = client.get(path + '?unit_type=si&servings=6', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json == expected
+    assert client.get(path, headers=auth_headers).json == [["1", "lb", "beef"], ["2", "cups", "water"], ["1", None, "onion"]]
+
+    # Case where the same view has the same strong ETag, and a client that has it gets a 304 without a body
+    etag = response.headers["ETag"]
+    assert etag.startswith('"') and response.headers["Cache-Control"].startswith("private, max-age=")
+    assert client.get(path + '?servings=6.0&unit_type=si', headers=auth_headers).headers["ETag"] == etag
+    assert client.get(path + '?unit_type=si&servings=8', headers=auth_headers).headers["ETag"] != etag
+    response = client.get(path + '?unit_type=si&servings=6', headers=dict(auth_headers, **{"If-None-Match": etag}))
+    assert response.status_code == 304
+    assert response.data == b"" and response.headers["ETag"] == etag
+    gzip_etag = etag[:-1] + ':gzip"'
+    assert client.get(path + '?unit_type=si&servings=6', headers=dict(auth_headers, **{"If-None-Match": 'W/"other", ' + gzip_etag})).status_code == 304
+
+    # Case where the parameters are invalid or the recipe id is unknown
+    assert client.get(path + '?unit_type=imperial', headers=auth_headers).status_code == 400
+    assert client.get(path + '?servings=-2', headers=auth_headers).status_code == 400
+    assert client.get('/recipes/unknown/ingredients', headers=auth_headers).status_code == 404
+    assert client.get(path).status_code == 401
+
+    # Case where the ASGI app answers the same, without a session
+    with TestClient(asgi_app, base_url="https://testserver") as asgi_client:
+        response = asgi_client.get(path, params={"unit_type": "si", "servings": "6"}, headers=auth_headers)
+        assert response.json() == expected
+        assert response.headers["ETag"] == etag
+        assert asgi_client.get(path, params={"unit_type": "si", "servings": "6"}, headers=dict(auth_headers, **{"If-None-Match": etag})).status_code == 304
+
+# Test the ASGI app against a local recipe site, the session cookie carries the recipe between endpoints like in app.py
+def test_asgi_app(recipe_site, monkeypatch):
+    recipe_site.pages["/pancakes"] = json_ld_recipe_page("Pancakes", ["1 cup flour", "2 eggs"], ["Whisk everything."], "4")
+
+    # The stores can be on the network, record whether any of their calls ran on the event loop
+    calls_on_event_loop = []
+    class RecordingStateStore(MemoryStateStore):
+        def load(self, state_id):
+            calls_on_event_loop.append(running_event_loop())
+            return super().load(state_id)
+        def save(self, state_id, fields):
+            calls_on_event_loop.append(running_event_loop())
+            return super().save(state_id, fields)
+    def running_event_loop():
+        try:
+            return asyncio.get_running_loop() is not None
+        except RuntimeError:
+            return False
+    monkeypatch.setattr(recipe_state_module, 'state_store', RecordingStateStore())
+    monkeypatch.setattr(recipe_pipeline, 'recipe_store', RecordingStateStore())
+
+    with TestClient(asgi_app, base_url="https://testserver") as asgi_client:
+        response = asgi_client.post('/scrape-recipe-steps', json={"recipe_url": recipe_site.url + "/pancakes"})
+        assert response.status_code == 401
+        assert response.json() == {"message": "Missing authorization token"}
+        response = asgi_client.post('/scrape-recipe-steps', headers={"Authorization": "not a token"}, json={"recipe_url": recipe_site.url + "/pancakes"})
+        assert response.json() == {"message": "Invalid token"}
+
+        auth_headers = {"Authorization": generate_token("tester")}
+        response = asgi_client.post('/scrape-recipe-steps', headers=auth_headers, json={"recipe_url": recipe_site.url + "/pancakes"})
+        assert response.status_code == 200
+        assert response.json()["recipe_name"] == "Pancakes"
+        assert response.json()["ingredients"] == [["1", "cup", "flour"], ["2", None, "eggs"]]
+        recipe_id = response.json()["recipe_id"]
+
+        response = asgi_client.post('/calculate-serving-ingredients', headers=auth_headers, json={"serving_size": "8"})
+        assert response.status_code == 200
+        assert response.json() == [["2", "cup", "flour"], ["4", None, "eggs"]]
+
+        response = asgi_client.get('/recipes/{}/ingredients'.format(recipe_id), headers=auth_headers, params={"servings": "8"})
+        assert response.json() == [["2", "cup", "flour"], ["4", None, "eggs"]]
+        assert calls_on_event_loop and not any(calls_on_event_loop)
+
+        response = asgi_client.post('/scrape-recipe-steps', headers=auth_headers, json={"recipe_url": recipe_site.url + "/missing"})
+        assert response.status_code == 400
+        # Case where recipe_url is missing or not a URL, the same 400 and error message as the Flask app
+        for body in ({"recipe_url": "https://example.com:99999/recipe"}, {}, {"recipe_url": None}, {"recipe_url": 42}):
+            response = asgi_client.post('/scrape-recipe-steps', headers=auth_headers, json=body)
+            flask_response = app.test_client().post('/scrape-recipe-steps', headers=auth_headers, json=body)
+            assert response.status_code == flask_response.status_code == 400
+            assert response.json() == flask_response.get_json()
 
 # Helper function
 def replace_non_breaking_spaces(data):
@@ -268,6 +1405,8 @@ def test_scrape_recipe_steps(client):
     actual_response = replace_non_breaking_spaces(response.json)
 
     assert response.status_code == 200
+    # The recipe id is a hash of the extracted ingredients, for GET /recipes/<recipe_id>/ingredients
+    assert len(actual_response.pop("recipe_id")) == 32
     assert actual_response == expected_response
 
 def test_convert_recipe_units(client):
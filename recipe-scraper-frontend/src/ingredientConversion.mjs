@@ -0,0 +1,212 @@
+/* global BigInt */
+// Scales and converts the ingredients in the browser from the conversion_model the backend sends with a scraped
+// recipe (ScrapeRecipeSteps with client_conversion), giving exactly the rows /convert-recipe-units and
+// /calculate-serving-ingredients would. The backend does this with exact fractions and a few float steps
+// (recipe-scraper-backend/api/logic/ingredient_base.py), so the same is done here with BigInt fractions.
+
+export const CONVERSION_MODEL_VERSION = 1;
+
+// ============= Exact fractions, [numerator, denominator] BigInts with a positive denominator =============
+function gcd(a, b) {
+  a = a < 0n ? -a : a;
+  b = b < 0n ? -b : b;
+  while (b) {
+    [a, b] = [b, a % b];
+  }
+  return a;
+}
+
+function fraction(numerator, denominator = 1n) {
+  if (denominator < 0n) {
+    numerator = -numerator;
+    denominator = -denominator;
+  }
+  const divisor = gcd(numerator, denominator) || 1n;
+  return [numerator / divisor, denominator / divisor];
+}
+
+function multiply(a, b) {
+  return fraction(a[0] * b[0], a[1] * b[1]);
+}
+
+function divide(a, b) {
+  return fraction(a[0] * b[1], a[1] * b[0]);
+}
+
+function compare(a, b) {
+  const difference = a[0] * b[1] - b[0] * a[1];
+  return difference < 0n ? -1 : difference > 0n ? 1 : 0;
+}
+
+function floorDivide(a, b) {
+  const quotient = a / b;
+  return (a % b !== 0n) && ((a < 0n) !== (b < 0n)) ? quotient - 1n : quotient;
+}
+
+// "3/2" or "12" as sent by the backend
+export function parseRatio(text) {
+  if (text === null || text === undefined) {
+    return null;
+  }
+  const [numerator, denominator] = String(text).split('/');
+  return fraction(BigInt(numerator), BigInt(denominator || 1));
+}
+
+// A decimal like "2.5" or "1e-05", exactly
+function parseDecimal(text) {
+  const match = /^([+-]?)(\d*)(?:\.(\d*))?(?:e([+-]?\d+))?$/i.exec(text);
+  const digits = BigInt((match[2] || '0') + (match[3] || ''));
+  const exponent = Number(match[4] || 0) - (match[3] || '').length;
+  const sign = match[1] === '-' ? -1n : 1n;
+  return exponent >= 0 ? fraction(sign * digits * 10n ** BigInt(exponent)) : fraction(sign * digits, 10n ** BigInt(-exponent));
+}
+
+function bitLength(number) {
+  return number === 0n ? 0 : number.toString(2).length;
+}
+
+// float(Fraction): the nearest double, ties to even
+export function ratioToNumber([numerator, denominator]) {
+  if (numerator === 0n) {
+    return 0;
+  }
+  const sign = numerator < 0n ? -1 : 1;
+  numerator = numerator < 0n ? -numerator : numerator;
+  const safe = 2n ** 53n;
+  if (numerator <= safe && denominator <= safe) {
+    return sign * (Number(numerator) / Number(denominator));
+  }
+  // A quotient of 55-56 bits with the remainder folded into the last bit rounds like the exact value
+  const shift = bitLength(numerator) - bitLength(denominator) - 55;
+  const scaledNumerator = shift < 0 ? numerator << BigInt(-shift) : numerator;
+  const scaledDenominator = shift > 0 ? denominator << BigInt(shift) : denominator;
+  let quotient = scaledNumerator / scaledDenominator;
+  if (scaledNumerator % scaledDenominator !== 0n) {
+    quotient |= 1n;
+  }
+  return sign * Number(quotient) * 2 ** shift;
+}
+
+// Python's repr() of a float, eg. 2 -> "2.0", 1e-05 -> "1e-05"
+export function pythonFloatText(number) {
+  if (!Number.isFinite(number)) {
+    return Number.isNaN(number) ? 'nan' : number > 0 ? 'inf' : '-inf';
+  }
+  if (number === 0) {
+    return Object.is(number, -0) ? '-0.0' : '0.0';
+  }
+  const [mantissa, exponentText] = number.toExponential().split('e');
+  const exponent = Number(exponentText);
+  if (exponent < -4 || exponent >= 16) {
+    return `${mantissa}e${exponent < 0 ? '-' : '+'}${String(Math.abs(exponent)).padStart(2, '0')}`;
+  }
+  const sign = number < 0 ? '-' : '';
+  const digits = mantissa.replace('-', '').replace('.', '');
+  if (exponent < 0) {
+    return `${sign}0.${'0'.repeat(-exponent - 1)}${digits}`;
+  }
+  if (digits.length <= exponent + 1) {
+    return `${sign}${digits}${'0'.repeat(exponent + 1 - digits.length)}.0`;
+  }
+  return `${sign}${digits.slice(0, exponent + 1)}.${digits.slice(exponent + 1)}`;
+}
+
+// Fraction(str(number)), how the backend turns floats into exact numbers
+function floatToRatio(number) {
+  return parseDecimal(pythonFloatText(number));
+}
+
+// round(Fraction, digits): to the nearest multiple of 10 ** -digits, ties to even
+function roundRatio([numerator, denominator], digits) {
+  const shift = 10n ** BigInt(digits);
+  const scaled = numerator * shift;
+  const floor = floorDivide(scaled, denominator);
+  const twiceRemainder = 2n * (scaled - floor * denominator);
+  const rounded = twiceRemainder < denominator ? floor : twiceRemainder > denominator ? floor + 1n : floor % 2n === 0n ? floor : floor + 1n;
+  return fraction(rounded, shift);
+}
+
+// ============= The backend's conversion rules =============
+// 0.1 as the double it is in convert_large_vals, compared exactly like Python compares a Fraction with a float
+const ONE_TENTH = fraction(3602879701896397n, 36028797018963968n);
+
+function unitFactor(units, fromUnit, toUnit) {
+  return ratioToNumber(divide(parseRatio(units[fromUnit][1]), parseRatio(units[toUnit][1])));
+}
+
+// convert_large_vals in logic/recipe_units.py: small cup amounts go to tsp/tbsp, large oz amounts to lb
+export function convertLargeVals(units, convertedUnit, convertedQuantity) {
+  let multiplier = 1;
+  if (convertedUnit === 'cups' && compare(convertedQuantity, ONE_TENTH) < 0) {
+    convertedUnit = 'tsp';
+    multiplier = unitFactor(units, 'cups', 'tsp');
+    if (ratioToNumber(convertedQuantity) * multiplier >= 3) {
+      convertedUnit = 'tbsp';
+      multiplier = unitFactor(units, 'cups', 'tbsp');
+    }
+  }
+  if (convertedUnit === 'oz' && compare(convertedQuantity, fraction(32n)) >= 0) {
+    multiplier = unitFactor(units, 'oz', 'lb');
+    convertedUnit = 'lb';
+  }
+  return [convertedUnit, multiplier];
+}
+
+// format_decimal in logic/quantity.py: scaled quantities drop a trailing ".0", converted ones keep it
+function formatDecimal(number, decimals) {
+  const text = pythonFloatText(ratioToNumber(number));
+  return decimals === 3 && text.endsWith('.0') ? text.slice(0, -2) : text;
+}
+
+// Quantity.format for an amount worked out here
+function formatAmount(perServing, perServingUpper, factor, digits, decimals) {
+  const value = roundRatio(multiply(perServing, factor), digits);
+  if (perServingUpper === null) {
+    // Converted quantities are sent as numbers, scaled ones as strings
+    return decimals === 2 ? ratioToNumber(value) : formatDecimal(value, decimals);
+  }
+  const upper = roundRatio(multiply(perServingUpper, factor), digits);
+  return `${formatDecimal(value, decimals)}-${formatDecimal(upper, decimals)}`;
+}
+
+// BaseIngredient.view, for one row of the model
+function ingredientRow(model, row, unitType, requested) {
+  const [quantity, unit, name, perServingText, perServingUpperText, unitFactorText, , , displayUnits] = row;
+  if (perServingText === null) {
+    return [quantity, unit, name];
+  }
+  const servings = model.servings;
+  const scaled = requested !== null && servings !== null;
+  const multiplier = scaled ? requested : fraction(BigInt(servings || 1));
+  const perServing = parseRatio(perServingText);
+  const perServingUpper = parseRatio(perServingUpperText);
+
+  const display = displayUnits[unitType];
+  if (!display) {
+    if (!scaled) {
+      return [quantity, unit, name];
+    }
+    return [formatAmount(perServing, perServingUpper, multiply(multiplier, parseRatio(unitFactorText)), 3, 3), unit, name];
+  }
+
+  const factor = multiply(multiplier, parseRatio(display[1]));
+  // a range is shown in the unit picked for its lower end
+  const [shownUnit, largeValueMultiplier] = convertLargeVals(model.units, display[0], multiply(perServing, factor));
+  return [formatAmount(perServing, perServingUpper, multiply(factor, floatToRatio(largeValueMultiplier)), 2, scaled ? 3 : 2), shownUnit, name];
+}
+
+/**
+ * The ingredient rows for a unit type and serving size, the same as the backend's response
+ * @param {Object} model conversion_model from the scrape response
+ * @param {string|null} unitType 'si' or 'metric', anything else shows the scraped units
+ * @param {number|string|null} servingSize The serving size asked for, null for the scraped one
+ */
+export function ingredientRows(model, unitType, servingSize = null) {
+  // The backend reads the serving size with float() and makes it exact from its decimal text
+  const requested = servingSize === null || servingSize === undefined ? null : floatToRatio(Number(servingSize));
+  return model.ingredients.map((row) => ingredientRow(model, row, unitType, requested));
+}
+
+export function supportsConversionModel(model) {
+  return Boolean(model) && model.version === CONVERSION_MODEL_VERSION;
+}